@@ -1,5 +1,3 @@
-import json
-import time
 import sys
 import os
 import asyncio
@@ -13,7 +11,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from db import init_db
+from config import get_config, flush_state
+from browser_pool import run as run_with_browsers
 from scraper import run_scraper
+from scheduler import seconds_until_next_due
+from shards import read_lock_pids, reap_orphaned_workers
 from generator import run_generator
 from poster import run_poster as run_poster_process
 from quantifier import run_quantifier
@@ -22,46 +24,56 @@ from engagement import run_engagement
 
 def run_automation_loop(scraper_only=False, run_quantifier_flag=False):
     """Main automation loop."""
+    # One event loop for the whole process so the browser pool stays warm across stages and cycles
+    run_with_browsers(automation_loop(scraper_only, run_quantifier_flag))
+
+async def automation_loop(scraper_only=False, run_quantifier_flag=False):
     while True:
         try:
             print("\n" + "="*50)
             print(f"🔄 STARTING CYCLE AT {datetime.now(timezone.utc).strftime('%H:%M:%S')} UTC")
             print("="*50)
 
-            asyncio.run(run_scraper())
-            run_quantifier()
+            await run_scraper()
+            await asyncio.to_thread(run_quantifier)
             
             # Run engagement monitor
             if not scraper_only:
                 try:
-                    with open("config_user/config.json") as f:
-                        cfg = json.load(f)
+                    cfg = get_config()
                     if cfg.get("engagement_enabled", False):
-                        asyncio.run(run_engagement())
+                        await run_engagement()
                 except Exception as e:
                     print(f"  ❌ Engagement Monitor Error: {e}")
             
             if not scraper_only:
-                run_generator()
-                run_qualifier()
-                asyncio.run(run_poster_process())
+                await asyncio.to_thread(run_generator)
+                await asyncio.to_thread(run_qualifier)
+                await run_poster_process()
             else:
                 print("\n--- Scraper Only Mode: Skipping Generator, Qualifier & Poster ---")
             
         except Exception as e:
             print(f"Error in main loop: {e}")
+        finally:
+            # Persist runtime state (source priority, mirror order) once per cycle
+            flush_state()
         # Sleep for the refresh interval
         try:
-            with open("config_user/config.json") as f:
-                cfg = json.load(f)
+            cfg = get_config()
             refresh = cfg.get("refresh_seconds", 3600)
+            if cfg.get("adaptive_polling", False):
+                # Wake up as soon as the next handle is due, but never spin faster than min_poll_seconds
+                # (and never sleep longer than refresh_seconds)
+                next_due = seconds_until_next_due(cfg.get("handles", []), cfg)
+                refresh = min(refresh, max(cfg.get("min_poll_seconds", 600), next_due))
         except:
             refresh = 3600
             
         # print(f"Waiting {refresh} seconds for next cycle...")
         # time.sleep(refresh)
         for _ in tqdm(range(refresh), desc="Waiting for next cycle", unit="s", ncols=75, file=sys.stdout):
-            time.sleep(1)
+            await asyncio.sleep(1)
 
 def main():
     # PID Lock Mechanism
@@ -70,8 +82,8 @@ def main():
     
     if os.path.exists(lock_file):
         try:
-            with open(lock_file, "r") as f:
-                pid = int(f.read().strip())
+            pids = read_lock_pids(lock_file)
+            pid = pids[0]
             
             # Check if process is actually running
             try:
@@ -86,12 +98,14 @@ def main():
                             sys.exit(1)
                         else:
                             print(f"⚠️ Stale lock file found (PID {pid} is a different process). Removing.")
+                            reap_orphaned_workers(pids[1:])
                             os.remove(lock_file)
                 except:
                     print(f"⚠️ App appears to be running (PID {pid}). Exiting for safety.")
                     sys.exit(1)
             except OSError:
                 print(f"⚠️ Stale lock file found (PID {pid} not running). Removing.")
+                reap_orphaned_workers(pids[1:])
                 os.remove(lock_file)
         except (ValueError, IOError):
             print("⚠️ Invalid or unreadable lock file. Removing.")
@@ -121,8 +135,7 @@ def main():
         # Check if WE own the lock file before removing it
         if os.path.exists(lock_file):
             try:
-                with open(lock_file, "r") as f:
-                    pid = int(f.read().strip())
+                pid = read_lock_pids(lock_file)[0]
                 if pid == current_pid:
                     os.remove(lock_file)
                     print("🔒 Lock file removed.")
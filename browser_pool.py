@@ -0,0 +1,215 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from config import get_config, get_settings
+
+FIREFOX_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0"
+
+# Launch options per engine, matching what each module used when it launched its own browser
+ENGINE_LAUNCH_OPTIONS = {
+    "firefox": {
+        "user_agent": FIREFOX_USER_AGENT,
+        "viewport": {"width": 1280, "height": 720},
+        "ignore_https_errors": True,
+    },
+    "chromium": {
+        "args": ["--disable-blink-features=AutomationControlled"],  # Anti-detect
+    },
+}
+
+LAUNCH_ATTEMPTS = 2
+
+
+class BrowserPool:
+    """
+    Owns warm persistent browser contexts for the whole process, keyed by (engine, profile dir),
+    and hands out pages through lease_page(). Pages are reset to about:blank on release and
+    recycled after max_page_uses leases. Crashed or closed contexts are relaunched on next use.
+    """
+
+    def __init__(self, max_page_uses=25):
+        self.max_page_uses = max_page_uses
+        self._playwright = None
+        self._loop = None
+        self._contexts = {}
+        self._idle_pages = {}
+        self._page_uses = {}
+        self._lock = None
+        self.launches = 0
+
+    def _reset_state(self):
+        self._playwright = None
+        self._contexts = {}
+        self._idle_pages = {}
+        self._page_uses = {}
+        self._lock = None
+
+    async def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._playwright and self._loop is not loop:
+            # Playwright objects are bound to the event loop that created them
+            print("  ⚠️ Browser Pool: Event loop changed, discarding browsers from the previous loop.")
+            self._reset_state()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if not self._playwright:
+            self._playwright = await async_playwright().start()
+            self._loop = loop
+
+    @staticmethod
+    def _profile_path(profile):
+        if profile is None:
+            return get_settings().browser_user_data_dir
+        return profile if os.path.isabs(profile) else os.path.join(os.getcwd(), profile)
+
+    async def _close_key(self, key):
+        context = self._contexts.pop(key, None)
+        for page in self._idle_pages.pop(key, []):
+            self._page_uses.pop(page, None)
+        if context:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async def get_context(self, engine="firefox", profile=None, headless=None):
+        """Returns a warm persistent context for (engine, profile), launching or relaunching it if needed."""
+        await self._ensure_started()
+        profile = self._profile_path(profile)
+        key = (engine, profile)
+
+        async with self._lock:
+            context = self._contexts.get(key)
+            if context:
+                return context
+
+            # A profile directory can only be held by one live browser at a time
+            for other in [k for k in self._contexts if k[1] == profile]:
+                print(f"  ♻️ Browser Pool: Releasing {other[0]} to hand profile over to {engine}.")
+                await self._close_key(other)
+
+            if headless is None:
+                headless = get_config().get("headless_browser", True)
+            browser_type = getattr(self._playwright, engine)
+
+            last_error = None
+            for attempt in range(LAUNCH_ATTEMPTS):
+                try:
+                    context = await browser_type.launch_persistent_context(
+                        profile, headless=headless, **ENGINE_LAUNCH_OPTIONS.get(engine, {})
+                    )
+                    break
+                except Exception as e:
+                    last_error = e
+                    print(f"  ⚠️ Browser Pool: Launch of {engine} failed (attempt {attempt + 1}): {e}")
+            else:
+                raise last_error
+
+            self.launches += 1
+            self._contexts[key] = context
+            self._idle_pages[key] = list(context.pages)
+            # Drop the context from the pool if the browser crashes or is closed underneath us
+            context.on("close", lambda _: self._forget(key, context))
+            print(f"  🌐 Browser Pool: Launched {engine} ({'headless' if headless else 'headed'}).")
+            return context
+
+    def _forget(self, key, context):
+        if self._contexts.get(key) is context:
+            self._contexts.pop(key, None)
+            for page in self._idle_pages.pop(key, []):
+                self._page_uses.pop(page, None)
+
+    async def _acquire_page(self, key, engine, profile, headless):
+        idle = self._idle_pages.get(key, [])
+        while idle:
+            page = idle.pop()
+            if not page.is_closed():
+                return page
+            self._page_uses.pop(page, None)
+
+        context = await self.get_context(engine, profile, headless)
+        try:
+            return await context.new_page()
+        except Exception as e:
+            print(f"  ⚠️ Browser Pool: {engine} context unusable ({e}). Restarting...")
+            await self._close_key(key)
+            context = await self.get_context(engine, profile, headless)
+            return await context.new_page()
+
+    async def _release_page(self, key, page):
+        uses = self._page_uses.get(page, 0) + 1
+        self._page_uses[page] = uses
+        if page.is_closed():
+            self._page_uses.pop(page, None)
+            return
+
+        if uses >= self.max_page_uses or key not in self._contexts:
+            self._page_uses.pop(page, None)
+            try:
+                await page.close()
+            except Exception:
+                pass
+            return
+
+        try:
+            await page.unroute_all()
+            await page.goto("about:blank")
+            self._idle_pages.setdefault(key, []).append(page)
+        except Exception:
+            self._page_uses.pop(page, None)
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+    @asynccontextmanager
+    async def lease_page(self, engine="firefox", profile=None, headless=None):
+        """
+        Leases a page from the warm context for (engine, profile). The page is reset and
+        returned to the pool on exit. Callers must remove any event listeners they added.
+        """
+        await self._ensure_started()
+        key = (engine, self._profile_path(profile))
+        page = await self._acquire_page(key, engine, profile, headless)
+        try:
+            yield page
+        finally:
+            await self._release_page(key, page)
+
+    async def shutdown(self):
+        """Closes every pooled context and stops Playwright."""
+        if not self._playwright:
+            return
+        try:
+            if self._loop is asyncio.get_running_loop():
+                for key in list(self._contexts):
+                    await self._close_key(key)
+                await self._playwright.stop()
+        finally:
+            self._reset_state()
+
+
+pool = BrowserPool()
+
+
+def lease_page(engine="firefox", profile=None, headless=None):
+    return pool.lease_page(engine, profile, headless)
+
+
+async def get_context(engine="firefox", profile=None, headless=None):
+    return await pool.get_context(engine, profile, headless)
+
+
+async def shutdown():
+    await pool.shutdown()
+
+
+def run(coro):
+    """asyncio.run() that shuts the browser pool down before the event loop closes."""
+    async def _runner():
+        try:
+            return await coro
+        finally:
+            await shutdown()
+    return asyncio.run(_runner())
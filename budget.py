@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from config import get_config, atomic_write_json
+
+# Spend per hour and stage, so the 24h and 30-day windows roll instead of resetting at midnight
+SPEND_PATH = os.path.join("data", "llm_spend.json")
+HOUR_FORMAT = "%Y-%m-%dT%H"
+WINDOW_HOURS = {"day": 24, "month": 30 * 24}
+
+# Budget levels in escalating order
+LEVELS = ["ok", "throttle", "downgrade", "pause"]
+
+_lock = threading.Lock()
+
+
+def _load():
+    if os.path.exists(SPEND_PATH):
+        try:
+            with open(SPEND_PATH) as f:
+                return json.load(f)
+        except (ValueError, OSError) as e:
+            print(f"  ⚠️ Budget: Ignoring unreadable spend log ({e}).")
+    return {"hours": {}}
+
+
+def _window_spend(hours, window, now):
+    start = (now - timedelta(hours=window - 1)).strftime(HOUR_FORMAT)
+    total, by_stage = 0.0, {}
+    for hour, stages in hours.items():
+        if hour >= start:
+            for stage, cost in stages.items():
+                total += cost
+                by_stage[stage] = by_stage.get(stage, 0.0) + cost
+    return total, by_stage
+
+
+def record_spend(cost, stage):
+    """Adds the cost of one paid LLM call for 'stage' (quantifier, generator, engagement) to the spend log."""
+    if not cost:
+        return
+    now = datetime.now(timezone.utc)
+    with _lock:
+        data = _load()
+        hours = data.setdefault("hours", {})
+        bucket = hours.setdefault(now.strftime(HOUR_FORMAT), {})
+        bucket[stage] = bucket.get(stage, 0.0) + cost
+        # Keep only what the longest window needs
+        oldest = (now - timedelta(hours=WINDOW_HOURS["month"])).strftime(HOUR_FORMAT)
+        data["hours"] = {h: s for h, s in hours.items() if h >= oldest}
+        atomic_write_json(SPEND_PATH, data)
+
+
+def get_budget_status(cfg=None):
+    """Spend and caps for the rolling day and month, and the resulting budget level."""
+    cfg = cfg or get_config()
+    now = datetime.now(timezone.utc)
+    hours = _load().get("hours", {})
+    status = {"windows": {}}
+    worst = 0.0
+    for name, window in WINDOW_HOURS.items():
+        spent, by_stage = _window_spend(hours, window, now)
+        cap = cfg.get(f"llm_{'daily' if name == 'day' else 'monthly'}_budget_usd", 0) or 0
+        ratio = spent / cap if cap > 0 else 0.0
+        worst = max(worst, ratio)
+        status["windows"][name] = {"spent": round(spent, 6), "cap": cap, "used": round(ratio, 4),
+                                   "by_stage": {s: round(c, 6) for s, c in by_stage.items()}}
+
+    level = "ok"
+    if worst >= 1.0:
+        level = "pause"
+    elif worst >= cfg.get("budget_downgrade_ratio", 0.9):
+        level = "downgrade"
+    elif worst >= cfg.get("budget_throttle_ratio", 0.75):
+        level = "throttle"
+    status["level"] = level
+    return status
+
+
+def budget_level(cfg=None):
+    return get_budget_status(cfg)["level"]
+
+
+def is_paused(cfg=None):
+    return budget_level(cfg) == "pause"
+
+
+def budget_concurrency(concurrency, cfg=None):
+    """Concurrent LLM calls allowed at the current budget level."""
+    cfg = cfg or get_config()
+    if LEVELS.index(budget_level(cfg)) >= LEVELS.index("throttle"):
+        return max(1, min(concurrency, cfg.get("budget_throttled_concurrency", 1)))
+    return concurrency
+
+
+def budget_model(model_name, cfg=None):
+    """
+    The model to use at the current budget level: near the cap, expensive models fall back to
+    budget_fallback_model (default: the quantifier model).
+    """
+    cfg = cfg or get_config()
+    if LEVELS.index(budget_level(cfg)) >= LEVELS.index("downgrade"):
+        fallback = cfg.get("budget_fallback_model") or cfg.get("quantifier_model", model_name)
+        if fallback != model_name:
+            return fallback
+    return model_name
+
+
+def report_budget(cfg=None):
+    status = get_budget_status(cfg)
+    day, month = status["windows"]["day"], status["windows"]["month"]
+    if not day["cap"] and not month["cap"]:
+        return status
+    icon = {"ok": "💰", "throttle": "🐢", "downgrade": "⬇️", "pause": "⏸️"}[status["level"]]
+    print(f"  {icon} Budget: ${day['spent']:.4f}/{day['cap'] or '∞'} (24h), ${month['spent']:.4f}/{month['cap'] or '∞'} (30d). Level: {status['level']}.")
+    return status
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+from config import get_config
+from browser_pool import lease_page
+
+# Cookies that anti-bot interstitials set once the browser has passed the check
+CLEARANCE_COOKIES = ("cf_clearance",)
+CHALLENGE_TITLE_MARKERS = ("Verifying", "Cloudflare", "Just a moment")
+# Re-solve a little before the cookie actually expires
+EXPIRY_MARGIN_SECONDS = 60
+
+# mirror -> unix time until which it is known to let us straight through
+_cleared_until = {}
+
+
+def is_challenge_title(title):
+    return any(marker in (title or "") for marker in CHALLENGE_TITLE_MARKERS)
+
+
+def _host(mirror):
+    return urlparse(mirror).hostname or mirror
+
+
+async def _cookie_expiry(context, mirror):
+    """Returns the expiry of the mirror's clearance cookie in the shared context, or None if it has none."""
+    host = _host(mirror)
+    for cookie in await context.cookies(mirror):
+        if cookie["name"] in CLEARANCE_COOKIES and host.endswith(cookie.get("domain", "").lstrip(".")):
+            expires = cookie.get("expires", -1)
+            # Session cookies (-1) live as long as the browser; treat them like a mirror without a cookie
+            return expires if expires and expires > 0 else None
+    return None
+
+
+async def _record_clearance(context, mirror, cfg):
+    expires = await _cookie_expiry(context, mirror)
+    if expires is None:
+        # No cookie to track (no challenge on this mirror, or a session cookie): trust it for a cycle
+        expires = time.time() + cfg.get("clearance_ttl_seconds", cfg.get("refresh_seconds", 1800))
+    _cleared_until[mirror] = expires
+    return expires
+
+
+def is_cleared(mirror):
+    return _cleared_until.get(mirror, 0) - EXPIRY_MARGIN_SECONDS > time.time()
+
+
+def invalidate(mirror):
+    """Called when a mirror challenges us despite a recorded clearance (cookie revoked or expired early)."""
+    if _cleared_until.pop(mirror, None) is not None:
+        print(f"  🔐 Clearance for {mirror} no longer accepted.")
+
+
+async def wait_for_clearance(page, mirror, cfg=None):
+    """
+    Waits for the anti-bot interstitial on 'page' to pass (reloading once halfway through) and records
+    the resulting clearance. Returns True if the page is past the challenge.
+    """
+    cfg = cfg or get_config()
+    timeout = cfg.get("clearance_timeout_seconds", 20)
+    invalidate(mirror)
+    print(f"  ⏳ Negotiating anti-bot on {mirror}...")
+
+    start = time.time()
+    reloaded = False
+    while time.time() - start < timeout:
+        try:
+            if not is_challenge_title(await page.title()):
+                expires = await _record_clearance(page.context, mirror, cfg)
+                print(f"  🔓 Cleared {mirror} in {time.time() - start:.1f}s (valid for {max(0, int(expires - time.time())) // 60} min).")
+                return True
+        except Exception:
+            pass  # Title is unavailable while the challenge navigates
+        if not reloaded and time.time() - start > timeout / 2:
+            reloaded = True
+            try: await page.reload(wait_until="domcontentloaded")
+            except: pass
+        await asyncio.sleep(0.25)
+
+    print(f"  ❌ Anti-bot on {mirror} did not clear within {timeout}s.")
+    return False
+
+
+async def _warm_mirror(mirror, profile, cfg):
+    async with lease_page("firefox", profile) as page:
+        expires = await _cookie_expiry(page.context, mirror)
+        if expires and expires - EXPIRY_MARGIN_SECONDS > time.time():
+            _cleared_until[mirror] = expires
+            return True
+        try:
+            await page.goto(mirror, wait_until="domcontentloaded", timeout=cfg.get("browser_timeout_seconds", 30) * 1000)
+            if is_challenge_title(await page.title()):
+                return await wait_for_clearance(page, mirror, cfg)
+            await _record_clearance(page.context, mirror, cfg)
+            return True
+        except Exception as e:
+            print(f"  ⚠️ Could not pre-warm {mirror}: {e}")
+            return False
+
+
+async def prewarm_mirrors(mirrors, profile=None):
+    """
+    Solves the anti-bot check of every mirror not already cleared, in parallel pages of the shared
+    browser context, so the per-handle loop starts with valid clearance cookies.
+    """
+    cfg = get_config()
+    pending = [m for m in mirrors if not is_cleared(m)]
+    if not pending:
+        return
+    start = time.time()
+    results = await asyncio.gather(*(_warm_mirror(m, profile, cfg) for m in pending))
+    print(f"  🔐 Pre-warmed {sum(results)}/{len(pending)} mirrors in {time.time() - start:.1f}s.")
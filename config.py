@@ -0,0 +1,179 @@
+import atexit
+import json
+import os
+import shutil
+import tempfile
+
+CONFIG_PATH = os.path.join("config_user", "config.json")
+# Runtime state (source prioritisation, mirror demotions) lives outside the user-edited config
+STATE_PATH = os.path.join("data", "runtime_state.json")
+
+_config_cache = {"mtime": None, "data": {}}
+_state = None
+_state_dirty = False
+
+
+def atomic_write_json(file_path, data):
+    """Writes JSON data atomically to a file using a temporary file."""
+    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".")
+    try:
+        with os.fdopen(temp_fd, 'w') as f:
+            json.dump(data, f, indent=4)
+        shutil.move(temp_path, file_path)
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise e
+
+
+def _load_config_file():
+    """Re-parses config.json only when its mtime changes. Keeps the last good copy on parse errors."""
+    try:
+        mtime = os.path.getmtime(CONFIG_PATH)
+    except OSError:
+        return _config_cache["data"]
+
+    if mtime != _config_cache["mtime"]:
+        try:
+            with open(CONFIG_PATH) as f:
+                data = json.load(f)
+            if _config_cache["mtime"] is not None:
+                print("  🔄 Config: config.json changed on disk, reloaded.")
+            _config_cache["data"] = data
+            _config_cache["mtime"] = mtime
+        except (ValueError, OSError) as e:
+            print(f"  ⚠️ Config: Could not reload config.json ({e}). Keeping previous settings.")
+    return _config_cache["data"]
+
+
+def _load_state():
+    global _state
+    if _state is None:
+        _state = {}
+        if os.path.exists(STATE_PATH):
+            try:
+                with open(STATE_PATH) as f:
+                    _state = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"  ⚠️ Config: Ignoring unreadable runtime state ({e}).")
+    return _state
+
+
+def get_config():
+    """
+    Returns the current configuration as a dict: config.json (revalidated on mtime change)
+    overlaid with runtime state. The returned dict is a fresh shallow copy; do not rely on
+    mutating it to persist anything.
+    """
+    cfg = dict(_load_config_file())
+    state = _load_state()
+
+    for key in ("last_successful_source", "last_successful_nitter_mirror"):
+        if state.get(key):
+            cfg[key] = state[key]
+
+    demoted = state.get("demoted_nitter_mirrors", [])
+    if demoted and "nitter_mirrors" in cfg:
+        mirrors = cfg["nitter_mirrors"]
+        cfg["nitter_mirrors"] = [m for m in mirrors if m not in demoted] + [m for m in demoted if m in mirrors]
+    return cfg
+
+
+def get_state(key, default=None):
+    return _load_state().get(key, default)
+
+
+def set_state(key, value):
+    """Updates runtime state in memory. Persisted by flush_state(), at most once per cycle."""
+    global _state_dirty
+    state = _load_state()
+    if state.get(key) != value:
+        state[key] = value
+        _state_dirty = True
+
+
+def flush_state():
+    """Writes runtime state to disk if anything changed since the last flush."""
+    global _state_dirty
+    if not _state_dirty:
+        return
+    try:
+        os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+        atomic_write_json(STATE_PATH, _load_state())
+        _state_dirty = False
+    except Exception as e:
+        print(f"Error saving runtime state: {e}")
+
+
+atexit.register(flush_state)
+
+
+class Settings:
+    """Typed, read-only view over get_config() for the most commonly used keys."""
+
+    def __init__(self, raw=None):
+        self.raw = raw if raw is not None else get_config()
+
+    def get(self, key, default=None):
+        return self.raw.get(key, default)
+
+    @property
+    def handles(self) -> list:
+        return list(self.raw.get("handles", []))
+
+    @property
+    def refresh_seconds(self) -> int:
+        return int(self.raw.get("refresh_seconds", 3600))
+
+    @property
+    def quantifier_threshold(self) -> int:
+        return int(self.raw.get("quantifier_threshold", 80))
+
+    @property
+    def qualify_age_limit_hours(self) -> float:
+        return float(self.raw.get("qualify_age_limit_hours", 12))
+
+    @property
+    def workflow_mode(self) -> str:
+        return self.raw.get("workflow_mode", "draft")
+
+    @property
+    def test_mode(self) -> bool:
+        return bool(self.raw.get("test_mode", False))
+
+    @property
+    def headless_browser(self) -> bool:
+        return bool(self.raw.get("headless_browser", True))
+
+    @property
+    def browser_user_data_dir(self) -> str:
+        path = self.raw.get("browser_user_data_dir", "data/browser_session")
+        return path if os.path.isabs(path) else os.path.join(os.getcwd(), path)
+
+    @property
+    def nitter_mirrors(self) -> list:
+        return list(self.raw.get("nitter_mirrors", []))
+
+    @property
+    def last_successful_source(self) -> str:
+        return self.raw.get("last_successful_source", "https://x.com")
+
+    @property
+    def quantifier_model(self) -> str:
+        return self.raw.get("quantifier_model", "gemini-1.5-flash")
+
+    @property
+    def drafter_model(self) -> str:
+        return self.raw.get("drafter_model", "gemini-2.5-pro")
+
+    @property
+    def ai_models(self) -> dict:
+        return dict(self.raw.get("ai_models", {}))
+
+    @property
+    def blacklist_words(self) -> list:
+        return [w.lower() for w in self.raw.get("blacklist_words", [])]
+
+
+def get_settings():
+    return Settings(get_config())
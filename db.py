@@ -1,8 +1,12 @@
 import csv
+import json
 import os
 import shutil
 import sqlite3
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from fingerprint import content_fingerprint, simhash
 
 # Ensure data directory exists
 DATA_DIR = "data"
@@ -10,6 +14,8 @@ if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
 POSTS_CSV = os.path.join(DATA_DIR, "posts.csv")
+# Taken around every posts.csv append and rewrite so a rewrite never drops rows appended meanwhile
+POSTS_LOCK = POSTS_CSV + ".lock"
 HANDLES_CSV = os.path.join(DATA_DIR, "handles.csv")
 REPLIES_CSV = os.path.join(DATA_DIR, "replies.csv")
 ENGAGEMENT_CSV = os.path.join(DATA_DIR, "engagement.csv")
@@ -18,6 +24,75 @@ PENDING_REPLIES_CSV = os.path.join(DATA_DIR, "pending_replies.csv")
 POSTED_REPLIES_CSV = os.path.join(DATA_DIR, "posted_replies.csv")
 SCORECARD_CSV = os.path.join(DATA_DIR, "scorecard.csv")
 
+# When set (sharded scraper workers), scraper writes are sent to the parent process instead of the CSVs
+_write_queue = None
+
+POST_FIELDNAMES = ["post_id", "handle", "content", "scraped_at", "posted_at", "score", "is_reply", "is_pinned", "has_image", "has_video", "has_link", "link_url", "media_url", "is_retweet", "retweet_source", "quantification_cost", "replied_to", "reply_post_id", "content_fingerprint", "simhash", "scored_at", "score_source"]
+
+
+def set_write_queue(queue):
+    """Routes add_post/add_posts_batch/update_handle_check/log_scraper_performance through 'queue'."""
+    global _write_queue
+    _write_queue = queue
+
+def drain_write_queue(queue, timeout=1.0):
+    """
+    Single-writer side of the sharded scraper: applies queued writes from workers.
+    Returns the non-write messages (e.g. worker status) received, or [] after 'timeout' seconds idle.
+    """
+    import queue as queue_module
+    writers = {
+        "add_post": add_post,
+        "add_posts_batch": add_posts_batch,
+        "update_handle_check": update_handle_check,
+        "log_scraper_performance": log_scraper_performance,
+    }
+    others = []
+    try:
+        msg = queue.get(timeout=timeout)
+    except queue_module.Empty:
+        return others
+    while True:
+        if msg[0] == "write":
+            _, name, args, kwargs = msg
+            try:
+                writers[name](*args, **kwargs)
+            except Exception as e:
+                print(f"  ❌ DB writer error in {name}: {e}")
+        else:
+            others.append(msg)
+        try:
+            msg = queue.get_nowait()
+        except queue_module.Empty:
+            return others
+
+@contextmanager
+def posts_lock():
+    """Exclusive lock on posts.csv across processes (no-op where fcntl is unavailable)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(POSTS_LOCK, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _rewrite_posts(rows, fieldnames):
+    """Atomically replaces posts.csv: writes a temp file next to it, then renames it over the original."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(POSTS_CSV) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, POSTS_CSV)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 def get_conn():
     # Deprecated SQLite connection
@@ -29,7 +104,7 @@ def init_db():
         with open(POSTS_CSV, 'w', newline='') as f:
             writer = csv.writer(f, quoting=csv.QUOTE_ALL)
             # Added score, is_reply, is_pinned + media flags + link_url + AI cost/reply tracking
-            writer.writerow(["post_id", "handle", "content", "scraped_at", "posted_at", "score", "is_reply", "is_pinned", "has_image", "has_video", "has_link", "link_url", "media_url", "is_retweet", "retweet_source", "quantification_cost", "replied_to", "reply_post_id"])
+            writer.writerow(POST_FIELDNAMES)
     
     if not os.path.exists(POSTED_REPLIES_CSV):
         with open(POSTED_REPLIES_CSV, 'w', newline='') as f:
@@ -41,7 +116,7 @@ def init_db():
         # Create consolidated replies CSV
         with open(REPLIES_CSV, 'w', newline='') as f:
             writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-            writer.writerow(['id', 'target_post_id', 'handle', 'content', 'status', 'created_at', 'posted_at', 'generation_model', 'generation_cost', 'insight', 'reply_tweet_id', 'nostr_event_id', 'posted_to_nostr', 'qualifier_reason'])
+            writer.writerow(['id', 'target_post_id', 'handle', 'content', 'status', 'created_at', 'posted_at', 'generation_model', 'generation_cost', 'insight', 'reply_tweet_id', 'nostr_event_id', 'posted_to_nostr', 'qualifier_reason', 'alternates'])
             
     if not os.path.exists(ENGAGEMENT_CSV):
         with open(ENGAGEMENT_CSV, 'w', newline='') as f:
@@ -58,7 +133,7 @@ def init_db():
             p_header = next(reader, None)
         
         if p_header:
-            new_cols = ['media_url', 'is_retweet', 'retweet_source', 'quantification_cost', 'replied_to', 'reply_post_id']
+            new_cols = ['media_url', 'is_retweet', 'retweet_source', 'quantification_cost', 'replied_to', 'reply_post_id', 'content_fingerprint', 'simhash', 'scored_at', 'score_source']
             cols_to_add = [c for c in new_cols if c not in p_header]
             
             if cols_to_add:
@@ -93,7 +168,7 @@ def init_db():
             r_header = next(reader, None)
         
         if r_header:
-            new_cols = ['nostr_event_id', 'posted_to_nostr', 'qualifier_reason']
+            new_cols = ['nostr_event_id', 'posted_to_nostr', 'qualifier_reason', 'alternates']
             cols_to_add = [c for c in new_cols if c not in r_header]
             
             if cols_to_add:
@@ -126,13 +201,19 @@ def add_post(post_id, handle, content, score="", is_reply=False, is_pinned=False
     now = datetime.now(timezone.utc)
     if not posted_at:
         posted_at = now.isoformat()
+
+    if _write_queue is not None:
+        if (str(post_id), handle.lower()) in get_existing_post_keys():
+            return False
+        _write_queue.put(("write", "add_post", (post_id, handle, content), dict(score=score, is_reply=is_reply, is_pinned=is_pinned, has_image=has_image, has_video=has_video, has_link=has_link, link_url=link_url, media_url=media_url, is_retweet=is_retweet, retweet_source=retweet_source, posted_at=posted_at)))
+        return True
     
     # Try to normalize posted_at early if it is a simple date
     # This helps with alphabetical sort if we still use it (though feed_app fixes it)
     
     # Optimized: Check existence first, then append.
     # No sorting on write.
-    fieldnames = ["post_id", "handle", "content", "scraped_at", "posted_at", "score", "is_reply", "is_pinned", "has_image", "has_video", "has_link", "link_url", "media_url", "is_retweet", "retweet_source", "quantification_cost", "replied_to", "reply_post_id"]
+    fieldnames = POST_FIELDNAMES
     
     existing_keys = get_existing_post_keys()
     if (str(post_id), handle.lower()) in existing_keys:
@@ -161,40 +242,132 @@ def add_post(post_id, handle, content, score="", is_reply=False, is_pinned=False
         "retweet_source": retweet_source,
         "quantification_cost": 0.0,
         "replied_to": False,
-        "reply_post_id": ""
+        "reply_post_id": "",
+        "content_fingerprint": content_fingerprint(content),
+        "simhash": f"{simhash(content):016x}",
+        "scored_at": now.isoformat() if score not in ("", None) else "",
+        "score_source": ""
     }
     
     # Append to file
-    with open(POSTS_CSV, 'a', newline='') as f:
+    with posts_lock(), open(POSTS_CSV, 'a', newline='') as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
         # Ensure we don't write header here assuming it exists (init_db handles creation)
         writer.writerow(new_row)
         
     return True
 
-def update_post_score(post_id, score):
+def add_posts_batch(handle, posts):
+    """
+    Appends several scraped posts for one handle with a single duplicate scan and a single write.
+    'posts' are dicts with add_post keyword fields (post_id, content, posted_at, is_reply, ...).
+    Returns the list of posts that were actually new.
+    """
+    if not posts:
+        return []
+
+    now = datetime.now(timezone.utc).isoformat()
+    existing_keys = get_existing_post_keys()
+
+    if _write_queue is not None:
+        # Worker side: report what looks new; the writer process does the authoritative duplicate check
+        new_posts = [p for p in posts if (str(p["post_id"]), handle.lower()) not in existing_keys]
+        if new_posts:
+            _write_queue.put(("write", "add_posts_batch", (handle, new_posts), {}))
+        return new_posts
+    added = []
     rows = []
-    updated = False
-    fieldnames = []
-    if os.path.exists(POSTS_CSV):
+    for post in posts:
+        key = (str(post["post_id"]), handle.lower())
+        if key in existing_keys:
+            continue
+        existing_keys.add(key)
+
+        content = post.get("content") or ""
+        rows.append({
+            "post_id": post["post_id"],
+            "handle": handle,
+            "content": content.replace("\r", ""),
+            "scraped_at": now,
+            "posted_at": post.get("posted_at") or now,
+            "score": post.get("score", ""),
+            "is_reply": post.get("is_reply", False),
+            "is_pinned": post.get("is_pinned", False),
+            "has_image": post.get("has_image", False),
+            "has_video": post.get("has_video", False),
+            "has_link": post.get("has_link", False),
+            "link_url": post.get("link_url", ""),
+            "media_url": post.get("media_url", ""),
+            "is_retweet": post.get("is_retweet", False),
+            "retweet_source": post.get("retweet_source", ""),
+            "quantification_cost": 0.0,
+            "replied_to": False,
+            "reply_post_id": "",
+            "content_fingerprint": content_fingerprint(content),
+            "simhash": f"{simhash(content):016x}",
+            "scored_at": now if post.get("score", "") != "" else "",
+            "score_source": ""
+        })
+        added.append(post)
+
+    if rows:
+        with posts_lock(), open(POSTS_CSV, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=POST_FIELDNAMES, quoting=csv.QUOTE_ALL)
+            writer.writerows(rows)
+    return added
+
+def update_post_score(post_id, score):
+    with posts_lock():
+        rows = []
+        updated = False
+        fieldnames = []
+        if os.path.exists(POSTS_CSV):
+            with open(POSTS_CSV, 'r', newline='') as f:
+                reader = csv.DictReader(f)
+                fieldnames = reader.fieldnames
+                for row in reader:
+                    if row['post_id'] == str(post_id): # Ensure comparison is type-safe
+                        row['score'] = score
+                        updated = True
+                    rows.append(row)
+
+        if updated:
+            # Optimized: No sort on update, just rewrite (CSV limitation)
+            _rewrite_posts(rows, fieldnames)
+
+def update_post_scores(updates):
+    """
+    Applies several score updates in one locked, atomic rewrite of posts.csv.
+    'updates' maps (post_id, handle) to a dict of fields to set, e.g. {'score': 85, 'quantification_cost': 0.0001}.
+    Rows appended by the scraper in the meantime are kept. Returns the number of rows updated.
+    """
+    if not updates or not os.path.exists(POSTS_CSV):
+        return 0
+    updates = {(str(post_id), handle.lower()): fields for (post_id, handle), fields in updates.items()}
+
+    with posts_lock():
         with open(POSTS_CSV, 'r', newline='') as f:
             reader = csv.DictReader(f)
-            fieldnames = reader.fieldnames
-            for row in reader:
-                if row['post_id'] == str(post_id): # Ensure comparison is type-safe
-                    row['score'] = score
-                    updated = True
-                rows.append(row)
-    
-    if updated:
-        # Optimized: No sort on update, just rewrite (CSV limitation)
-        # rows.sort(key=lambda x: x.get('posted_at', ''), reverse=True) 
-        with open(POSTS_CSV, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-            writer.writeheader()
-            writer.writerows(rows)
+            fieldnames = list(reader.fieldnames or POST_FIELDNAMES)
+            rows = list(reader)
+        for fields in updates.values():
+            fieldnames += [c for c in fields if c not in fieldnames]
+
+        updated = 0
+        for row in rows:
+            fields = updates.get((row['post_id'], row['handle'].lower()))
+            if fields:
+                row.update(fields)
+                updated += 1
+        if updated:
+            _rewrite_posts(rows, fieldnames)
+    return updated
 
 def update_handle_check(handle):
+    if _write_queue is not None:
+        _write_queue.put(("write", "update_handle_check", (handle,), {}))
+        return
+
     rows = []
     found = False
     now = datetime.now(timezone.utc).isoformat()
@@ -222,6 +395,16 @@ def update_handle_check(handle):
         writer.writeheader()
         writer.writerows(rows)
 
+def get_handle_checks():
+    """Returns {handle: last_checked_iso} from handles.csv."""
+    checks = {}
+    if os.path.exists(HANDLES_CSV):
+        with open(HANDLES_CSV, 'r', newline='') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                checks[row['handle']] = row.get('last_checked', '')
+    return checks
+
 def get_latest_post_id(handle):
     latest_id = None
     latest_time = ""
@@ -335,7 +518,7 @@ def migrate_replies():
         shutil.move(POSTED_REPLIES_CSV, os.path.join(archive_dir, f"posted_replies_migrated_{int(datetime.now().timestamp())}.csv"))
 
     # Append to replies.csv
-    fieldnames = ['id', 'target_post_id', 'handle', 'content', 'status', 'created_at', 'posted_at', 'generation_model', 'generation_cost', 'insight', 'reply_tweet_id', 'nostr_event_id', 'posted_to_nostr', 'qualifier_reason']
+    fieldnames = ['id', 'target_post_id', 'handle', 'content', 'status', 'created_at', 'posted_at', 'generation_model', 'generation_cost', 'insight', 'reply_tweet_id', 'nostr_event_id', 'posted_to_nostr', 'qualifier_reason', 'alternates']
     
     existing_ids = set()
     if os.path.exists(REPLIES_CSV):
@@ -356,7 +539,7 @@ def migrate_replies():
     
     print(f"Migrated {len(replies)} replies to replies.csv.")
 
-def add_reply(post_id, handle, content, status="pending", generation_model="unknown", cost=0.0, insight="", qualifier_reason=""):
+def add_reply(post_id, handle, content, status="pending", generation_model="unknown", cost=0.0, insight="", qualifier_reason="", alternates=None):
     max_id = 0
     if os.path.exists(REPLIES_CSV):
          with open(REPLIES_CSV, 'r', newline='') as f:
@@ -385,8 +568,10 @@ def add_reply(post_id, handle, content, status="pending", generation_model="unkn
             "",
             "",
             "N",
-            qualifier_reason
+            qualifier_reason,
+            json.dumps(alternates) if alternates else ""
         ])
+    return max_id + 1
 
 def get_pending_replies(status='pending'):
     replies = []
@@ -398,6 +583,17 @@ def get_pending_replies(status='pending'):
                     replies.append(row)
     return replies
 
+def get_reply_texts(statuses=("pending", "qualified", "posted"), limit=500):
+    """Contents of the newest 'limit' replies with one of 'statuses', oldest first."""
+    texts = []
+    if os.path.exists(REPLIES_CSV):
+        with open(REPLIES_CSV, 'r', newline='') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                if row['status'] in statuses and row.get('content'):
+                    texts.append(row['content'])
+    return texts[-limit:]
+
 def get_qualified_replies():
     return get_pending_replies(status='qualified')
 
@@ -477,6 +673,11 @@ def mark_replies_batch(updates):
                     
                     if 'qualifier_reason' in upd:
                         row['qualifier_reason'] = upd['qualifier_reason']
+                    # A rejected draft replaced by one of its alternates
+                    if 'content' in upd:
+                        row['content'] = upd['content']
+                    if 'alternates' in upd:
+                        row['alternates'] = json.dumps(upd['alternates']) if upd['alternates'] else ""
                 else:
                     row['status'] = upd
                     if upd == 'posted':
@@ -560,6 +761,10 @@ def get_existing_post_keys():
     return keys
 
 def log_scraper_performance(source, handle, success, latency, posts_scraped=0, new_posts_found=0, error_msg=""):
+    if _write_queue is not None:
+        _write_queue.put(("write", "log_scraper_performance", (source, handle, success, latency, posts_scraped, new_posts_found, error_msg), {}))
+        return
+
     with open(SCORECARD_CSV, 'a', newline='') as f:
         writer = csv.writer(f, quoting=csv.QUOTE_ALL)
         writer.writerow([
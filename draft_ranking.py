@@ -0,0 +1,93 @@
+import json
+import re
+from fingerprint import normalize_text
+
+# Drafting guideline; the X limit (280) leaves room for the emoji tag
+MAX_REPLY_CHARS = 220
+MARKDOWN = re.compile(r"\*|__|`|\[[^\]]*\]\([^)]*\)|^\s*(#+|>|-|\d+\.)\s", re.M)
+HASHTAG = re.compile(r"(^|\s)#\w")
+# The persona rules out em/en dashes; replies must not end with punctuation
+FORBIDDEN_CHARS = "—–"
+END_PUNCTUATION = ".!?,;:"
+# Too common to say anything about persona fit
+STOPWORDS = frozenset("""
+    the and for are but not you your with this that from have has was were they them their its our out all can
+    will just what when who how why into over than then there these those about more most some such only own same
+    very also been being one use any
+""".split())
+
+# Schema for draft_candidates > 1 (Gemini response_schema)
+CANDIDATES_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "candidates": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"reply": {"type": "STRING"}, "insight": {"type": "STRING"}},
+                "required": ["reply", "insight"],
+            },
+        },
+    },
+    "required": ["candidates"],
+}
+
+
+def content_words(text):
+    return {w for w in normalize_text(text).split() if len(w) > 2 and w not in STOPWORDS}
+
+
+def format_problems(text):
+    """Guideline violations in a draft: length, markdown, hashtag, dash, end_punctuation."""
+    problems = []
+    if len(text) > MAX_REPLY_CHARS:
+        problems.append("length")
+    if MARKDOWN.search(text):
+        problems.append("markdown")
+    if HASHTAG.search(text):
+        problems.append("hashtag")
+    if any(c in text for c in FORBIDDEN_CHARS):
+        problems.append("dash")
+    if text.rstrip()[-1:] in END_PUNCTUATION:
+        problems.append("end_punctuation")
+    return problems
+
+
+def novelty(words, past_replies):
+    """1 minus the highest word-set Jaccard similarity to any past reply (1.0 = nothing like it before)."""
+    if not words:
+        return 0.0
+    overlap = max((len(words & past) / len(words | past) for past in past_replies if past), default=0.0)
+    return 1.0 - overlap
+
+
+def rank_drafts(candidates, past_replies, persona_text):
+    """
+    Orders [(reply, insight)] best first. Each guideline violation costs a full point (overlong drafts a
+    little more per extra character); novelty against past_replies (word sets) and the share of words
+    that are persona keywords add up to 1 and 0.5. Empty drafts are dropped.
+    """
+    keywords = content_words(persona_text)
+    ranked = []
+    for reply, insight in candidates:
+        if not reply:
+            continue
+        words = content_words(reply)
+        problems = format_problems(reply)
+        score = -len(problems) - max(0, len(reply) - MAX_REPLY_CHARS) / 100
+        score += novelty(words, past_replies)
+        score += 0.5 * len(words & keywords) / max(1, len(words))
+        ranked.append((score, reply, insight))
+    ranked.sort(key=lambda r: r[0], reverse=True)
+    return [(reply, insight) for _, reply, insight in ranked]
+
+
+def parse_alternates(value):
+    """The alternates column of replies.csv as a list of reply texts."""
+    if not value:
+        return []
+    try:
+        alternates = json.loads(value)
+    except ValueError:
+        return []
+    return [a for a in alternates if isinstance(a, str) and a]
@@ -0,0 +1,61 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from scheduler import parse_posted_at
+
+# posts.csv score for posts we would never reply to under the current settings
+INELIGIBLE = "ineligible"
+# Settings ineligible_reason depends on; marks made under other values are re-checked
+ELIGIBILITY_SETTINGS = ("twitter_handle", "reply_to_replies", "reply_to_reposts", "qualify_age_limit_hours", "blacklist_words")
+
+
+def ineligible_reason(row, cfg, now=None):
+    """
+    Returns why a post can never get a reply under the current settings ("own_post", "reply", "retweet",
+    "expired" or "blacklist"), or None if it is eligible. Shared by the quantifier and the generator.
+    """
+    own_handle = cfg.get("twitter_handle", "").lstrip("@").lower()
+    if own_handle and row.get("handle", "").lower() == own_handle:
+        return "own_post"
+    if row.get("is_reply", "False") == "True" and not cfg.get("reply_to_replies", False):
+        return "reply"
+    if row.get("is_retweet", "False") == "True" and not cfg.get("reply_to_reposts", False):
+        return "retweet"
+
+    # Unparseable dates stay eligible; the qualifier re-checks age before posting
+    posted_at = parse_posted_at(row.get("posted_at"))
+    if posted_at:
+        age_hours = ((now or datetime.now(timezone.utc)) - posted_at).total_seconds() / 3600
+        if age_hours > cfg.get("qualify_age_limit_hours", 12):
+            return "expired"
+
+    content = (row.get("content") or "").lower()
+    if any(word.lower() in content for word in cfg.get("blacklist_words", [])):
+        return "blacklist"
+    return None
+
+
+def eligibility_key(cfg):
+    """Short hash of the eligibility settings, stored in score_source with each ineligible mark."""
+    settings = json.dumps([cfg.get(name) for name in ELIGIBILITY_SETTINGS], default=str)
+    return hashlib.sha1(settings.encode("utf-8")).hexdigest()[:8]
+
+
+def ineligible_source(reason, key):
+    return f"{INELIGIBLE}:{reason}:{key}"
+
+
+def stale_ineligible(row, key):
+    """True if the post was marked ineligible under other settings (or before marks carried a key)."""
+    return row.get("score") == INELIGIBLE and not (row.get("score_source") or "").endswith(f":{key}")
+
+
+def report_ineligible(reasons, cost_per_post):
+    """Prints the ineligible posts by reason and the LLM spend skipping them avoided."""
+    if not reasons:
+        return
+    counts = {}
+    for reason in reasons:
+        counts[reason] = counts.get(reason, 0) + 1
+    breakdown = ", ".join(f"{reason} {n}" for reason, n in sorted(counts.items(), key=lambda kv: -kv[1]))
+    print(f"  🚫 Eligibility: {len(reasons)} posts marked {INELIGIBLE} ({breakdown}), ~${len(reasons) * cost_per_post:.5f} LLM spend avoided.")
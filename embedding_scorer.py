@@ -0,0 +1,204 @@
+import hashlib
+import os
+import numpy as np
+from fingerprint import normalize_text
+
+INDEX_PATH = os.path.join("data", "embedding_index.npz")
+# Posts per embed_content request
+EMBED_BATCH_SIZE = 100
+
+
+class HashingEmbedder:
+    """Deterministic local embedder (signed feature hashing of words and word pairs). No API calls; used in tests and test_mode."""
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = normalize_text(text).split()
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+                matrix[row, h % self.dim] += 1.0 if h >> 63 else -1.0
+        return matrix, 0.0
+
+
+class GeminiEmbedder:
+    """Gemini embedding model. embed() returns (matrix, cost)."""
+
+    def __init__(self, client, model, cost_fn=None):
+        self.client = client
+        self.model = model
+        self.name = model
+        self.cost_fn = cost_fn
+
+    def embed(self, texts):
+        vectors, cost = [], 0.0
+        for i in range(0, len(texts), EMBED_BATCH_SIZE):
+            chunk = texts[i:i + EMBED_BATCH_SIZE]
+            result = self.client.models.embed_content(model=self.model, contents=chunk)
+            vectors += [e.values for e in result.embeddings]
+            if self.cost_fn:
+                cost += self.cost_fn(self.model, sum(len(t) for t in chunk) // 4, 0)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1), cost
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _top_k_mean(similarities, k):
+    """Mean of the k largest values in each row (all columns when there are fewer than k)."""
+    if similarities.shape[1] == 0:
+        return np.zeros(similarities.shape[0], dtype=np.float32)
+    k = min(k, similarities.shape[1])
+    return np.partition(similarities, -k, axis=1)[:, -k:].mean(axis=1)
+
+
+class EmbeddingIndex:
+    """
+    Unit vectors of brand.txt and of historically high- and low-scoring posts. A post's raw relevance is
+    its similarity to the brand plus its nearest high exemplars minus its nearest low exemplars;
+    calibrate() maps that onto the 0-100 quantifier scale with a linear fit to the exemplars' LLM scores.
+    """
+
+    def __init__(self, embedder, top_k=5):
+        self.embedder = embedder
+        self.top_k = top_k
+        self.brand_hash = ""
+        self.brand = None
+        self.ids = []
+        self.labels = np.zeros(0, dtype=np.int8)  # 1 = high exemplar, 0 = low exemplar
+        self.vectors = None
+        self.scale = None  # (slope, intercept) from calibrate()
+        self.cost = 0.0
+
+    def _embed(self, texts):
+        matrix, cost = self.embedder.embed(texts)
+        self.cost += cost
+        return _normalize_rows(matrix)
+
+    def set_brand(self, brand_text):
+        brand_hash = hashlib.sha1(brand_text.encode("utf-8")).hexdigest()
+        if brand_hash != self.brand_hash:
+            self.brand = self._embed([brand_text])[0]
+            self.brand_hash = brand_hash
+            self.scale = None
+
+    def add_exemplars(self, samples):
+        """Embeds only exemplars not yet in the index. samples: [(post_id, content, is_high)]. Returns how many were added."""
+        known = set(self.ids)
+        new = [s for s in samples if s[0] not in known]
+        if not new:
+            return 0
+        vectors = self._embed([content for _, content, _ in new])
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+        self.ids += [post_id for post_id, _, _ in new]
+        self.labels = np.concatenate([self.labels, np.array([int(high) for _, _, high in new], dtype=np.int8)])
+        self.scale = None
+        return len(new)
+
+    def retain(self, post_ids):
+        """Drops exemplars not in post_ids (aged out of the newest embedding_max_exemplars)."""
+        keep = [i for i, post_id in enumerate(self.ids) if post_id in post_ids]
+        if len(keep) == len(self.ids):
+            return
+        self.ids = [self.ids[i] for i in keep]
+        self.labels = self.labels[keep]
+        self.vectors = self.vectors[keep] if keep else None
+        self.scale = None
+
+    def raw_scores(self, vectors, exclude_self=False):
+        brand_sim = vectors @ self.brand if self.brand is not None else np.zeros(len(vectors), dtype=np.float32)
+        if self.vectors is None:
+            return brand_sim
+        sims = vectors @ self.vectors.T
+        if exclude_self:
+            # Exemplars scored against the index must not match themselves
+            np.fill_diagonal(sims, -1.0)
+        high = _top_k_mean(sims[:, self.labels == 1], self.top_k)
+        low = _top_k_mean(sims[:, self.labels == 0], self.top_k)
+        return brand_sim + high - low
+
+    def calibrate(self, scores):
+        """Fits score = slope * raw + intercept on the exemplars' own LLM scores (leave-one-out). scores: {post_id: score}."""
+        if self.vectors is None:
+            return False
+        rows = [i for i, post_id in enumerate(self.ids) if post_id in scores]
+        targets = np.array([scores[self.ids[i]] for i in rows], dtype=np.float32)
+        if len(rows) < 2 or targets.std() == 0:
+            return False
+        raw = self.raw_scores(self.vectors, exclude_self=True)[rows]
+        if raw.std() == 0:
+            return False
+        slope, intercept = np.polyfit(raw, targets, 1)
+        self.scale = (float(slope), float(intercept))
+        return True
+
+    def score(self, texts):
+        """Calibrated 0-100 scores for texts, embedded in batches. Requires calibrate() first."""
+        if not texts:
+            return []
+        raw = self.raw_scores(self._embed(list(texts)))
+        slope, intercept = self.scale
+        return [int(round(s)) for s in np.clip(slope * raw + intercept, 0, 100)]
+
+    def save(self, path=INDEX_PATH):
+        np.savez(path, embedder=self.embedder.name, brand_hash=self.brand_hash,
+                 brand=self.brand if self.brand is not None else np.zeros(0, dtype=np.float32),
+                 ids=np.array(self.ids, dtype=str), labels=self.labels,
+                 vectors=self.vectors if self.vectors is not None else np.zeros((0, 0), dtype=np.float32))
+
+    @classmethod
+    def load(cls, embedder, path=INDEX_PATH, top_k=5):
+        """Loads the saved index, or returns an empty one if there is none or it was built with another embedder."""
+        index = cls(embedder, top_k)
+        if not os.path.exists(path):
+            return index
+        try:
+            data = np.load(path)
+            if str(data["embedder"]) != embedder.name:
+                return index
+            index.brand_hash = str(data["brand_hash"])
+            index.brand = data["brand"] if data["brand"].size else None
+            index.ids = [str(i) for i in data["ids"]]
+            index.labels = data["labels"].astype(np.int8)
+            index.vectors = data["vectors"] if data["vectors"].size else None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  ⚠️ Embedding index unreadable ({e}). Rebuilding.")
+            return cls(embedder, top_k)
+        return index
+
+
+def get_embedder(cfg, client=None, cost_fn=None):
+    model = cfg.get("embedding_model", "hashing")
+    if cfg.get("test_mode", False) or model == "hashing" or client is None:
+        return HashingEmbedder()
+    return GeminiEmbedder(client, model, cost_fn)
+
+
+def build_index(samples, brand_text, cfg, client=None, cost_fn=None):
+    """
+    Loads the saved index, adds new exemplars and calibrates it. samples: [(post_id, content, score)] of
+    LLM-scored posts. Returns the index, or None if there are too few exemplars of either kind to calibrate.
+    """
+    threshold = cfg.get("quantifier_threshold", 80)
+    low_score = cfg.get("embedding_low_score", 30)
+    limit = cfg.get("embedding_max_exemplars", 500)
+    high = [(pid, content, True) for pid, content, score in samples if score >= threshold][-limit:]
+    low = [(pid, content, False) for pid, content, score in samples if score <= low_score][-limit:]
+    if min(len(high), len(low)) < cfg.get("embedding_min_exemplars", 20):
+        return None
+
+    index = EmbeddingIndex.load(get_embedder(cfg, client, cost_fn), top_k=cfg.get("embedding_top_k", 5))
+    index.set_brand(brand_text)
+    added = index.add_exemplars(high + low)
+    index.retain({pid for pid, _, _ in high + low})
+    if not index.calibrate({pid: score for pid, _, score in samples}):
+        return None
+    index.save()
+    print(f"  🧭 Embedding index: {len(index.ids)} exemplars ({added} new) with {index.embedder.name}.")
+    return index
@@ -1,12 +1,12 @@
-import asyncio
-import json
 import os
 import random
 import time
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright
 from db import add_engagement_reply, get_existing_post_ids, init_db, POSTS_CSV
+from config import get_config
+from browser_pool import lease_page, run as run_with_browsers
+from readiness import wait_for_condition, wait_for_dom_quiet
 import csv
 
 # Import the proven scraper logic
@@ -14,18 +14,17 @@ from scraper import scrape_handle, NITTER_MIRRORS_DEFAULT
 
 load_dotenv()
 
-async def scrape_post_replies(post_url, context):
+async def scrape_post_replies(post_url, page):
     """
     Visits a post URL and scrapes replies using selectors consistent with scraper.py.
     """
-    page = await context.new_page()
     replies = []
     try:
         print(f"  🔍 Checking replies for {post_url}...")
         # Check if URL is Nitter or X
         is_nitter = "nitter" in post_url or "xcancel" in post_url
         
-        await page.goto(post_url, wait_until="networkidle" if not is_nitter else "domcontentloaded", timeout=30000)
+        await page.goto(post_url, wait_until="domcontentloaded", timeout=30000)
         
         if is_nitter:
             # Nitter selectors
@@ -58,6 +57,9 @@ async def scrape_post_replies(post_url, context):
                 await page.wait_for_selector('article[data-testid="tweet"]', timeout=10000)
             except:
                 return [], False
+            # The conversation renders after the main post; wait for it instead of networkidle
+            if await wait_for_condition(page, "() => document.querySelectorAll('article[data-testid=\"tweet\"]').length > 1", 5000):
+                await wait_for_dom_quiet(page, quiet_ms=500, timeout=3000)
 
             tweets = await page.query_selector_all('article[data-testid="tweet"]')
             if len(tweets) <= 1:
@@ -89,15 +91,12 @@ async def scrape_post_replies(post_url, context):
     except Exception as e:
         print(f"  ❌ Error scraping replies: {e}")
         return [], False
-    finally:
-        await page.close()
     return replies, True
 
 async def run_engagement():
     load_dotenv()
     
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
+    cfg = get_config()
     
     if not cfg.get("engagement_enabled", False):
         print("Engagement: Disabled in config. Skipping.")
@@ -113,135 +112,117 @@ async def run_engagement():
     
     print(f"\n📈 Starting Engagement Monitor for @{my_handle} (Mode: {mode})...")
 
-    async with async_playwright() as p:
-        user_data_dir = cfg.get("browser_user_data_dir", "data/browser_session")
-        if not os.path.isabs(user_data_dir):
-            user_data_dir = os.path.join(os.getcwd(), user_data_dir)
-            
-        headless = cfg.get("headless_browser", True)
-        
-        # Consistent browser launch with scraper.py
-        context = await p.firefox.launch_persistent_context(
-            user_data_dir,
-            headless=headless,
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0",
-            viewport={"width": 1280, "height": 720},
-            ignore_https_errors=True
-        )
+    # Reuse the scraper's warm Firefox context (same persistent session)
+    async with lease_page("firefox") as page:
+        # 1. Use the proven scrape_handle logic to get the user's latest posts
+        print(f"  🐦 Scraping @{my_handle} profile using fallback logic...")
+        success, blocked, count, new_c, new_rep, new_rt = await scrape_handle(my_handle, page)
         
-        try:
-            # 1. Use the proven scrape_handle logic to get the user's latest posts
-            print(f"  🐦 Scraping @{my_handle} profile using fallback logic...")
-            success, blocked, count, new_c, new_rep, new_rt = await scrape_handle(my_handle, context)
-            
-            if not success:
-                print(f"  ⚠️ Warning: Failed to scrape @{my_handle} profile. Proceeding with existing posts in DB.")
-                # Removed return; continue to check what's already in DB
+        if not success:
+            print(f"  ⚠️ Warning: Failed to scrape @{my_handle} profile. Proceeding with existing posts in DB.")
+            # Removed return; continue to check what's already in DB
 
-            # 2. Get the latest posts for this handle from the DB
-            post_links = []
-            if os.path.exists(POSTS_CSV):
-                with open(POSTS_CSV, 'r', newline='') as f:
-                    reader = csv.DictReader(f)
-                    all_posts = list(reader)
-                    
-                    # Filter for my handle, exclude retweets, and ensure it's within 48 hours
-                    my_posts = []
-                    now = datetime.now(timezone.utc)
-                    limit_hours = 48
+        # 2. Get the latest posts for this handle from the DB
+        post_links = []
+        if os.path.exists(POSTS_CSV):
+            with open(POSTS_CSV, 'r', newline='') as f:
+                reader = csv.DictReader(f)
+                all_posts = list(reader)
+                
+                # Filter for my handle, exclude retweets, and ensure it's within 48 hours
+                my_posts = []
+                now = datetime.now(timezone.utc)
+                limit_hours = 48
+                
+                for p in all_posts:
+                    if p['handle'].lower() != my_handle.lower(): continue
+                    if p.get('is_retweet') == "True": continue
                     
-                    for p in all_posts:
-                        if p['handle'].lower() != my_handle.lower(): continue
-                        if p.get('is_retweet') == "True": continue
+                    posted_at_str = p.get('posted_at')
+                    if not posted_at_str:
+                        posted_at_str = p.get('scraped_at')
                         
-                        posted_at_str = p.get('posted_at')
-                        if not posted_at_str:
-                            posted_at_str = p.get('scraped_at')
-                            
+                    try:
                         try:
-                            try:
-                                posted_at = datetime.fromisoformat(posted_at_str)
-                            except ValueError:
-                                # Twitter format fallback
-                                clean_date = posted_at_str.replace(" UTC", "").replace("· ", "")
-                                posted_at = datetime.strptime(clean_date, "%b %d, %Y %I:%M %p")
-                                
-                            if posted_at.tzinfo is None:
-                                posted_at = posted_at.replace(tzinfo=timezone.utc)
-                                
-                            age_hours = (now - posted_at).total_seconds() / 3600
-                            if age_hours <= limit_hours:
-                                my_posts.append(p)
-                        except:
-                            # If date parse fails, we'll keep it as a fallback if it's very recent scraped_at
-                            pass
+                            posted_at = datetime.fromisoformat(posted_at_str)
+                        except ValueError:
+                            # Twitter format fallback
+                            clean_date = posted_at_str.replace(" UTC", "").replace("· ", "")
+                            posted_at = datetime.strptime(clean_date, "%b %d, %Y %I:%M %p")
+                            
+                        if posted_at.tzinfo is None:
+                            posted_at = posted_at.replace(tzinfo=timezone.utc)
+                            
+                        age_hours = (now - posted_at).total_seconds() / 3600
+                        if age_hours <= limit_hours:
+                            my_posts.append(p)
+                    except:
+                        # If date parse fails, we'll keep it as a fallback if it's very recent scraped_at
+                        pass
 
-                    my_posts.sort(key=lambda x: x.get('scraped_at', ''), reverse=True)
+                my_posts.sort(key=lambda x: x.get('scraped_at', ''), reverse=True)
+                
+                for p in my_posts[:5]: # Check last 5 recent posts
+                    post_id = p['post_id']
+                    # Determine current source for the URL
+                    source = cfg.get("last_successful_source", "https://x.com")
+                    if not source.startswith("http"): source = "https://x.com"
                     
-                    for p in my_posts[:5]: # Check last 5 recent posts
-                        post_id = p['post_id']
-                        # Determine current source for the URL
-                        source = cfg.get("last_successful_source", "https://x.com")
-                        if not source.startswith("http"): source = "https://x.com"
-                        
-                        full_url = f"{source.rstrip('/')}/{my_handle}/status/{post_id}"
-                        post_links.append((post_id, full_url))
-            
-            if not post_links:
-                print("  ℹ️ No posts found in database for this handle.")
-                return
+                    full_url = f"{source.rstrip('/')}/{my_handle}/status/{post_id}"
+                    post_links.append((post_id, full_url))
+        
+        if not post_links:
+            print("  ℹ️ No posts found in database for this handle.")
+            return
 
-            print(f"  📊 Found {len(post_links)} posts to check for replies.")
-            
-            # Get mirrors for fallback
-            mirrors = cfg.get("nitter_mirrors", NITTER_MIRRORS_DEFAULT)
+        print(f"  📊 Found {len(post_links)} posts to check for replies.")
+        
+        # Get mirrors for fallback
+        mirrors = cfg.get("nitter_mirrors", NITTER_MIRRORS_DEFAULT)
+        
+        new_replies_count = 0
+        for post_id, original_url in post_links:
+            # Try the original URL first (derived from last successful source)
+            replies, success = await scrape_post_replies(original_url, page)
             
-            new_replies_count = 0
-            for post_id, original_url in post_links:
-                # Try the original URL first (derived from last successful source)
-                replies, success = await scrape_post_replies(original_url, context)
+            if not success:
+                print(f"  ⚠️ Primary source failed for {post_id}. Trying fallbacks...")
+                # Determine which source failed
+                failed_source = "x.com" if "x.com" in original_url else "nitter"
                 
-                if not success:
-                    print(f"  ⚠️ Primary source failed for {post_id}. Trying fallbacks...")
-                    # Determine which source failed
-                    failed_source = "x.com" if "x.com" in original_url else "nitter"
-                    
-                    # Try other mirrors
-                    other_mirrors = [m for m in mirrors if m not in original_url]
-                    random.shuffle(other_mirrors)
-                    
-                    for m in other_mirrors:
-                        fallback_url = f"{m.rstrip('/')}/{my_handle}/status/{post_id}"
-                        print(f"    🛡️ Retrying via {m}...")
-                        replies, success = await scrape_post_replies(fallback_url, context)
-                        if success:
-                            break
-                            
-                if not success:
-                    print(f"  ❌ Failed to scrape replies for {post_id} after all attempts.")
-                    continue
-
-                for r in replies:
-                    # Filter out own handle
-                    if r['handle'].lower() == my_handle.lower():
-                        continue
+                # Try other mirrors
+                other_mirrors = [m for m in mirrors if m not in original_url]
+                random.shuffle(other_mirrors)
+                
+                for m in other_mirrors:
+                    fallback_url = f"{m.rstrip('/')}/{my_handle}/status/{post_id}"
+                    print(f"    🛡️ Retrying via {m}...")
+                    replies, success = await scrape_post_replies(fallback_url, page)
+                    if success:
+                        break
                         
-                    is_new = add_engagement_reply(
-                        reply_id=r['reply_id'],
-                        target_post_id=post_id,
-                        handle=r['handle'],
-                        content=r['content'],
-                        engagement_mode=mode
-                    )
-                    if is_new:
-                        new_replies_count += 1
-                        print(f"    📩 New reply from @{r['handle']}: {r['content'][:50]}...")
-            
-            print(f"✅ Engagement Check Complete: {new_replies_count} new replies recorded.")
-            
-        finally:
-            await context.close()
+            if not success:
+                print(f"  ❌ Failed to scrape replies for {post_id} after all attempts.")
+                continue
+
+            for r in replies:
+                # Filter out own handle
+                if r['handle'].lower() == my_handle.lower():
+                    continue
+                    
+                is_new = add_engagement_reply(
+                    reply_id=r['reply_id'],
+                    target_post_id=post_id,
+                    handle=r['handle'],
+                    content=r['content'],
+                    engagement_mode=mode
+                )
+                if is_new:
+                    new_replies_count += 1
+                    print(f"    📩 New reply from @{r['handle']}: {r['content'][:50]}...")
+        
+        print(f"✅ Engagement Check Complete: {new_replies_count} new replies recorded.")
 
 if __name__ == "__main__":
     init_db()
-    asyncio.run(run_engagement())
+    run_with_browsers(run_engagement())
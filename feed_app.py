@@ -4,6 +4,7 @@ import os
 import json
 from dateutil import parser
 from datetime import datetime
+from budget import get_budget_status
 
 app = Flask(__name__)
 
@@ -89,6 +90,10 @@ def api_posts():
         results.append(p_copy)
     return jsonify(results)
 
+@app.route('/api/budget')
+def api_budget():
+    return jsonify(get_budget_status())
+
 @app.route('/api/config')
 def api_config():
     try:
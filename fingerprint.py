@@ -0,0 +1,43 @@
+import hashlib
+import re
+
+URL_RE = re.compile(r"https?://\S+|www\.\S+")
+RETWEET_PREFIX_RE = re.compile(r"^rt\s+@\w+:?\s*")
+NON_WORD_RE = re.compile(r"[^\w@#]+")
+
+SIMHASH_BITS = 64
+
+
+def normalize_text(text):
+    """Lowercases and strips URLs, the 'RT @user:' prefix, punctuation and extra whitespace."""
+    text = URL_RE.sub(" ", (text or "").lower())
+    text = RETWEET_PREFIX_RE.sub("", text.strip())
+    return " ".join(NON_WORD_RE.sub(" ", text).split())
+
+
+def content_fingerprint(text):
+    """Exact-duplicate key: sha1 of the normalized text ('' for posts with no text)."""
+    normalized = normalize_text(text)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest() if normalized else ""
+
+
+def _hash64(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text):
+    """64-bit SimHash over word unigrams and bigrams of the normalized text. 0 for posts with no text."""
+    words = normalize_text(text).split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        h = _hash64(feature)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
@@ -1,18 +1,123 @@
+import asyncio
+import heapq
 import json
 import random
 import os
 import csv
-import time
-from datetime import datetime, timezone
-from db import POSTS_CSV, REPLIES_CSV, ENGAGEMENT_CSV, get_existing_reply_post_ids, get_all_posts, update_post_score, add_reply, get_pending_engagement_replies, mark_engagement_replied
-from quantifier import get_brand, get_ai_config, estimate_cost
+from datetime import datetime, timedelta, timezone
+from db import POSTS_CSV, get_existing_reply_post_ids, add_reply, get_pending_engagement_replies, mark_engagement_replied, get_pending_replies, get_qualified_replies, get_reply_texts
+from quantifier import get_brand, get_ai_config, response_cost, test_mode_score
+from llm_executor import LLMExecutor
+from config import get_config, atomic_write_json
+from eligibility import ineligible_reason
+from budget import budget_model, is_paused, record_spend, report_budget
+from rate_limits import get_posting_capacity
+from scheduler import parse_posted_at
+from reply_index import get_reply_index, pick_fresh
+from draft_ranking import CANDIDATES_SCHEMA, content_words, rank_drafts
+from llm import PERSONA_PATH, PromptTemplate, context_config, get_client, prepare_context, read_context_file
+
+# Newest scored_at the generator has seen, and candidates it still owes a draft
+CURSOR_PATH = os.path.join("data", "generator_cursor.json")
 
 def get_persona():
-    with open("config_user/persona.txt", "r") as f:
-        return f.read()
+    return read_context_file(PERSONA_PATH)
+
+# Brand, persona and guidelines are identical for every draft: sent once as (cached) context
+DRAFT_SYSTEM = """
+    You are an AI agent representing the following brand:
+    {brand_text}
 
-def draft_reply_with_ai(content, brand_text, persona_text, handle, model_override=None):
+    You speak with the following persona:
+    {persona_text}
+
+    Your task is to draft short, engaging replies to X (Twitter) posts.
+    
+    Guidelines:
+    - Keep it under 220 characters. Use line breaks to space out thoughts.
+    - Be conversational, punchy, and additive. Don't just observe; add a fresh thought.
+    - Use simple, direct language. Avoid academic, over-analytical, or "big" words.
+    - Avoid being verbose or overly formal. Think "insightful friend", not "textbook."
+    - Challenge the status quo (crypto, privacy, freedom) if it makes sense, but keep it readable.
+    - Do NOT use hashtags. Do not end the reply with a period or any punctuation.
+    - CRITICAL: Do NOT use markdown. Do NOT use bold (**text**) or italics (*text*). Do NOT use asterisks.
+    - Output PLAIN TEXT only.
+"""
+
+DRAFT_PROMPT = PromptTemplate(DRAFT_SYSTEM, """
+    Draft a reply to the following X (Twitter) post by @{handle}.
+
+    Post Content:
+    "{content}"
+
+    Return ONLY a JSON object:
+    {{
+      "reply": "the draft text",
+      "insight": "a 1-sentence analytical strategy for this reply"
+    }}
+""")
+
+# draft_candidates > 1: several replies in one call, ranked locally (draft_ranking)
+DRAFT_CANDIDATES_PROMPT = PromptTemplate(DRAFT_SYSTEM, """
+    Draft {n} different replies to the following X (Twitter) post by @{handle}. Vary the angle of each.
+
+    Post Content:
+    "{content}"
+
+    Return ONLY a JSON object:
+    {{
+      "candidates": [
+        {{"reply": "the draft text", "insight": "a 1-sentence analytical strategy for this reply"}}
+      ]
+    }}
+""")
+
+# Fused mode: one call scores the post and drafts the reply
+FUSED_PROMPT = PromptTemplate(DRAFT_SYSTEM + """
+    You also score each post from 0 to 100 on how relevant and aligned it is to your brand's core thesis and focus areas.
+    0 = Irrelevant, spam, or boring.
+    100 = Highly relevant, perfect for starting a conversation or debate.
+""", """
+    Score the following X (Twitter) post by @{handle} and draft a reply to it.
+
+    Post Content:
+    "{content}"
+
+    Return ONLY a JSON object:
+    {{
+      "score": 85,
+      "reply": "the draft text",
+      "insight": "a 1-sentence analytical strategy for this reply"
+    }}
+""")
+
+def clean_reply(text):
+    text = text.strip()
+    # Remove surrounding quotes if they exist (sometimes AI adds them inside the JSON string)
+    if text.startswith('"') and text.endswith('"'):
+        text = text[1:-1].strip()
+    # EXTRA CLEANUP: Remove asterisks if they slipped through
+    return text.replace("*", "")
+
+def add_emoji_tag(text):
+    return text if "🔒" in text else text + " 🔒"
+
+async def draft_reply_with_ai(content, brand_text, persona_text, handle, executor, client, model_override=None, past_replies=None, avoid=None):
+    """
+    Returns (reply, insight, cost, model_name, alternates). With draft_candidates > 1 the call asks for
+    that many replies, keeps the best by rank_drafts and returns the others as alternates. 'avoid' is an
+    earlier draft that repeated one of our replies and must not be paraphrased again.
+    """
     cfg = get_ai_config()
+    n = max(1, cfg.get("draft_candidates", 1))
+    past_replies = past_replies if past_replies is not None else []
+
+    def pick(options):
+        ranked = rank_drafts(options, past_replies, persona_text)
+        if not ranked:
+            return None, None, []
+        past_replies.append(content_words(ranked[0][0]))
+        return ranked[0][0], ranked[0][1], [reply for reply, _ in ranked[1:]]
     
     # Test mode: use template responses instead of AI
     if cfg.get("test_mode", False):
@@ -43,56 +148,30 @@ def draft_reply_with_ai(content, brand_text, persona_text, handle, model_overrid
                 "Decentralization is not just a technology, it's a moral imperative."
             ]
         
-        return random.choice(options), "Using a pre-set thematic response for test mode.", 0.0, "Test-Template"
+        if n > 1:
+            text, insight, alternates = pick([(o, "Using a pre-set thematic response for test mode.") for o in random.sample(options, min(n, len(options)))])
+            return text, insight, 0.0, "Test-Template", alternates
+        return random.choice(options), "Using a pre-set thematic response for test mode.", 0.0, "Test-Template", []
     
-    # Production mode: use Gemini API
     # Production mode: use Google GenAI SDK
-    from google import genai
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if api_key:
-        api_key = api_key.split('#')[0].strip()
-        
-    if not api_key:
-        print("Error: GOOGLE_API_KEY not found.")
-        return None, None, 0.0, "Error"
-
-    client = genai.Client(api_key=api_key)
-    
-    
-    model_name = model_override if model_override else cfg.get("drafter_model", "gemini-2.5-pro")
-
-    prompt = f"""
-    You are an AI agent representing the following brand:
-    {brand_text}
-
-    You speak with the following persona:
-    {persona_text}
-
-    Your task is to draft a short, engaging reply to the following X (Twitter) post by @{handle}.
+    if not client:
+        return None, None, 0.0, "Error", []
     
-    Guidelines:
-    - Keep it under 220 characters. Use line breaks to space out thoughts.
-    - Be conversational, punchy, and additive. Don't just observe; add a fresh thought.
-    - Use simple, direct language. Avoid academic, over-analytical, or "big" words.
-    - Avoid being verbose or overly formal. Think "insightful friend", not "textbook."
-    - Challenge the status quo (crypto, privacy, freedom) if it makes sense, but keep it readable.
-    - Do NOT use hashtags. Do not end the reply with a period or any punctuation.
-    - CRITICAL: Do NOT use markdown. Do NOT use bold (**text**) or italics (*text*). Do NOT use asterisks.
-    - Output PLAIN TEXT only.
+    model_name = budget_model(model_override if model_override else cfg.get("drafter_model", "gemini-2.5-pro"), cfg)
 
-    Post Content:
-    "{content}"
-
-    Return ONLY a JSON object:
-    {{
-      "reply": "the draft text",
-      "insight": "a 1-sentence analytical strategy for this reply"
-    }}
-    """
+    system_text = DRAFT_PROMPT.system(brand_text=brand_text, persona_text=persona_text)
+    if n > 1:
+        prompt = DRAFT_CANDIDATES_PROMPT.user(n=n, handle=handle, content=content)
+        config = context_config(model_name, system_text, response_mime_type="application/json", response_schema=CANDIDATES_SCHEMA)
+    else:
+        prompt = DRAFT_PROMPT.user(handle=handle, content=content)
+        config = context_config(model_name, system_text)
+    if avoid:
+        prompt += f'\n\nDo not repeat or closely paraphrase this earlier reply of ours:\n"{avoid}"'
 
     raw_text = ""
     try:
-        response = client.models.generate_content(model=model_name, contents=prompt)
+        response = await executor.generate(client, model_name, prompt, config=config, expected_output_tokens=150 * n)
         raw_text = response.text.strip()
         # Extract JSON if it's wrapped in backticks
         if "```json" in raw_text:
@@ -101,21 +180,19 @@ def draft_reply_with_ai(content, brand_text, persona_text, handle, model_overrid
             raw_text = raw_text.split("```")[1].strip()
             
         res = json.loads(raw_text)
-        text = res.get("reply", "").strip()
-        # Remove surrounding quotes if they exist (sometimes AI adds them inside the JSON string)
-        if text.startswith('"') and text.endswith('"'):
-            text = text[1:-1].strip()
-            
-        # EXTRA CLEANUP: Remove asterisks if they slipped through
-        text = text.replace("*", "")
+        cost = response_cost(model_name, response, prompt, raw_text, "draft")
+        record_spend(cost, executor.stage)
+
+        if n > 1:
+            text, insight, alternates = pick([(clean_reply(c.get("reply", "")), c.get("insight", "No insight provided."))
+                                              for c in res.get("candidates", []) if isinstance(c, dict)])
+            return text, insight, cost, model_name, alternates
+
+        text = clean_reply(res.get("reply", ""))
         
         insight = res.get("insight", "No insight provided.")
         
-        input_tokens = client.models.count_tokens(model=model_name, contents=prompt).total_tokens
-        output_tokens = client.models.count_tokens(model=model_name, contents=raw_text).total_tokens
-        cost = estimate_cost(model_name, input_tokens, output_tokens)
-        
-        return text, insight, cost, model_name
+        return text, insight, cost, model_name, []
     except Exception as e:
         print(f"AI Error ({model_name}): {e}")
         if raw_text:
@@ -132,7 +209,7 @@ def draft_reply_with_ai(content, brand_text, persona_text, handle, model_overrid
                         # Strip leading/trailing quote and colon if present
                         content_part = content_part.strip(':').strip().strip('"').strip()
                         if content_part:
-                            return content_part[:280].replace("*", ""), "Extracted from malformed JSON.", 0.0, "Error"
+                            return content_part[:280].replace("*", ""), "Extracted from malformed JSON.", 0.0, "Error", []
                 except:
                     pass
             
@@ -140,13 +217,162 @@ def draft_reply_with_ai(content, brand_text, persona_text, handle, model_overrid
             for noisy in ['{', '}', '"reply":', '"insight":', '```json', '```']:
                 cleaned = cleaned.replace(noisy, '')
             cleaned = cleaned.strip().strip('"').strip(':').strip().replace("*", "")
-            return cleaned[:280], "Fallback due to AI/parse error.", 0.0, "Error"
+            return cleaned[:280], "Fallback due to AI/parse error.", 0.0, "Error", []
         
-        return None, "Fallback due to AI/parse error.", 0.0, "Error"
+        return None, "Fallback due to AI/parse error.", 0.0, "Error", []
+
+async def draft_all(jobs, brand_text, persona_text, model_override=None, stage="generator"):
+    """Drafts replies for [(content, handle)] or [(content, handle, avoid)] concurrently through one LLMExecutor, in input order."""
+    cfg = get_ai_config()
+    executor = LLMExecutor(cfg, stage=stage)
+    client = None if cfg.get("test_mode", False) else get_client()
+    model_name = budget_model(model_override if model_override else cfg.get("drafter_model", "gemini-2.5-pro"), cfg)
+    await prepare_context(client, model_name, DRAFT_PROMPT.system(brand_text=brand_text, persona_text=persona_text), cfg)
+    # Candidates are ranked for novelty against recent replies and the drafts of this run
+    past_replies = [content_words(t) for t in get_reply_texts()] if cfg.get("draft_candidates", 1) > 1 else []
+
+    async def draft(job):
+        # Jobs not started when the budget runs out are drafted on a later run
+        if is_paused(cfg):
+            return None, None, 0.0, "Paused", []
+        return await draft_reply_with_ai(job[0], brand_text, persona_text, job[1], executor, client, model_override=model_override,
+                                         past_replies=past_replies, avoid=job[2] if len(job) > 2 else None)
+
+    return await executor.map(draft, jobs)
+
+async def score_and_draft_with_ai(content, brand_text, persona_text, handle, executor, client):
+    """Fused mode: scores the post and drafts a reply in one call. Returns (score, reply, insight, cost, model_name), or None on failure."""
+    cfg = get_ai_config()
+    if cfg.get("test_mode", False):
+        reply, insight, cost, model_name, _ = await draft_reply_with_ai(content, brand_text, persona_text, handle, executor, client)
+        return test_mode_score(content), reply, insight, cost, model_name
+    if not client:
+        return None
+
+    model_name = budget_model(cfg.get("drafter_model", "gemini-2.5-pro"), cfg)
+    prompt = FUSED_PROMPT.user(handle=handle, content=content)
+    config = context_config(model_name, FUSED_PROMPT.system(brand_text=brand_text, persona_text=persona_text), response_mime_type="application/json")
+    try:
+        response = await executor.generate(client, model_name, prompt, config=config, expected_output_tokens=160)
+        raw_text = response.text.strip()
+        cost = response_cost(model_name, response, prompt, raw_text, "score_draft")
+        record_spend(cost, executor.stage)
+        res = json.loads(raw_text)
+        score = round(float(res.get("score")))
+        if not 0 <= score <= 100:
+            raise ValueError(f"score out of range: {score}")
+        return score, clean_reply(res.get("reply", "")), res.get("insight", "No insight provided."), cost, model_name
+    except Exception as e:
+        print(f"AI Error (fused, {model_name}): {e}")
+        return None
+
+def run_fused(rows, brand_text):
+    """
+    Scores and drafts likely-relevant posts with one call each. Drafts are stored as pending replies only
+    when the score clears quantifier_threshold, posting capacity allows and they don't repeat an earlier
+    reply; the generator picks up the rest through its cursor. Returns {post_id: (score, score_cost)} for the posts that
+    got a valid score; the rest are left for regular scoring.
+    """
+    cfg = get_ai_config()
+    threshold = cfg.get("quantifier_threshold", 80)
+    persona_text = get_persona()
+
+    async def fused_all():
+        executor = LLMExecutor(cfg, stage="fused")
+        client = None if cfg.get("test_mode", False) else get_client()
+        model_name = budget_model(cfg.get("drafter_model", "gemini-2.5-pro"), cfg)
+        await prepare_context(client, model_name, FUSED_PROMPT.system(brand_text=brand_text, persona_text=persona_text), cfg)
+
+        async def fused(row):
+            if is_paused(cfg):
+                return None
+            return await score_and_draft_with_ai(row['content'], brand_text, persona_text, row['handle'], executor, client)
+
+        return await executor.map(fused, rows)
+
+    results = {}
+    drafts = {}  # post_id -> (reply, insight, cost, model_name) for posts that cleared the threshold
+    for row, result in zip(rows, asyncio.run(fused_all())):
+        if result is None:
+            continue
+        score, reply, insight, cost, model_name = result
+        results[row['post_id']] = (score, cost)
+        if score < threshold:
+            print(f"  ⚡ Scored @{row['handle']}: {score}, below threshold; draft discarded (Cost: ${cost:.5f})")
+        elif not reply:
+            print(f"  ⚡ Scored @{row['handle']}: {score}, no draft returned; left to the generator (Cost: ${cost:.5f})")
+        else:
+            drafts[row['post_id']] = (reply, insight, cost, model_name)
+
+    # Fused drafts take posting capacity like any other; the rest are drafted (or deferred) by the generator
+    candidates = [(results[row['post_id']][0], row) for row in rows if row['post_id'] in drafts]
+    chosen = select_by_capacity(candidates, cfg) if cfg.get("capacity_aware_drafting", True) else candidates
+    chosen_ids = {row['post_id'] for _, row in chosen}
+    index = get_reply_index(cfg)
+    similarity_threshold = cfg.get("reply_similarity_threshold", 0.5)
+    kept = 0
+    for score, row in candidates:
+        reply, insight, cost, model_name = drafts[row['post_id']]
+        if row['post_id'] not in chosen_ids:
+            print(f"  ⚡ Scored @{row['handle']}: {score}, over posting capacity; draft discarded (Cost: ${cost:.5f})")
+            continue
+        match_id, similarity = index.most_similar(reply)
+        if similarity >= similarity_threshold:
+            # The generator drafts this post again, with alternates to pick from
+            print(f"  ⚡ Scored @{row['handle']}: {score}, draft too similar to reply {match_id} ({similarity:.2f}); discarded (Cost: ${cost:.5f})")
+            continue
+        if cfg.get("emojis_enabled", True):
+            reply = add_emoji_tag(reply)
+        # The call did both jobs: split its cost between the score and the draft
+        reply_id = add_reply(row['post_id'], row['handle'], reply, status="pending", generation_model=model_name, cost=cost / 2, insight=insight)
+        index.add(reply_id, reply)
+        print(f"  ⚡ Scored @{row['handle']}: {score} and drafted: {reply[:50]}... (Cost: ${cost:.5f}) [{model_name}]")
+        results[row['post_id']] = (score, cost / 2)
+        kept += 1
+    print(f"  ⚡ Fused mode: {len(results)}/{len(rows)} likely-relevant posts scored in one call, {kept} drafts kept.")
+    return results
+
+def select_by_capacity(candidates, cfg):
+    """
+    Keeps only as many (score, row) candidates as can still be posted before they expire: the API
+    posting capacity over the next qualify_age_limit_hours, minus drafts already waiting, plus
+    draft_capacity_buffer. The best are picked by score, weighted towards posts with more time left.
+    """
+    age_limit = cfg.get("qualify_age_limit_hours", 12)
+    capacity = get_posting_capacity(age_limit)
+    waiting = len(get_pending_replies('pending')) + len(get_qualified_replies())
+    k = max(0, capacity - waiting + cfg.get("draft_capacity_buffer", 3))
+    if len(candidates) <= k:
+        return candidates
+
+    now = datetime.now(timezone.utc)
+
+    def priority(candidate):
+        score, row = candidate
+        posted_at = parse_posted_at(row.get('posted_at'))
+        age = (now - posted_at).total_seconds() / 3600 if posted_at else 0.0
+        remaining = min(1.0, max(0.0, 1 - age / age_limit)) if age_limit else 1.0
+        return score * (0.5 + 0.5 * remaining)
+
+    chosen = heapq.nlargest(k, candidates, key=priority)
+    print(f"  🎯 Capacity: {capacity} posts possible in the next {age_limit}h, {waiting} drafts waiting. "
+          f"Drafting the top {len(chosen)} of {len(candidates)} candidates.")
+    return chosen
+
+def load_cursor():
+    if os.path.exists(CURSOR_PATH):
+        try:
+            with open(CURSOR_PATH) as f:
+                return json.load(f)
+        except (ValueError, OSError) as e:
+            print(f"  ⚠️ Generator: Ignoring unreadable cursor ({e}). Rescanning all posts.")
+    return {}
+
+def save_cursor(cursor):
+    atomic_write_json(CURSOR_PATH, cursor)
 
 def run_generator():
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
+    cfg = get_config()
         
     mode = cfg.get("workflow_mode", "draft")
     if mode not in ["draft", "post"]:
@@ -154,85 +380,119 @@ def run_generator():
         return
 
     print(f"\n💡 Generator: Drafting replies (Mode: {mode})...")
+    if report_budget(cfg)["level"] == "pause":
+        print("  ⏸️ LLM budget reached: drafting paused until spend falls below the caps.")
+        return
     
     threshold = cfg.get("quantifier_threshold", 80)
     emojis_enabled = cfg.get("emojis_enabled", True)
-    reply_to_replies = cfg.get("reply_to_replies", False)
-    reply_to_reposts = cfg.get("reply_to_reposts", False)
 
-    existing_reply_ids = get_existing_reply_post_ids()
     brand_text = get_brand()
     persona_text = get_persona()
-    
-    posts_data = []
+
+    # Only posts scored since the last cycle (plus a short rescan window and deferred candidates)
+    cursor = load_cursor()
+    if cursor.get("threshold") != threshold:
+        cursor = {}  # A new threshold can qualify old posts: rescan everything once
+    since = ""
+    if cursor.get("scored_at"):
+        rescan = timedelta(minutes=cfg.get("generator_rescan_minutes", 60))
+        since = (datetime.fromisoformat(cursor["scored_at"]) - rescan).isoformat()[:19]
+    deferred = set(cursor.get("deferred", []))
+    latest = cursor.get("scored_at", "")
+
+    scanned = 0
+    candidates = []
+    existing_reply_ids = None
     if os.path.exists(POSTS_CSV):
         with open(POSTS_CSV, 'r', newline='') as f:
-            reader = csv.DictReader(f)
-            posts_data = list(reader)
-
-    count = 0
-    for row in posts_data:
-        post_id = row['post_id']
-        handle = row['handle']
-        content = row['content']
-        
-        if post_id in existing_reply_ids:
-            continue
-            
-        is_reply = row.get('is_reply', 'False') == 'True'
-        if is_reply and not reply_to_replies:
-            continue
-        
-        is_retweet = row.get('is_retweet', 'False') == 'True'
-        if is_retweet and not reply_to_reposts:
-            continue
+            reader = csv.reader(f)
+            header = next(reader, [])
+            scored_col = header.index('scored_at') if 'scored_at' in header else None
+            id_col = header.index('post_id')
+            for values in reader:
+                scored_at = values[scored_col] if scored_col is not None and scored_col < len(values) else ""
+                if scored_at > latest:
+                    latest = scored_at
+                # Settled in an earlier cycle: skip without parsing the row
+                if since and scored_at[:19] < since and values[id_col] not in deferred:
+                    continue
+                scanned += 1
+                row = dict(zip(header, values))
 
-        # Get existing score (from quantifier)
-        try:
-            score = int(row.get('score', 0) if row.get('score', '') != '' else 0)
-        except ValueError:
-            score = 0
-        
-        if score < threshold:
-            continue
-            
-        # Optional but HIGHLY recommended: Age check here too to avoid drafting for expired posts
-        age_limit_hours = cfg.get("qualify_age_limit_hours", 12)
-        posted_at_str = row.get('posted_at')
-        if posted_at_str:
-            try:
+                # Get existing score (from quantifier)
                 try:
-                    posted_at = datetime.fromisoformat(posted_at_str)
+                    score = int(row.get('score', 0) if row.get('score', '') != '' else 0)
                 except ValueError:
-                    clean_date = posted_at_str.replace(" UTC", "").replace("· ", "")
-                    posted_at = datetime.strptime(clean_date, "%b %d, %Y %I:%M %p")
-                
-                if posted_at.tzinfo is None:
-                    posted_at = posted_at.replace(tzinfo=timezone.utc)
-                
-                age_hours = (datetime.now(timezone.utc) - posted_at).total_seconds() / 3600
-                if age_hours > age_limit_hours:
-                    # Skip drafting for posts that are already too old
+                    score = 0
+
+                if score < threshold:
                     continue
-            except:
-                pass # If date parse fails, we continue and let qualifier handle it
-            
-        print(f"  📝 Drafting reply for @{handle} (Score: {score})...")
-        
-        reply, insight, cost, model_name = draft_reply_with_ai(content, brand_text, persona_text, handle)
-        
-        if reply:
+
+                if existing_reply_ids is None:
+                    existing_reply_ids = get_existing_reply_post_ids()
+                if row['post_id'] in existing_reply_ids:
+                    continue
+
+                # Replies/reposts (when disabled), expired, blacklisted and our own posts
+                if ineligible_reason(row, cfg):
+                    continue
+
+                candidates.append((score, row))
+    print(f"  🔖 Considered {scanned} posts scored since {since or 'the beginning'}, {len(candidates)} candidates.")
+
+    # Candidates left undrafted (over capacity or failed) are retried next cycle while still eligible
+    deferred = {row['post_id'] for _, row in candidates}
+    if cfg.get("capacity_aware_drafting", True):
+        candidates = select_by_capacity(candidates, cfg)
+    for score, row in candidates:
+        print(f"  📝 Drafting reply for @{row['handle']} (Score: {score})...")
+    candidates = [row for _, row in candidates]
+
+    # Drafts repeating one of our live replies are swapped for an alternate or regenerated (within the budget)
+    index = get_reply_index(cfg)
+    similarity_threshold = cfg.get("reply_similarity_threshold", 0.5)
+    regenerations = cfg.get("reply_regeneration_budget", 3)
+    jobs = [(row['content'], row['handle']) for row in candidates]
+    spent = {}
+    count = 0
+    while candidates:
+        # Drafts run concurrently under the drafter model's rate limits; results are stored in post order
+        drafts = asyncio.run(draft_all(jobs, brand_text, persona_text))
+        retry, retry_jobs = [], []
+        for row, (reply, insight, cost, model_name, alternates) in zip(candidates, drafts):
+            post_id = row['post_id']
+            handle = row['handle']
+            spent[post_id] = spent.get(post_id, 0.0) + cost
+            if not reply:
+                continue
+            if emojis_enabled:
+                reply, alternates = add_emoji_tag(reply), [add_emoji_tag(a) for a in alternates]
+
+            chosen, alternates, similarity = pick_fresh(index, reply, alternates, similarity_threshold)
+            if chosen is None:
+                if regenerations > 0:
+                    regenerations -= 1
+                    print(f"  ♻️ Draft for @{handle} is {similarity:.0%} similar to an earlier reply. Regenerating...")
+                    retry.append(row)
+                    retry_jobs.append((row['content'], handle, reply))
+                else:
+                    print(f"  ♻️ Draft for @{handle} repeats an earlier reply; regeneration budget spent. Retrying next cycle.")
+                continue
+            if chosen != reply:
+                print(f"  🔁 Draft for @{handle} repeated an earlier reply ({similarity:.0%}). Using an alternate.")
+
             if insight:
                 print(f"  🧠 Strategy: {insight}")
-            if emojis_enabled and "🔒" not in reply:
-                 reply += " 🔒"
-
-            add_reply(post_id, handle, reply, status="pending", generation_model=model_name, cost=cost, insight=insight)
-            print(f"  ✅ Drafted: {reply[:50]}... (Cost: ${cost:.5f}) [{model_name}]")
+            reply_id = add_reply(post_id, handle, chosen, status="pending", generation_model=model_name, cost=spent[post_id], insight=insight, alternates=alternates)
+            index.add(reply_id, chosen)
+            deferred.discard(post_id)
+            print(f"  ✅ Drafted: {chosen[:50]}... (Cost: ${spent[post_id]:.5f}) [{model_name}]")
             count += 1
-            time.sleep(2) # Rate limiting
+        candidates, jobs = retry, retry_jobs
             
     print(f"Generator: Drafted {count} new replies from monitored handles.")
+    save_cursor({"scored_at": latest, "threshold": threshold, "deferred": sorted(deferred)})
 
     # --- Engagement Replies Logic ---
     if cfg.get("engagement_enabled", False):
@@ -240,34 +500,36 @@ def run_generator():
         eng_count = 0
         if eng_replies:
             print(f"💡 Generator: Processing {len(eng_replies)} pending engagement replies...")
-            for er in eng_replies:
-                if er.get('engagement_mode') != 'reply':
-                    continue
-                
+            eng_jobs = [er for er in eng_replies if er.get('engagement_mode') == 'reply']
+            for er in eng_jobs:
+                print(f"  📝 Drafting engagement reply for @{er['handle']} (Target Post: {er['target_post_id']})...")
+            
+            eng_model = cfg.get("engagement_model")
+            eng_drafts = asyncio.run(draft_all([(er['content'], er['handle']) for er in eng_jobs], brand_text, persona_text, model_override=eng_model, stage="engagement")) if eng_jobs else []
+            for er, (reply, insight, cost, model_name, alternates) in zip(eng_jobs, eng_drafts):
                 reply_id = er['reply_id']
                 handle = er['handle']
-                content = er['content']
                 target_post_id = er['target_post_id']
-
-                print(f"  📝 Drafting engagement reply for @{handle} (Target Post: {target_post_id})...")
-                
-                eng_model = cfg.get("engagement_model")
-                reply, insight, cost, model_name = draft_reply_with_ai(content, brand_text, persona_text, handle, model_override=eng_model)
                 
                 if reply:
+                    if emojis_enabled:
+                        reply, alternates = add_emoji_tag(reply), [add_emoji_tag(a) for a in alternates]
+                    reply, alternates, similarity = pick_fresh(index, reply, alternates, similarity_threshold)
+                    if reply is None:
+                        # Left pending in the engagement table: drafted again next cycle
+                        print(f"  ♻️ Engagement draft for @{handle} repeats an earlier reply ({similarity:.0%}). Retrying next cycle.")
+                        continue
                     if insight:
                         print(f"  🧠 Strategy: {insight}")
-                    if emojis_enabled and "🔒" not in reply:
-                         reply += " 🔒"
 
                     # Add to main replies table
-                    add_reply(target_post_id, handle, reply, status="pending", generation_model=model_name, cost=cost, insight=insight)
+                    new_id = add_reply(target_post_id, handle, reply, status="pending", generation_model=model_name, cost=cost, insight=insight, alternates=alternates)
+                    index.add(new_id, reply)
                     # Mark as replied in engagement table
                     mark_engagement_replied(reply_id)
                     
                     print(f"  ✅ Drafted: {reply[:50]}... (Cost: ${cost:.5f}) [{model_name}]")
                     eng_count += 1
-                    time.sleep(2)
             
             print(f"Generator: Drafted {eng_count} new engagement replies.")
 
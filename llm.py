@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import os
+import textwrap
+import time
+from types import SimpleNamespace
+from config import get_config
+
+BRAND_PATH = os.path.join("config_user", "brand.txt")
+PERSONA_PATH = os.path.join("config_user", "persona.txt")
+
+# One client per process; set_provider() swaps in a fake for tests
+_client = None
+_client_key = None
+_client_loop = None
+_provider = None
+# path -> (mtime, text)
+_context_files = {}
+# (model, sha1 of system text) -> {"name": cache name or None, "expires": unix time}
+_context_caches = {}
+
+
+def read_context_file(path):
+    """Returns the file's text, re-reading it only when its mtime changes."""
+    mtime = os.path.getmtime(path)
+    cached = _context_files.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r") as f:
+        text = f.read()
+    _context_files[path] = (mtime, text)
+    return text
+
+
+def set_provider(provider):
+    """Routes every get_client() call to 'provider' (e.g. FakeProvider); None restores the Gemini client."""
+    global _provider
+    _provider = provider
+    _context_caches.clear()
+
+
+def get_client():
+    """
+    The process-wide genai.Client, so its connection pool is reused across calls. Async connections
+    are bound to an event loop, so a stage running under a new asyncio.run() loop gets a fresh client.
+    """
+    global _client, _client_key, _client_loop
+    if _provider is not None:
+        return _provider
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if api_key:
+        api_key = api_key.split('#')[0].strip()
+
+    if not api_key:
+        print("Error: GOOGLE_API_KEY not found.")
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if _client is None or api_key != _client_key or (loop is not None and _client_loop not in (None, loop)):
+        from google import genai
+        _client = genai.Client(api_key=api_key)
+        _client_key = api_key
+        _client_loop = loop
+    elif loop is not None:
+        _client_loop = loop
+    return _client
+
+
+class PromptTemplate:
+    """
+    A prompt split into a static system prefix (brand/persona and instructions, identical for every
+    post) and a per-post user suffix. Both are dedented once; the rendered prefix is memoized.
+    """
+
+    def __init__(self, system, user):
+        self.system_template = textwrap.dedent(system).strip()
+        self.user_template = textwrap.dedent(user).strip()
+        self._system_cache = {}
+
+    def system(self, **values):
+        key = tuple(sorted(values.items()))
+        if key not in self._system_cache:
+            self._system_cache.clear()  # Only the current brand/persona is worth keeping
+            self._system_cache[key] = self.system_template.format(**values)
+        return self._system_cache[key]
+
+    def user(self, **values):
+        return self.user_template.format(**values)
+
+
+def _context_key(model, system_text):
+    return model, hashlib.sha1(system_text.encode("utf-8")).hexdigest()
+
+
+async def prepare_context(client, model, system_text, cfg=None):
+    """
+    Creates (or refreshes) a provider-side cached context holding system_text for model, once per
+    stage run. Providers or prompts that can't be cached (e.g. below the minimum cacheable size)
+    are remembered until the TTL passes, and context_config() sends system_text inline instead.
+    """
+    cfg = cfg or get_config()
+    if client is None or not cfg.get("llm_context_cache", True):
+        return None
+    key = _context_key(model, system_text)
+    entry = _context_caches.get(key)
+    if entry and entry["expires"] > time.time():
+        return entry["name"]
+
+    ttl = cfg.get("llm_context_cache_ttl_seconds", 3600)
+    name = None
+    try:
+        cache = await client.aio.caches.create(model=model, config={
+            "system_instruction": system_text, "ttl": f"{ttl}s", "display_name": f"context-{key[1][:12]}"})
+        name = cache.name
+        print(f"  🗄️ Cached prompt context for {model} ({len(system_text)} chars).")
+    except Exception as e:
+        print(f"  ℹ️ Prompt context not cached for {model} ({str(e)[:80]}). Sending it inline.")
+    # Refresh a little before the provider drops it
+    _context_caches[key] = {"name": name, "expires": time.time() + ttl * 0.9}
+    return name
+
+
+def context_config(model, system_text, **extra):
+    """generate_content config carrying system_text as a cached context reference when one exists, else inline."""
+    entry = _context_caches.get(_context_key(model, system_text))
+    config = dict(extra)
+    if entry and entry["name"] and entry["expires"] > time.time():
+        config["cached_content"] = entry["name"]
+    else:
+        config["system_instruction"] = system_text
+    return config
+
+
+class FakeProvider:
+    """
+    In-process stand-in for genai.Client. Answers generate_content with responder(contents, config)
+    and reports usage like Gemini does (cached context tokens included in the prompt count).
+    """
+
+    def __init__(self, responder=None, min_cache_chars=0):
+        self.responder = responder or (lambda contents, config: "50")
+        self.min_cache_chars = min_cache_chars
+        self.requests = []
+        self.cached = {}
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._generate),
+                                   caches=SimpleNamespace(create=self._create_cache))
+
+    async def _create_cache(self, model, config):
+        text = config["system_instruction"]
+        if len(text) < self.min_cache_chars:
+            raise ValueError("Cached content is too small")
+        name = f"cachedContents/fake{len(self.cached) + 1}"
+        self.cached[name] = text
+        return SimpleNamespace(name=name)
+
+    async def _generate(self, model, contents, config=None):
+        config = config or {}
+        self.requests.append({"model": model, "contents": contents, "config": config})
+        cached_text = self.cached.get(config.get("cached_content"), "")
+        system_text = config.get("system_instruction", "")
+        text = self.responder(contents, config)
+        usage = SimpleNamespace(prompt_token_count=(len(contents) + len(system_text) + len(cached_text)) // 4,
+                                cached_content_token_count=len(cached_text) // 4,
+                                candidates_token_count=max(1, len(text) // 4), thoughts_token_count=0)
+        return SimpleNamespace(text=text, usage_metadata=usage)
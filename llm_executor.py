@@ -0,0 +1,132 @@
+import asyncio
+import random
+import time
+from config import get_config
+from budget import budget_concurrency
+
+# HTTP statuses worth retrying: quota (429) and transient server errors
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_MARKERS = ("429", "RESOURCE_EXHAUSTED", "500", "INTERNAL", "502", "503", "UNAVAILABLE", "504", "DEADLINE_EXCEEDED")
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate_per_minute, holding at most one minute of tokens."""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until 'amount' tokens are available (requests larger than the bucket wait for a full one)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        # May go negative when a call used more than estimated; later callers then wait it off
+        self._refill()
+        self.tokens -= amount
+
+
+class ModelLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one model."""
+
+    def __init__(self, rpm, tpm):
+        self.limits = (rpm, tpm)
+        self.requests = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+
+    async def acquire(self, tokens):
+        while True:
+            wait = max(self.requests.wait_time(1), self.token_bucket.wait_time(tokens))
+            if wait <= 0:
+                self.requests.take(1)
+                self.token_bucket.take(tokens)
+                return
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated, actual):
+        """Charges (or refunds) the difference between the estimated and the reported token usage."""
+        self.token_bucket.take(actual - estimated)
+
+
+# model -> ModelLimiter. Plain data (no asyncio primitives), so quota state survives across asyncio.run() calls
+_limiters = {}
+
+
+def get_limiter(model, cfg):
+    limits = cfg.get("ai_models", {}).get(model, {})
+    rpm = limits.get("rpm", cfg.get("llm_default_rpm", 15))
+    tpm = limits.get("tpm", cfg.get("llm_default_tpm", 1000000))
+    limiter = _limiters.get(model)
+    if not limiter or limiter.limits != (rpm, tpm):
+        limiter = _limiters[model] = ModelLimiter(rpm, tpm)
+    return limiter
+
+
+def estimate_tokens(text):
+    """Rough pre-call estimate (~4 characters per token) used to reserve TPM capacity."""
+    return max(1, len(text) // 4)
+
+
+def is_retryable(error):
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code in RETRYABLE_CODES:
+        return True
+    return any(marker in str(error) for marker in RETRYABLE_MARKERS)
+
+
+class LLMExecutor:
+    """
+    Runs Gemini calls concurrently (up to llm_max_concurrency in flight) while keeping each model
+    under its configured RPM/TPM, retrying 429/5xx with jittered exponential backoff.
+    Create one per event loop: run_quantifier and run_generator each make their own.
+    'stage' names the pipeline stage the spend is recorded under (see budget.py).
+    """
+
+    def __init__(self, cfg=None, stage="llm"):
+        self.cfg = cfg or get_config()
+        self.stage = stage
+        # Fewer calls in flight once spend nears the budget caps
+        self.semaphore = asyncio.Semaphore(budget_concurrency(max(1, self.cfg.get("llm_max_concurrency", 4)), self.cfg))
+        self.max_retries = self.cfg.get("llm_max_retries", 4)
+        self.backoff_seconds = self.cfg.get("llm_backoff_seconds", 2.0)
+        self.retries = 0
+
+    async def generate(self, client, model, prompt, config=None, expected_output_tokens=256):
+        """Awaitable client.models.generate_content() under the model's rate limits. Raises after the last retry."""
+        limiter = get_limiter(model, self.cfg)
+        estimate = estimate_tokens(prompt) + expected_output_tokens
+
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire(estimate)
+            async with self.semaphore:
+                try:
+                    response = await client.aio.models.generate_content(model=model, contents=prompt, config=config)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    error = e
+                else:
+                    usage = getattr(response, "usage_metadata", None)
+                    if usage and getattr(usage, "total_token_count", None):
+                        limiter.settle(estimate, usage.total_token_count)
+                    return response
+
+            # Back off outside the semaphore so other calls keep flowing
+            self.retries += 1
+            delay = self.backoff_seconds * (2 ** attempt)
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            print(f"  ⏳ {model}: {str(error)[:80]} - retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})...")
+            await asyncio.sleep(delay)
+
+    async def map(self, fn, items):
+        """Runs fn(item) for every item concurrently; results keep the order of items."""
+        return await asyncio.gather(*(fn(item) for item in items))
@@ -1,10 +1,10 @@
 import os
-import json
 import time
 from pynostr.key import PrivateKey
 from pynostr.event import Event
 from pynostr.relay_manager import RelayManager
 from dotenv import load_dotenv
+from config import get_config
 
 # Load .env for private key
 load_dotenv()
@@ -82,8 +82,7 @@ def publish_to_nostr(content, nitter_link, screenshot_url=None):
 
         # Load relays from config
         try:
-            with open("config_user/config.json") as f:
-                cfg = json.load(f)
+            cfg = get_config()
             default_relays = [
                 "wss://relay.damus.io", 
                 "wss://nos.lol", 
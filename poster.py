@@ -1,16 +1,21 @@
-import json
 import asyncio
 import os
 import random
-import csv
 import sys
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from tqdm import tqdm
 import tweepy
-from playwright.async_api import async_playwright
-from db import get_qualified_replies, mark_reply_status, update_handle_check, get_post_details, update_nostr_status, add_post, REPLIES_CSV # Added add_post
+from db import get_qualified_replies, mark_reply_status, update_handle_check, get_post_details, update_nostr_status, add_post # Added add_post
 from nostr_publisher import publish_to_nostr
 from media_uploader import upload_media
+from config import get_config
+from rate_limits import check_manual_rate_limits
+from browser_pool import lease_page, run as run_with_browsers
+from readiness import wait_for_any, expect_response, wait_for_images, report_readiness
+from x_session import ensure_session, invalidate_session
+
+# reply_tweet_id returned when the browser clicked Reply but X never answered the CreateTweet call
+BROWSER_UNCONFIRMED = "browser_unconfirmed"
 
 def get_twitter_client():
     """
@@ -43,78 +48,6 @@ def get_twitter_client():
         print(f"  ❌ API Error initializing client: {e}")
         return None
 
-def check_manual_rate_limits():
-    """
-    Checks if we have exceeded the manual rate limits:
-    - 17 requests / 24 hours
-    - 500 requests / 30 days
-    Returns (True, wait_seconds) if limited, (False, 0) if allowed.
-    """
-    if not os.path.exists(REPLIES_CSV):
-        return False, 0
-        
-    api_posts = []
-    
-    # Read REPLIES_CSV to find successful API posts
-    # We assume 'posted' status means successful API post if reply_tweet_id is present, 
-    # but strictly speaking browser posts also set 'posted'. 
-    # However, 'browser_posted_id_placeholder' indicates a browser post.
-    # We should look for numeric IDs or differentiate. 
-    # For safety, let's count ALL 'posted' entries towards the limit if we can't distinguish,
-    # OR we assume browser posts don't count towards API limits (which they don't).
-    # Browser post ID placeholder is 'browser_posted_id_placeholder'.
-    
-    with open(REPLIES_CSV, 'r', newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['status'] == 'posted' and row.get('posted_at'):
-                # Check if it was an API post
-                # If reply_tweet_id is not the placeholder, it's likely API or scraped ID.
-                # Ideally we should log the method. For now, let's assume all non-placeholder are API
-                # or just count everything to be safe/conservative? 
-                # The user requirement is specific to API limits.
-                # Looking at logs: API posts have real IDs. Browser fallback has placeholder.
-                
-                tid = row.get('reply_tweet_id', '')
-                if tid == 'browser_posted_id_placeholder':
-                    continue
-                    
-                try:
-                    posted_at = datetime.fromisoformat(row['posted_at'])
-                    if posted_at.tzinfo is None:
-                        posted_at = posted_at.replace(tzinfo=timezone.utc)
-                    api_posts.append(posted_at)
-                except:
-                    pass
-
-    now = datetime.now(timezone.utc)
-    
-    # 24h limit
-    cutoff_24h = now - timedelta(hours=24)
-    posts_24h = [t for t in api_posts if t > cutoff_24h]
-    
-    if len(posts_24h) >= 17:
-        # Find when the oldest post in the window expires
-        oldest_in_window = min(posts_24h)
-        # reset time is oldest + 24h
-        reset_time = oldest_in_window + timedelta(hours=24)
-        wait_seconds = (reset_time - now).total_seconds()
-        if wait_seconds < 0: wait_seconds = 0
-        return True, wait_seconds + 5 # Buffer
-        
-    # Monthly limit (approx 30 days)
-    cutoff_30d = now - timedelta(days=30)
-    posts_30d = [t for t in api_posts if t > cutoff_30d]
-    
-    if len(posts_30d) >= 500:
-        oldest_in_window = min(posts_30d)
-        reset_time = oldest_in_window + timedelta(days=30)
-        wait_seconds = (reset_time - now).total_seconds()
-        if wait_seconds < 0: wait_seconds = 0
-        return True, wait_seconds + 30 # Buffer
-        
-    return False, 0
-
 def wait_with_progress(seconds, reason="Rate limit reached"):
     """Displays a progress bar for the wait duration."""
     print(f"\n🛑 {reason}. Waiting {int(seconds)}s for reset...")
@@ -215,20 +148,12 @@ async def capture_tweet_screenshot(handle, post_id, output_path):
     """
     print(f"  📸 Screenshot: Capturing @{handle}/status/{post_id}...")
     
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
-
-    user_data_dir = "data/browser_session"
+    user_data_dir = get_config().get("browser_user_data_dir", "data/browser_session")
     handle = handle.strip().strip("@")
     url = f"https://x.com/{handle}/status/{post_id}"
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch_persistent_context(
-            user_data_dir,
-            headless=cfg.get("headless_browser", True),
-            args=["--disable-blink-features=AutomationControlled"]
-        )
-        page = await browser.new_page()
+    # Pages come from the process-wide warm Chromium context instead of a cold launch per call
+    async with lease_page("chromium", user_data_dir) as page:
         try:
             await page.goto(url, wait_until="domcontentloaded", timeout=45000)
             
@@ -280,9 +205,9 @@ async def capture_tweet_screenshot(handle, post_id, output_path):
                     }
                 """)
                 
-                # Ensure the article is in view and wait a bit for any dynamic content/images
+                # Ensure the article is in view and its images have loaded
                 await target_article.scroll_into_view_if_needed()
-                await asyncio.sleep(2) 
+                await wait_for_images(target_article, timeout=5000, replaces=2000)
                 
                 # Ensure screenshots directory exists
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -295,8 +220,6 @@ async def capture_tweet_screenshot(handle, post_id, output_path):
         except Exception as e:
             print(f"  ❌ Screenshot Error: {e}")
             return False
-        finally:
-            await browser.close()
 
 async def post_reply_via_browser(handle, content, reply_to_url):
     """
@@ -305,36 +228,34 @@ async def post_reply_via_browser(handle, content, reply_to_url):
     """
     print(f"  Browser: Launching to reply to @{handle}...")
     
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
-
     # Use persistent context to keep login state
-    user_data_dir = "data/browser_session"
+    user_data_dir = get_config().get("browser_user_data_dir", "data/browser_session")
     
-    async with async_playwright() as p:
-        # Launch persistent context
-        browser = await p.chromium.launch_persistent_context(
-            user_data_dir,
-            headless=cfg.get("headless_browser", True),
-            args=["--disable-blink-features=AutomationControlled"] # Anti-detect
-        )
-        
-        page = await browser.new_page()
+    # Pages come from the process-wide warm Chromium context instead of a cold launch per call
+    async with lease_page("chromium", user_data_dir) as page:
         
         try:
             # Randomize user agent slightly if possible, or just rely on persistent context
             
+            # Same cached login state the scraper uses; a lost session is logged back in once per cycle
+            session = await ensure_session(page)
+            if session != "ok":
+                print(f"  Browser: No X.com session ({session}). Skipping browser reply.")
+                return False, ""
+
             print(f"  Browser: Navigating to {reply_to_url}...")
             await page.goto(reply_to_url, wait_until="domcontentloaded", timeout=60000)
             
             # Check if login is required (simple check for "Log in" text or input field)
-            try:
-                login_indicator = await page.wait_for_selector('[data-testid="login"]', timeout=3000)
-                if login_indicator:
-                    print("  Browser: Login required! (This should be handled by a manual login session first)")
-                    # We could try auto-login here if credentials are in .env, but for now we assume session is valid
-            except:
-                pass # No login button found, assume logged in
+            # Racing it against the reply box means a logged-in session doesn't wait out the check
+            state, _ = await wait_for_any(page, {
+                "login": '[data-testid="login"]',
+                "reply": '[data-testid="tweetTextarea_0"]',
+            }, 10000, replaces=3000)
+            if state == "login":
+                print("  Browser: Login required! Session will be renewed on the next attempt.")
+                invalidate_session(page.context, "login wall on reply page")
+                return False, ""
                 
             # Wait for reply input area
             # Twitter class names change, but data-ids are usually stable
@@ -360,11 +281,16 @@ async def post_reply_via_browser(handle, content, reply_to_url):
                     print("  Browser Error: Reply button disabled!")
                     return False, ""
                     
-                await submit_button.click()
-                
-                # Wait for success indicator (e.g., toast or potential redirect)
-                print("  Browser: Reply submitted. Waiting for confirmation...")
-                await asyncio.sleep(5) 
+                # Listen for the CreateTweet call before clicking: X can answer before click() returns
+                print("  Browser: Submitting reply and waiting for confirmation...")
+                response = await expect_response(page, lambda r: "/CreateTweet" in r.url, submit_button.click, 10000, replaces=5000)
+                if response is None:
+                    # It may or may not have gone out: neither posted nor safe to post again
+                    print("  Browser Warning: No CreateTweet response within 10s. Reply is unconfirmed.")
+                    return False, BROWSER_UNCONFIRMED
+                if not response.ok:
+                    print(f"  Browser Error: Reply rejected by X (HTTP {response.status}).")
+                    return False, ""
                 
                 # Capture URL? Twitter doesn't always redirect to the new tweet immediately.
                 # We can assume success if no error toast appears.
@@ -385,8 +311,6 @@ async def post_reply_via_browser(handle, content, reply_to_url):
         except Exception as e:
             print(f"  Browser Navigation Error: {e}")
             return False, ""
-        finally:
-            await browser.close()
 
 async def post_tweet_via_browser(content):
     """
@@ -395,46 +319,41 @@ async def post_tweet_via_browser(content):
     """
     print(f"  Browser: Launching to post new tweet...")
     
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
-
     # Use persistent context to keep login state
-    user_data_dir = "data/browser_session"
+    user_data_dir = get_config().get("browser_user_data_dir", "data/browser_session")
     
-    async with async_playwright() as p:
-        # Launch persistent context
-        browser = await p.chromium.launch_persistent_context(
-            user_data_dir,
-            headless=cfg.get("headless_browser", True),
-            args=["--disable-blink-features=AutomationControlled"] # Anti-detect
-        )
-        
-        page = await browser.new_page()
+    # Pages come from the process-wide warm Chromium context instead of a cold launch per call
+    async with lease_page("chromium", user_data_dir) as page:
         
         try:
+            session = await ensure_session(page)
+            if session != "ok":
+                print(f"  Browser: No X.com session ({session}). Skipping browser post.")
+                return False, None, None
+
             # Navigate to Base URL
             print(f"  Browser: Navigating to X.com...")
             await page.goto("https://x.com", wait_until="domcontentloaded", timeout=60000)
             
-            # Check for generic error page "Something went wrong"
-            try:
-                # Text "Retry" or button with "Retry"
-                retry_button = await page.wait_for_selector('text="Retry"', timeout=5000)
-                if retry_button:
-                    print("  Browser: Found 'Retry' button. Clicking...")
-                    await retry_button.click()
+            # Generic error page ("Something went wrong"), login wall or the home timeline, whichever renders first
+            state, element = await wait_for_any(page, {
+                "retry": 'button:has-text("Retry")',
+                "login": '[data-testid="login"]',
+                "ready": '[data-testid="SideNav_NewTweet_Button"]',
+            }, 10000, replaces=10000)
+            if state == "retry":
+                print("  Browser: Found 'Retry' button. Clicking...")
+                try:
+                    await element.click()
                     await page.wait_for_load_state("domcontentloaded")
-            except:
-                pass
+                except:
+                    pass
 
             # Check for login requirement
-            try:
-                login_indicator = await page.wait_for_selector('[data-testid="login"]', timeout=5000)
-                if login_indicator:
-                    print("  Browser: Login required!")
-                    return False, None, None
-            except:
-                pass 
+            if state == "login":
+                print("  Browser: Login required!")
+                invalidate_session(page.context, "login wall on home page")
+                return False, None, None
             
             # Click the main "Post" button on the side nav
             print("  Browser: Looking for 'Post' button...")
@@ -507,14 +426,11 @@ async def post_tweet_via_browser(content):
         except Exception as e:
             print(f"  Browser Navigation Error: {e}")
             return False, None, None
-        finally:
-            await browser.close()
     return False, None, None
 
 async def run_poster():
     # Load config
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
+    cfg = get_config()
     
     mode = cfg.get("workflow_mode", "draft")
     if mode == "draft":
@@ -600,6 +516,11 @@ async def run_poster():
                  success, reply_tweet_id = await post_reply_via_browser(handle, content, reply_to_url)
             except Exception as e:
                 print(f"  Browser posting failed: {e}")
+            if reply_tweet_id == BROWSER_UNCONFIRMED:
+                # The API fallback could post it twice: park it for a manual check instead
+                print(f"  ⚠️ Reply {reply_id} to @{handle} may have been posted. Marked 'unconfirmed'; not retrying via API.")
+                mark_reply_status(reply_id, 'unconfirmed')
+                continue
             
         # Fallback to API if Browser fails OR if browser is disabled
         if not success:
@@ -656,9 +577,10 @@ async def run_poster():
         # Rate limiting between posts
         await asyncio.sleep(random.uniform(10, 30))
     
+    report_readiness()
     print("✅ Poster Complete ---")
 
 if __name__ == "__main__":
     from dotenv import load_dotenv
     load_dotenv()
-    asyncio.run(run_poster())
+    run_with_browsers(run_poster())
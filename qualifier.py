@@ -1,12 +1,13 @@
-import json
 from datetime import datetime, timezone
 from db import get_pending_replies, get_post_details, is_already_replied, mark_replies_batch, update_post_score
+from config import get_config
+from draft_ranking import parse_alternates
+from reply_index import get_reply_index, pick_fresh
 
 def run_qualifier():
     print("\n🛡️ Starting Qualifier (Safety Checks) ---")
     
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
+    cfg = get_config()
         
     age_limit_hours = cfg.get("qualify_age_limit_hours", 12)
     blacklist_words = [w.lower() for w in cfg.get("blacklist_words", [])]
@@ -27,6 +28,8 @@ def run_qualifier():
     count_rejected = 0
     
     now = datetime.now(timezone.utc)
+    index = get_reply_index(cfg)
+    similarity_threshold = cfg.get("reply_similarity_threshold", 0.5)
     
     # 0. Check Existing Qualified Replies for Expiry
     qualified = get_pending_replies(status='qualified')
@@ -126,9 +129,26 @@ def run_qualifier():
              count_rejected += 1
              continue
              
+        # 3. Near-duplicate Check: too similar to a posted or qualified reply (including ones qualified above)
+        reply_text = reply.get('content', '')
+        chosen, alternates, similarity = pick_fresh(index, reply_text, parse_alternates(reply.get('alternates')), similarity_threshold,
+                                                    statuses=('qualified', 'posted'), exclude=reply_id)
+        if chosen is None:
+            print(f"  ❌ Reply {reply_id} to @{handle} is {similarity:.0%} similar to an earlier reply. Rejecting.")
+            updates[reply_id] = {'status': 'rejected_similar', 'qualifier_reason': 'similar reply'}
+            count_rejected += 1
+            continue
+        swap = {}
+        if chosen != reply_text:
+            # Resolved with a stored alternate instead of another LLM call
+            print(f"  🔁 Reply {reply_id} to @{handle} repeated an earlier reply ({similarity:.0%}). Using an alternate draft.")
+            swap = {'content': chosen, 'alternates': alternates}
+            index.remove(reply_id)
+        index.add(reply_id, chosen, 'qualified')
+
         # If passed all checks
         print(f"  ✅ Qualified reply {reply_id} to @{handle} (Age: {age_hours:.1f}h).")
-        updates[reply_id] = {'status': 'qualified', 'qualifier_reason': 'passed safety checks'}
+        updates[reply_id] = {'status': 'qualified', 'qualifier_reason': 'passed safety checks', **swap}
         qualified_posts.add(post_id)
         count_qualified += 1
         
@@ -1,86 +1,361 @@
+import asyncio
 import json
+import math
 import random
 import os
 import csv
-import time
-from db import POSTS_CSV, update_post_score
+from datetime import datetime, timezone
+from db import POSTS_CSV, update_post_scores
+from config import get_config
+from llm_executor import LLMExecutor
+from fingerprint import content_fingerprint, normalize_text
+from score_cache import build_score_cache, row_simhash
+from eligibility import INELIGIBLE, eligibility_key, ineligible_reason, ineligible_source, report_ineligible, stale_ineligible
+from budget import budget_model, is_paused, record_spend, report_budget
+from embedding_scorer import build_index
+from scheduler import get_handle_stats
+from llm import BRAND_PATH, PromptTemplate, context_config, get_client, prepare_context, read_context_file
 
 def get_brand():
-    with open("config_user/brand.txt", "r") as f:
-        return f.read()
+    return read_context_file(BRAND_PATH)
 
 def get_ai_config():
-    with open("config_user/config.json") as f:
-        return json.load(f)
+    return get_config()
 
-def estimate_cost(model_name, input_tokens, output_tokens):
+def estimate_cost(model_name, input_tokens, output_tokens, cached_tokens=0):
+    """Cost of a call; cached_tokens (part of input_tokens) are billed at cached_input_cost (default: a quarter of input_cost)."""
     cfg = get_ai_config()
     models = cfg.get("ai_models", {})
     if model_name in models:
         in_cost = models[model_name]["input_cost"]
         out_cost = models[model_name]["output_cost"]
-        return (input_tokens / 1000 * in_cost) + (output_tokens / 1000 * out_cost)
+        cached_cost = models[model_name].get("cached_input_cost", in_cost / 4)
+        return ((input_tokens - cached_tokens) / 1000 * in_cost) + (cached_tokens / 1000 * cached_cost) + (output_tokens / 1000 * out_cost)
     return 0.0
 
-def qualify_post_with_ai(content, brand_text):
-    cfg = get_ai_config()
-    
-    # Test mode: use keyword matching instead of AI
-    if cfg.get("test_mode", False):
-        keywords = ["crypto", "monero", "privacy", "surveillance", "identity", "kyc", "freedom", "money"]
-        content_lower = content.lower()
-        hits = sum(1 for k in keywords if k in content_lower)
-        if hits > 0:
-            score = min(100, 50 + (hits * 20))
-        else:
-            score = random.randint(20, 60)
-        return score, 0.0  # No cost in test mode
-    
-    # Production mode: use Gemini API
-    # Production mode: use Google GenAI SDK
-    from google import genai
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if api_key:
-        api_key = api_key.split('#')[0].strip()
-    
-    if not api_key:
-        print("Error: GOOGLE_API_KEY not found.")
-        return 0, 0.0
+# Characters per token, learned per prompt template from responses that carried usage metadata
+DEFAULT_CHARS_PER_TOKEN = 4.0
+_chars_per_token = {}
 
-    client = genai.Client(api_key=api_key)
-    
-    model_name = cfg.get("quantifier_model", "gemini-1.5-flash")
+def count_tokens_local(text, template):
+    """Offline token estimate for when a response has no usage metadata."""
+    return max(1, round(len(text) / _chars_per_token.get(template, DEFAULT_CHARS_PER_TOKEN)))
+
+def response_cost(model_name, response, prompt, output_text, template):
+    """
+    Cost of one generate_content call from the usage metadata returned with it (thinking tokens are
+    billed as output). Falls back to count_tokens_local() for whatever the response doesn't report.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+
+    if input_tokens:
+        # Keep the template's ratio current so the fallback stays calibrated
+        ratio = len(prompt) / input_tokens
+        previous = _chars_per_token.get(template)
+        _chars_per_token[template] = ratio if previous is None else 0.8 * previous + 0.2 * ratio
+    else:
+        input_tokens = count_tokens_local(prompt, template)
 
-    prompt = f"""
+    if output_tokens is None:
+        output_tokens = count_tokens_local(output_text, template)
+    output_tokens += getattr(usage, "thoughts_token_count", None) or 0
+    cached_tokens = min(getattr(usage, "cached_content_token_count", None) or 0, input_tokens)
+    return estimate_cost(model_name, input_tokens, output_tokens, cached_tokens)
+
+def test_mode_score(content):
+    # Test mode: use keyword matching instead of AI
+    keywords = ["crypto", "monero", "privacy", "surveillance", "identity", "kyc", "freedom", "money"]
+    content_lower = content.lower()
+    hits = sum(1 for k in keywords if k in content_lower)
+    if hits > 0:
+        return min(100, 50 + (hits * 20))
+    return random.randint(20, 60)
+
+# The brand prefix is identical for every scoring call: it is sent once as (cached) context
+SCORE_SYSTEM = """
     You are an AI agent representing the following brand:
     {brand_text}
 
-    Your task is to score the following content based on how relevant and aligned it is to your brand's core thesis and focus areas.
-    Score it from 0 to 100.
-    
+    You score content based on how relevant and aligned it is to your brand's core thesis and focus areas.
+    Scores range from 0 to 100.
+
     0 = Irrelevant, spam, or boring.
     100 = Highly relevant, perfect for starting a conversation or debate.
+"""
+
+SCORE_PROMPT = PromptTemplate(SCORE_SYSTEM, """
+    Score the following content.
 
     Post Content:
     "{content}"
 
     Return ONLY the numeric score (e.g., 85).
-    """
+""")
+
+SCORE_BATCH_PROMPT = PromptTemplate(SCORE_SYSTEM, """
+    Score each of the following posts, independently of the others.
+
+    Posts (JSON):
+    {posts_json}
+
+    Return ONLY a JSON array with one object per post, e.g. [{{"post_id": "p1", "score": 85}}].
+""")
+
+async def qualify_post_with_ai(content, brand_text, executor, client):
+    """Returns (score, cost), or None if the post could not be scored (no client, API error, unreadable answer)."""
+    cfg = get_ai_config()
+    
+    if cfg.get("test_mode", False):
+        return test_mode_score(content), 0.0  # No cost in test mode
+    
+    # Production mode: use Google GenAI SDK
+    if not client:
+        return None
+    
+    model_name = budget_model(cfg.get("quantifier_model", "gemini-1.5-flash"), cfg)
+    prompt = SCORE_PROMPT.user(content=content)
+    config = context_config(model_name, SCORE_PROMPT.system(brand_text=brand_text))
 
     try:
-        response = client.models.generate_content(model=model_name, contents=prompt)
+        response = await executor.generate(client, model_name, prompt, config=config, expected_output_tokens=8)
         text = response.text.strip()
         score = int(''.join(filter(str.isdigit, text)))
         
-        # Estimate usage
-        input_tokens = client.models.count_tokens(model=model_name, contents=prompt).total_tokens
-        output_tokens = client.models.count_tokens(model=model_name, contents=text).total_tokens
-        cost = estimate_cost(model_name, input_tokens, output_tokens)
+        cost = response_cost(model_name, response, prompt, text, "score")
+        record_spend(cost, executor.stage)
         
         return score, cost
     except Exception as e:
+        # Not a score of 0: the post stays unscored and is retried on the next run
         print(f"AI Error: {e}")
-        return 0, 0.0
+        return None
+
+def build_batch_prompt(items):
+    """items: [(local_id, content)]. Local ids (p1, p2...) are used instead of 19-digit post ids the model could mangle."""
+    posts_json = json.dumps([{"post_id": local_id, "text": content} for local_id, content in items], ensure_ascii=False, indent=1)
+    return SCORE_BATCH_PROMPT.user(posts_json=posts_json)
+
+def parse_batch_scores(text, expected_ids):
+    """
+    Validates the model's JSON array. Returns {local_id: score} for well-formed entries only:
+    unknown ids, duplicates and non-numeric (including boolean) or out-of-range scores are dropped (and re-scored individually).
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[4:]
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end == -1:
+        return {}
+    try:
+        entries = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+
+    scores = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        local_id = str(entry.get("post_id", "")).strip()
+        if local_id not in expected_ids or local_id in scores:
+            continue
+        raw = entry.get("score")
+        # JSON true/false would pass float() as 1/0
+        if isinstance(raw, bool):
+            continue
+        try:
+            score = round(float(raw))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= score <= 100:
+            scores[local_id] = score
+    return scores
+
+def split_batch_cost(total_cost, contents, prompt_len):
+    """Attributes a batch's cost to its posts: shared prompt overhead split evenly, the rest by post length."""
+    content_len = sum(len(c) for c in contents)
+    overhead = max(0, prompt_len - content_len) / len(contents)
+    weights = [len(c) + overhead for c in contents]
+    total_weight = sum(weights) or 1
+    return [total_cost * w / total_weight for w in weights]
+
+async def qualify_posts_batch(posts, brand_text, executor, client):
+    """
+    Scores several posts with one request. posts: [(post_id, content)].
+    Returns {post_id: (score, cost)}. Posts the model skipped or mangled are scored one by one;
+    posts that still fail are left out so they stay unscored.
+    """
+    cfg = get_ai_config()
+    if cfg.get("test_mode", False):
+        return {post_id: (test_mode_score(content), 0.0) for post_id, content in posts}
+
+    results = {}
+    items = [(f"p{i + 1}", post_id, content) for i, (post_id, content) in enumerate(posts)]
+
+    if client and len(posts) > 1:
+        model_name = budget_model(cfg.get("quantifier_model", "gemini-1.5-flash"), cfg)
+        prompt = build_batch_prompt([(local_id, content) for local_id, _, content in items])
+        config = context_config(model_name, SCORE_BATCH_PROMPT.system(brand_text=brand_text), response_mime_type="application/json")
+        try:
+            response = await executor.generate(client, model_name, prompt, config=config, expected_output_tokens=15 * len(items))
+            text = response.text.strip()
+            scores = parse_batch_scores(text, {local_id for local_id, _, _ in items})
+
+            total_cost = response_cost(model_name, response, prompt, text, "score_batch")
+            record_spend(total_cost, executor.stage)
+            costs = split_batch_cost(total_cost, [c for _, _, c in items], len(prompt))
+
+            for (local_id, post_id, _), cost in zip(items, costs):
+                if local_id in scores:
+                    results[post_id] = (scores[local_id], cost)
+            if len(results) < len(items):
+                print(f"  ⚠️ Batch returned {len(results)}/{len(items)} valid scores. Scoring the rest individually.")
+        except Exception as e:
+            print(f"AI Error (batch): {e}")
+
+    missing = [(post_id, content) for _, post_id, content in items if post_id not in results]
+    singles = await executor.map(lambda item: qualify_post_with_ai(item[1], brand_text, executor, client), missing)
+    failed = 0
+    for (post_id, _), result in zip(missing, singles):
+        if result is None:
+            failed += 1
+        else:
+            results[post_id] = result
+    if failed:
+        print(f"  ⚠️ {failed} post(s) could not be scored. Left unscored for the next run.")
+    return results
+
+async def score_batches(batches, brand_text, on_batch=None):
+    """
+    Scores every batch concurrently through one LLMExecutor. Returns {post_id: (score, cost)}.
+    on_batch(batch_results) is called as each batch finishes, so results can be saved before the rest complete.
+    """
+    cfg = get_ai_config()
+    executor = LLMExecutor(cfg, stage="quantifier")
+    client = None if cfg.get("test_mode", False) else get_client()
+    await prepare_context(client, budget_model(cfg.get("quantifier_model", "gemini-1.5-flash"), cfg), SCORE_PROMPT.system(brand_text=brand_text), cfg)
+
+    async def score(batch):
+        # Batches not started when the budget runs out stay unscored for a later run
+        if is_paused(cfg):
+            return {}
+        batch_results = await qualify_posts_batch(batch, brand_text, executor, client)
+        if on_batch:
+            on_batch(batch_results)
+        return batch_results
+
+    results = {}
+    for batch_results in await executor.map(score, batches):
+        results.update(batch_results)
+    if executor.retries:
+        print(f"  🔁 {executor.retries} scoring request(s) retried after rate limiting or server errors.")
+    return results
+
+class KeywordModel:
+    """
+    Log-odds keyword classifier trained on our own LLM scores: estimates the probability that a post
+    scores at or above the quantifier threshold from which words it contains.
+    """
+
+    def __init__(self, threshold, min_df=2, alpha=1.0):
+        self.threshold = threshold
+        self.min_df = min_df
+        self.alpha = alpha
+        self.weights = {}
+        self.prior = 0.0
+        self.trained_on = 0
+
+    @staticmethod
+    def tokens(text):
+        return {w for w in normalize_text(text).split() if len(w) > 2}
+
+    def train(self, samples):
+        """samples: (content, score) pairs. Leaves the model untrained without both classes present."""
+        df_high, df_low = {}, {}
+        n_high = n_low = 0
+        for content, score in samples:
+            high = score >= self.threshold
+            counts = df_high if high else df_low
+            n_high += high
+            n_low += not high
+            for token in self.tokens(content):
+                counts[token] = counts.get(token, 0) + 1
+        if not n_high or not n_low:
+            return False
+        a = self.alpha
+        self.prior = math.log(n_high / n_low)
+        self.weights = {}
+        for token in set(df_high) | set(df_low):
+            h, l = df_high.get(token, 0), df_low.get(token, 0)
+            if h + l >= self.min_df:
+                self.weights[token] = math.log((h + a) / (n_high + 2 * a)) - math.log((l + a) / (n_low + 2 * a))
+        self.trained_on = n_high + n_low
+        return True
+
+    def probability_high(self, content):
+        logit = self.prior + sum(self.weights.get(t, 0.0) for t in self.tokens(content))
+        logit = max(-30.0, min(30.0, logit))
+        return 1 / (1 + math.exp(-logit))
+
+
+def latin_ratio(text):
+    letters = [c for c in text if c.isalpha()]
+    return sum(1 for c in letters if c.isascii()) / len(letters) if letters else 0.0
+
+
+def llm_scored_samples(posts_data):
+    """(post_id, content, score) of posts scored by the LLM: the training data for the local scorers."""
+    samples = []
+    for row in posts_data:
+        source = row.get('score_source', '')
+        try:
+            score = int(row.get('score'))
+            cost = float(row.get('quantification_cost') or 0.0)
+        except (TypeError, ValueError):
+            continue
+        # Only genuine LLM scores (older rows have no source but carry a cost); never train on our own output
+        if source in ("llm", "llm_fused") or (not source and cost > 0):
+            samples.append((row['post_id'], row.get('content', ''), score))
+    return samples
+
+
+def train_prefilter(samples, cfg):
+    """Trains the keyword model on posts scored by the LLM. Returns None until there is enough history."""
+    if len(samples) < cfg.get("prefilter_min_training_posts", 200):
+        return None
+    model = KeywordModel(cfg.get("quantifier_threshold", 80))
+    return model if model.train([(content, score) for _, content, score in samples]) else None
+
+
+def prefilter_score(content, model, cfg):
+    """
+    Local first stage: returns (score, reason) for posts that are confidently below the threshold
+    (too short, not in a Latin script, or a very low keyword-model probability), or None when the
+    post should go to the LLM. Blacklisted posts never get here (see eligibility.py).
+    """
+    threshold = cfg.get("quantifier_threshold", 80)
+    text = content or ""
+    normalized = normalize_text(text)
+    if len(normalized) < cfg.get("prefilter_min_chars", 20):
+        return 0, "too_short"
+    if latin_ratio(normalized) < cfg.get("prefilter_min_latin_ratio", 0.6):
+        return 0, "language"
+    if model:
+        p = model.probability_high(text)
+        if p < cfg.get("prefilter_low_probability", 0.02):
+            return min(threshold - 1, round(p * 100)), "keywords"
+    return None
+
+
+# posts.csv fields set by scoring; written back per post through db.update_post_scores
+SCORE_FIELDS = ("score", "quantification_cost", "scored_at", "score_source", "content_fingerprint", "simhash")
+
+def save_scores(rows):
+    if rows:
+        update_post_scores({(row['post_id'], row['handle']): {f: row[f] for f in SCORE_FIELDS if f in row} for row in rows})
 
 def run_quantifier():
     cfg = get_ai_config()
@@ -105,7 +380,12 @@ def run_quantifier():
     with open(POSTS_CSV, 'r', newline='') as f:
         reader = csv.DictReader(f)
         posts_data = list(reader)
-        fieldnames = reader.fieldnames
+
+    # Posts marked ineligible under other settings (e.g. reply_to_replies since turned on) are checked again
+    eligibility = eligibility_key(cfg)
+    for row in posts_data:
+        if stale_ineligible(row, eligibility):
+            row['score'] = ''
 
     # Count unscored posts
     # Count unscored posts (score is empty string or None)
@@ -113,31 +393,168 @@ def run_quantifier():
     
     print(f"🧐 Quantification Start: {unscored_count} posts to be scored. Replies enabled: {reply_to_replies}, Reposts enabled: {reply_to_reposts}")
 
-    # Check if we need to update rows
-    updates = []
     qualified_count = 0
     processed_count = 0
     
-    for row in posts_data:
-        post_id = row['post_id']
-        handle = row['handle']
-        content = row['content']
-        
-        # Check if score is missing (empty string or None)
-        # Note: '0' is a valid score now (meaning AI rated it 0)
-        raw_score = row.get('score')
-        needs_scoring = raw_score in [None, '']
-
-        if needs_scoring:
-            score, cost = qualify_post_with_ai(content, brand_text)
-            print(f"  📊 Scored @{handle}: {score} (Cost: ${cost:.5f})")
-            
+    # Score in batches of quantifier_batch_size posts per request
+    # Note: '0' is a valid score now (meaning AI rated it 0)
+    # Batches run concurrently; llm_executor keeps them within the model's RPM/TPM quota
+    batch_size = max(1, cfg.get("quantifier_batch_size", 10))
+    unscored_rows = [row for row in posts_data if row.get('score') in [None, '']]
+
+    # Reuse scores of identical or near-identical posts seen within score_cache_ttl_hours;
+    # duplicates within this run are scored once
+    cache = build_score_cache(posts_data, cfg)
+    now = datetime.now(timezone.utc).isoformat()
+    # Posts we could never reply to are marked ineligible instead of scored
+    ineligible = []
+    for row in unscored_rows:
+        reason = ineligible_reason(row, cfg)
+        if reason:
+            row['score'] = INELIGIBLE
+            row['quantification_cost'] = 0.0
+            row['scored_at'] = now
+            row['score_source'] = ineligible_source(reason, eligibility)
+            ineligible.append(reason)
+    report_ineligible(ineligible, cache.average_cost())
+
+    to_score = {}  # fingerprint (or post_id for posts without text) -> rows sharing it
+    for row in unscored_rows:
+        if row['score'] == INELIGIBLE:
+            continue
+        if not row.get('content_fingerprint'):
+            row['content_fingerprint'] = content_fingerprint(row.get('content', ''))
+            row['simhash'] = f"{row_simhash(row):016x}"
+        key = row['content_fingerprint'] or f"id:{row['post_id']}"
+        if key in to_score:
+            to_score[key].append(row)
+            continue
+        entry = cache.lookup(row['content_fingerprint'], int(row['simhash'], 16))
+        if entry:
+            print(f"  ♻️ Cached score @{row['handle']}: {entry['score']}")
+            row['score'] = entry['score']
+            row['quantification_cost'] = 0.0
+            row['scored_at'] = now
+            row['score_source'] = "cache"
+        else:
+            to_score[key] = [row]
+
+    # Local pre-filter: confident lows are scored here; a sampled audit share still goes to the LLM
+    audits = {}  # key -> local (score, reason) for posts scored by both
+    avoided = 0
+    audit_rate = cfg.get("prefilter_audit_rate", 0.05)
+    samples = llm_scored_samples(posts_data) if to_score else []
+    keyword_model = None
+
+    def score_locally(key, score, source):
+        for row in to_score.pop(key):
             row['score'] = score
-            row['quantification_cost'] = cost
-            
-            # Rate limit protection (simple sleep)
-            time.sleep(1)
-            
+            row['quantification_cost'] = 0.0
+            row['scored_at'] = now
+            row['score_source'] = source
+
+    if cfg.get("prefilter_enabled", True) and to_score:
+        keyword_model = train_prefilter(samples, cfg)
+        print(f"  🔎 Pre-filter keyword model: {f'trained on {keyword_model.trained_on} posts' if keyword_model else 'not enough scored history yet'}.")
+        for key, rows in list(to_score.items()):
+            verdict = prefilter_score(rows[0].get('content', ''), keyword_model, cfg)
+            if verdict is None:
+                continue
+            if random.random() < audit_rate:
+                audits[key] = verdict
+                continue
+            score, reason = verdict
+            print(f"  🔎 Pre-filtered @{rows[0]['handle']}: {score} ({reason})")
+            score_locally(key, score, f"prefilter:{reason}")
+            avoided += 1
+
+    # Embedding scorer: as 'primary' it scores every remaining post, as 'prefilter' only confident lows
+    embedding_mode = cfg.get("embedding_scorer", "off")
+    if embedding_mode in ("primary", "prefilter") and to_score:
+        client = None if cfg.get("test_mode", False) else get_client()
+        index = build_index(samples, brand_text, cfg, client, cost_fn=estimate_cost)
+        if index is None:
+            print("  🧭 Embedding scorer: not enough high and low scored posts to calibrate yet.")
+        else:
+            keys = [key for key in to_score if key not in audits]
+            scores = index.score([to_score[key][0].get('content', '') for key in keys])
+            record_spend(index.cost, "quantifier")
+            max_local = 100 if embedding_mode == "primary" else cfg.get("embedding_prefilter_max_score", 40)
+            for key, score in zip(keys, scores):
+                if score > max_local:
+                    continue
+                if random.random() < audit_rate:
+                    audits[key] = (score, "embedding")
+                    continue
+                print(f"  🧭 Embedding score @{to_score[key][0]['handle']}: {score}")
+                score_locally(key, score, "embedding")
+                avoided += 1
+
+    # Scores are saved as they arrive (cached/pre-filtered now, LLM scores per batch): an interrupted
+    # run keeps what it paid for, and the next run only scores what is still empty
+    save_scores([row for row in unscored_rows if row.get('score') not in [None, '']])
+
+    groups = {rows[0]['post_id']: rows for rows in to_score.values()}
+    results = {}
+
+    def apply_batch(batch_results, source="llm"):
+        results.update(batch_results)
+        scored = []
+        for post_id, (score, cost) in batch_results.items():
+            rows = groups[post_id]
+            if source == "llm":
+                print(f"  📊 Scored @{rows[0]['handle']}: {score} (Cost: ${cost:.5f})")
+            for i, row in enumerate(rows):
+                row['score'] = score
+                row['quantification_cost'] = cost if i == 0 else 0.0
+                row['scored_at'] = datetime.now(timezone.utc).isoformat()
+                row['score_source'] = source if i == 0 else "cache"
+            if len(rows) > 1:
+                cache.hits += len(rows) - 1
+                cache.saved_cost += cost * (len(rows) - 1)
+            scored += rows
+        save_scores(scored)
+
+    paused = bool(groups) and report_budget(cfg)["level"] == "pause"
+
+    # Fused mode: likely-relevant posts (keyword model or the author's track record) are scored and
+    # drafted in one call, so a hot post has its reply ready after this stage instead of the generator's
+    if cfg.get("fused_mode", False) and groups and not paused:
+        handle_stats = get_handle_stats({rows[0]['handle'] for rows in groups.values()}, cfg)
+
+        def likely_relevant(row):
+            if keyword_model and keyword_model.probability_high(row.get('content', '')) >= cfg.get("fused_min_probability", 0.5):
+                return True
+            stats = handle_stats.get(row['handle'].lower(), {})
+            # The yield is smoothed towards 0.5: only trust it for handles with some scored history
+            return (stats.get('scored', 0) >= cfg.get("fused_min_handle_posts", 5)
+                    and stats['yield'] >= cfg.get("fused_min_handle_yield", 0.3))
+
+        hot = [rows[0] for rows in groups.values() if likely_relevant(rows[0])]
+        if hot:
+            from generator import run_fused  # generator imports this module
+            apply_batch(run_fused(hot, brand_text), "llm_fused")
+
+    pending = [post_id for post_id in groups if post_id not in results]
+    batches = [[(post_id, groups[post_id][0]['content']) for post_id in pending[i:i + batch_size]]
+               for i in range(0, len(pending), batch_size)]
+    if batches and paused:
+        print(f"  ⏸️ LLM budget reached: {len(pending)} posts left unscored until spend falls below the caps.")
+        batches = []
+    if batches:
+        asyncio.run(score_batches(batches, brand_text, on_batch=apply_batch))
+        if len(results) < len(groups):
+            print(f"  ⏸️ {len(groups) - len(results)} posts left unscored (LLM errors or budget reached mid-run). They are retried next run.")
+    cache.report()
+    # Agreement: the local verdict and the LLM fall on the same side of the threshold
+    audited = {key: verdict for key, verdict in audits.items() if to_score[key][0]['post_id'] in results}
+    if avoided or audited:
+        agreed = sum(1 for key, (score, _) in audited.items()
+                     if (results[to_score[key][0]['post_id']][0] >= threshold) == (score >= threshold))
+        agreement = f"{agreed}/{len(audited)} ({agreed / len(audited):.0%})" if audited else "no audit sample this run"
+        print(f"  🔎 Local scoring: {avoided} LLM calls avoided. Audit agreement with LLM: {agreement}.")
+
+    for row in posts_data:
         try:
             final_score = int(row.get('score', 0) if row.get('score') not in [None, ''] else 0)
         except ValueError:
@@ -147,20 +564,7 @@ def run_quantifier():
             qualified_count += 1
             
         processed_count += 1
-        
-        # Always append the row (whether updated or not)
-        updates.append(row)
 
-    # Rewrite CSV if changes happened (and if we are running this logic, we likely rely on memory for small datasets)
-    # The previous logic used update_post_score which re-read the CSV. 
-    # To support cost updating, we will write back the whole file here since we have it in memory.
-    
-    if updates:
-        with open(POSTS_CSV, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-            writer.writeheader()
-            writer.writerows(updates)
-            
     print(f"✅ Quantification Complete: {qualified_count} out of {processed_count} posts qualified (Score >= {threshold}).")
 
 if __name__ == "__main__":
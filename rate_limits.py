@@ -0,0 +1,88 @@
+import csv
+import os
+from datetime import datetime, timezone, timedelta
+from db import REPLIES_CSV
+
+# Manual caps on X API posting (the API tier allows this many replies)
+API_LIMIT_24H = 17
+API_LIMIT_30D = 500
+
+# Browser fallback posts carry this id; they don't count against API limits
+BROWSER_POST_ID = 'browser_posted_id_placeholder'
+
+
+def get_api_post_times():
+    """Times of successful API posts in replies.csv (browser posts excluded)."""
+    api_posts = []
+    if not os.path.exists(REPLIES_CSV):
+        return api_posts
+
+    # API posts have real reply ids; the browser fallback stores a placeholder
+    with open(REPLIES_CSV, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if row['status'] == 'posted' and row.get('posted_at'):
+                if row.get('reply_tweet_id', '') == BROWSER_POST_ID:
+                    continue
+                try:
+                    posted_at = datetime.fromisoformat(row['posted_at'])
+                    if posted_at.tzinfo is None:
+                        posted_at = posted_at.replace(tzinfo=timezone.utc)
+                    api_posts.append(posted_at)
+                except:
+                    pass
+    return api_posts
+
+
+def check_manual_rate_limits():
+    """
+    Checks if we have exceeded the manual rate limits:
+    - 17 requests / 24 hours
+    - 500 requests / 30 days
+    Returns (True, wait_seconds) if limited, (False, 0) if allowed.
+    """
+    api_posts = get_api_post_times()
+    now = datetime.now(timezone.utc)
+
+    # 24h limit
+    cutoff_24h = now - timedelta(hours=24)
+    posts_24h = [t for t in api_posts if t > cutoff_24h]
+
+    if len(posts_24h) >= API_LIMIT_24H:
+        # Find when the oldest post in the window expires
+        oldest_in_window = min(posts_24h)
+        # reset time is oldest + 24h
+        reset_time = oldest_in_window + timedelta(hours=24)
+        wait_seconds = (reset_time - now).total_seconds()
+        if wait_seconds < 0: wait_seconds = 0
+        return True, wait_seconds + 5 # Buffer
+
+    # Monthly limit (approx 30 days)
+    cutoff_30d = now - timedelta(days=30)
+    posts_30d = [t for t in api_posts if t > cutoff_30d]
+
+    if len(posts_30d) >= API_LIMIT_30D:
+        oldest_in_window = min(posts_30d)
+        reset_time = oldest_in_window + timedelta(days=30)
+        wait_seconds = (reset_time - now).total_seconds()
+        if wait_seconds < 0: wait_seconds = 0
+        return True, wait_seconds + 30 # Buffer
+
+    return False, 0
+
+
+def get_posting_capacity(window_hours):
+    """
+    How many API posts the rate limits still allow between now and window_hours from now. A rolling
+    limit of L posts per P hours allows L * ceil(window / P) posts in the window, minus the past posts
+    still inside the P-hour window that ends when ours does.
+    """
+    api_posts = get_api_post_times()
+    now = datetime.now(timezone.utc)
+    capacity = None
+    for limit, period in ((API_LIMIT_24H, 24), (API_LIMIT_30D, 30 * 24)):
+        periods = max(1, -(-window_hours // period))
+        start = now + timedelta(hours=window_hours) - timedelta(hours=period * periods)
+        remaining = max(0, limit * periods - sum(1 for t in api_posts if t > start))
+        capacity = remaining if capacity is None else min(capacity, remaining)
+    return int(capacity)
@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+# Per-step accounting: how long each readiness wait took versus the fixed sleep it replaced
+_stats = {"waits": 0, "spent": 0.0, "replaced": 0.0, "timeouts": 0}
+
+# wait_for_function errors caused by a navigation; the wait is re-armed on the new document
+NAVIGATION_ERRORS = ("Execution context was destroyed", "navigation")
+NAVIGATION_RETRY_DELAY = 0.1
+
+# Resolves once no DOM mutation has happened for quiet_ms (or at the deadline)
+DOM_QUIET_JS = """
+([quietMs, timeoutMs]) => new Promise(resolve => {
+    let timer = setTimeout(done, quietMs);
+    const deadline = setTimeout(() => done(false), timeoutMs);
+    const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(done, quietMs); });
+    function done(quiet = true) { observer.disconnect(); clearTimeout(timer); clearTimeout(deadline); resolve(quiet); }
+    observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+})
+"""
+
+# Resolves once every <img> under el has loaded (or failed)
+IMAGES_LOADED_JS = """
+el => Promise.all(Array.from(el.querySelectorAll('img')).map(img => img.complete ? null :
+    new Promise(resolve => { img.addEventListener('load', resolve, {once: true}); img.addEventListener('error', resolve, {once: true}); })))
+"""
+
+
+def _record(start, replaces, timed_out):
+    spent = time.time() - start
+    _stats["waits"] += 1
+    _stats["spent"] += spent
+    if timed_out:
+        _stats["timeouts"] += 1
+    if replaces:
+        # Only steps that used to be fixed sleeps have a meaningful baseline
+        _stats["replaced"] += max(0.0, replaces / 1000 - spent)
+
+
+async def wait_for_any(page, selectors, timeout, replaces=None):
+    """
+    Waits until one of {name: css_selector} is visible. Returns (name, element) for the first one
+    present, or (None, None) at the deadline. 'replaces' is the fixed sleep (ms) this wait stands in for.
+    """
+    start = time.time()
+    try:
+        await page.wait_for_selector(", ".join(selectors.values()), timeout=timeout)
+    except Exception:
+        _record(start, replaces, True)
+        return None, None
+    _record(start, replaces, False)
+    for name, selector in selectors.items():
+        element = await page.query_selector(selector)
+        if element:
+            return name, element
+    return None, None
+
+
+async def wait_for_selector(page, selector, timeout, replaces=None):
+    """Like page.wait_for_selector() but returns None instead of raising at the deadline."""
+    _, element = await wait_for_any(page, {"match": selector}, timeout, replaces)
+    return element
+
+
+async def wait_for_response(page, predicate, timeout, replaces=None):
+    """Waits for a network response matching predicate(response). Returns it, or None at the deadline."""
+    start = time.time()
+    try:
+        response = await page.wait_for_event("response", predicate=predicate, timeout=timeout)
+    except Exception:
+        _record(start, replaces, True)
+        return None
+    _record(start, replaces, False)
+    return response
+
+
+async def expect_response(page, predicate, action, timeout, replaces=None):
+    """
+    Runs 'await action()' with the response listener already armed, so a response that arrives while
+    the action is still returning is not missed. Returns the matching response, or None at the deadline.
+    Errors raised by the action itself propagate.
+    """
+    start = time.time()
+    try:
+        async with page.expect_response(predicate, timeout=timeout) as info:
+            await action()
+        response = await info.value
+    except Exception as e:
+        if "Timeout" in type(e).__name__ or "Timeout" in str(e):
+            _record(start, replaces, True)
+            return None
+        raise
+    _record(start, replaces, False)
+    return response
+
+
+async def wait_for_condition(page, expression, timeout, replaces=None):
+    """
+    Waits until the JS expression is truthy. Survives navigations (the expression is re-armed on the
+    new document). Returns False at the deadline or on any other error.
+    """
+    start = time.time()
+    deadline = start + timeout / 1000
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            _record(start, replaces, True)
+            return False
+        try:
+            await page.wait_for_function(expression, timeout=remaining * 1000)
+            _record(start, replaces, False)
+            return True
+        except Exception as e:
+            if "Timeout" in type(e).__name__ or "Timeout" in str(e):
+                _record(start, replaces, True)
+                return False
+            if not any(marker in str(e) for marker in NAVIGATION_ERRORS):
+                print(f"  ⚠️ Readiness: wait failed: {e}")
+                _record(start, replaces, True)
+                return False
+            # Redirected mid-wait: give the new document a moment, then re-arm on it
+            await asyncio.sleep(NAVIGATION_RETRY_DELAY)
+
+
+async def wait_for_dom_quiet(page, quiet_ms=400, timeout=3000, replaces=None):
+    """Waits for the DOM to stop changing (e.g. lazy content after a scroll). Returns False at the deadline."""
+    start = time.time()
+    try:
+        quiet = await page.evaluate(DOM_QUIET_JS, [quiet_ms, timeout])
+    except Exception:
+        quiet = False
+    _record(start, replaces, not quiet)
+    return bool(quiet)
+
+
+async def wait_for_images(element, timeout=5000, replaces=None):
+    """Waits for the images inside element to finish loading. Returns False at the deadline."""
+    start = time.time()
+    try:
+        # evaluate() has no timeout of its own
+        await asyncio.wait_for(element.evaluate(IMAGES_LOADED_JS), timeout / 1000)
+        loaded = True
+    except Exception:
+        loaded = False
+    _record(start, replaces, not loaded)
+    return loaded
+
+
+def get_stats():
+    return dict(_stats)
+
+
+def report_readiness(reset=True):
+    """Prints how much waiting the readiness checks saved versus the fixed sleeps they replaced."""
+    if _stats["waits"]:
+        print(f"  ⏱️ Readiness: {_stats['waits']} waits, {_stats['spent']:.1f}s waiting, "
+              f"~{_stats['replaced']:.1f}s saved vs fixed sleeps ({_stats['timeouts']} hit their deadline).")
+    if reset:
+        for key in _stats:
+            _stats[key] = 0 if key in ("waits", "timeouts") else 0.0
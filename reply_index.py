@@ -0,0 +1,149 @@
+import csv
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from db import REPLIES_CSV
+from fingerprint import normalize_text
+
+# Replies that count as something we have said (or are about to say)
+LIVE_STATUSES = ("pending", "qualified", "posted")
+# Mersenne prime for the MinHash permutations; shingle hashes are 32-bit so a * h + b fits in uint64
+MERSENNE_PRIME = (1 << 61) - 1
+
+_index = None
+_synced = None  # (mtime, size) of replies.csv at the last sync
+
+
+def shingles(text):
+    """Word unigrams and bigrams of the normalized text."""
+    words = normalize_text(text).split()
+    return set(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+class ReplyIndex:
+    """
+    MinHash signatures of our replies, bucketed by LSH bands so a query only compares against replies
+    sharing a band (bands=16 x 4 rows puts the 50% match point near Jaccard 0.5).
+    """
+
+    def __init__(self, num_perm=64, bands=16, seed=1):
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.signatures = {}  # reply id -> signature
+        self.status = {}      # reply id -> status
+        self.buckets = {}     # (band, band values) -> set of reply ids
+
+    def signature(self, text):
+        features = shingles(text)
+        if not features:
+            return None
+        hashes = np.array([int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=4).digest(), "big") for f in features],
+                          dtype=np.uint64)
+        return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+    def _bands(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, reply_id, text, status="pending"):
+        reply_id = str(reply_id)
+        if reply_id in self.signatures:
+            self.status[reply_id] = status
+            return
+        signature = self.signature(text)
+        if signature is None:
+            return
+        self.signatures[reply_id] = signature
+        self.status[reply_id] = status
+        for key in self._bands(signature):
+            self.buckets.setdefault(key, set()).add(reply_id)
+
+    def remove(self, reply_id):
+        signature = self.signatures.pop(str(reply_id), None)
+        self.status.pop(str(reply_id), None)
+        if signature is None:
+            return
+        for key in self._bands(signature):
+            bucket = self.buckets.get(key)
+            if bucket:
+                bucket.discard(str(reply_id))
+                if not bucket:
+                    del self.buckets[key]
+
+    def query(self, text, exclude=None):
+        """[(reply id, estimated Jaccard similarity)] of indexed replies sharing an LSH band with text, most similar first."""
+        signature = self.signature(text)
+        if signature is None:
+            return []
+        candidates = set()
+        for key in self._bands(signature):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(str(exclude))
+        matches = [(rid, float((self.signatures[rid] == signature).mean())) for rid in candidates]
+        return sorted(matches, key=lambda m: m[1], reverse=True)
+
+    def most_similar(self, text, statuses=LIVE_STATUSES, exclude=None):
+        """(reply id, similarity) of the closest indexed reply whose status is in statuses, or (None, 0.0)."""
+        for rid, similarity in self.query(text, exclude):
+            if self.status.get(rid) in statuses:
+                return rid, similarity
+        return None, 0.0
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+def _parse_time(value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def get_reply_index(cfg):
+    """
+    The process-wide index of live replies created in the last reply_similarity_days. Whenever replies.csv
+    has changed, new replies are hashed in and rejected, expired or aged-out ones are dropped.
+    """
+    global _index, _synced
+    if _index is None:
+        _index = ReplyIndex()
+    if not os.path.exists(REPLIES_CSV):
+        return _index
+    stat = os.stat(REPLIES_CSV)
+    if _synced == (stat.st_mtime, stat.st_size):
+        return _index
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=cfg.get("reply_similarity_days", 30))
+    live = set()
+    with open(REPLIES_CSV, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            created_at = _parse_time(row.get('created_at'))
+            if row['status'] not in LIVE_STATUSES or (created_at and created_at < cutoff):
+                continue
+            live.add(row['id'])
+            _index.add(row['id'], row['content'], row['status'])
+    for rid in [rid for rid in _index.signatures if rid not in live]:
+        _index.remove(rid)
+    _synced = (stat.st_mtime, stat.st_size)
+    return _index
+
+
+def pick_fresh(index, text, alternates, threshold, statuses=LIVE_STATUSES, exclude=None):
+    """
+    The first of text and its alternates that is less than threshold similar to every indexed reply with one
+    of statuses. Returns (chosen text or None, remaining alternates, similarity of text's closest match).
+    """
+    _, similarity = index.most_similar(text, statuses, exclude)
+    if similarity < threshold:
+        return text, alternates, similarity
+    for i, alternate in enumerate(alternates):
+        if index.most_similar(alternate, statuses, exclude)[1] < threshold:
+            return alternate, alternates[:i] + alternates[i + 1:], similarity
+    return None, alternates, similarity
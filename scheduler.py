@@ -0,0 +1,152 @@
+import csv
+import os
+from datetime import datetime, timezone, timedelta
+from db import POSTS_CSV, get_handle_checks
+
+# Smoothing priors so handles with little or no history are neither starved nor hammered
+PRIOR_POSTS = 1.0
+PRIOR_HOURS = 24.0
+
+
+def parse_posted_at(posted_at_str):
+    """Parses the ISO or Nitter-style date strings found in posts.csv. Returns None on failure."""
+    if not posted_at_str:
+        return None
+    try:
+        try:
+            posted_at = datetime.fromisoformat(posted_at_str)
+        except ValueError:
+            clean_date = posted_at_str.replace(" UTC", "").replace("· ", "")
+            posted_at = datetime.strptime(clean_date, "%b %d, %Y %I:%M %p")
+        if posted_at.tzinfo is None:
+            posted_at = posted_at.replace(tzinfo=timezone.utc)
+        return posted_at
+    except Exception:
+        return None
+
+
+def get_handle_stats(handles, cfg):
+    """
+    Estimates each handle's post arrival rate (posts/hour) and high-score yield
+    from posts.csv history over the configured lookback window.
+    Returns {handle_lower: {'rate': float, 'yield': float, 'recent': int, 'scored': int, 'high': int}}.
+    """
+    lookback_days = cfg.get("polling_lookback_days", 7)
+    threshold = cfg.get("quantifier_threshold", 80)
+    window_hours = lookback_days * 24
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=window_hours)
+
+    counts = {h.lower(): {'recent': 0, 'scored': 0, 'high': 0} for h in handles}
+
+    if os.path.exists(POSTS_CSV):
+        with open(POSTS_CSV, 'r', newline='') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                key = row.get('handle', '').lower()
+                if key not in counts:
+                    continue
+                if row.get('is_pinned') == 'True':
+                    continue
+
+                posted_at = parse_posted_at(row.get('posted_at') or row.get('scraped_at'))
+                if not posted_at or posted_at < cutoff:
+                    continue
+
+                c = counts[key]
+                c['recent'] += 1
+                try:
+                    score = int(row.get('score', ''))
+                except (ValueError, TypeError):
+                    continue
+                c['scored'] += 1
+                if score >= threshold:
+                    c['high'] += 1
+
+    stats = {}
+    for key, c in counts.items():
+        stats[key] = {
+            **c,
+            'rate': (c['recent'] + PRIOR_POSTS) / (window_hours + PRIOR_HOURS),
+            # Laplace-smoothed share of posts that clear quantifier_threshold
+            'yield': (c['high'] + 1) / (c['scored'] + 2),
+        }
+    return stats
+
+
+def compute_poll_intervals(handles, cfg):
+    """
+    Returns {handle: interval_seconds}. Handles whose expected rate of high-scoring
+    posts is above the fleet median are polled more often than refresh_seconds,
+    quieter ones less often, clamped to [min_poll_seconds, max_poll_seconds].
+    """
+    refresh = cfg.get("refresh_seconds", 1800)
+    min_poll = cfg.get("min_poll_seconds", 600)
+    max_poll = cfg.get("max_poll_seconds", 14400)
+
+    stats = get_handle_stats(handles, cfg)
+    values = sorted(s['rate'] * s['yield'] for s in stats.values())
+    median = values[len(values) // 2] if values else 0
+
+    intervals = {}
+    for handle in handles:
+        s = stats[handle.lower()]
+        value = s['rate'] * s['yield']
+        if median <= 0 or value <= 0:
+            interval = refresh
+        else:
+            # Square-root damping keeps one very busy account from dominating the schedule
+            interval = refresh * (median / value) ** 0.5
+        intervals[handle] = int(max(min_poll, min(max_poll, interval)))
+    return intervals
+
+
+def get_poll_schedule(handles, cfg):
+    """Returns {handle: (next_due_datetime, interval_seconds)}. Never-checked handles are due now."""
+    now = datetime.now(timezone.utc)
+    intervals = compute_poll_intervals(handles, cfg)
+    last_checks = get_handle_checks()
+
+    schedule = {}
+    for handle in handles:
+        interval = intervals[handle]
+        last_checked = parse_posted_at(last_checks.get(handle))
+        next_due = last_checked + timedelta(seconds=interval) if last_checked else now
+        schedule[handle] = (next_due, interval)
+    return schedule
+
+
+def get_due_handles(handles, cfg):
+    """Returns the subset of handles (in config order) whose next poll time has arrived."""
+    if not cfg.get("adaptive_polling", False):
+        return list(handles)
+
+    now = datetime.now(timezone.utc)
+    schedule = get_poll_schedule(handles, cfg)
+    return [h for h in handles if schedule[h][0] <= now]
+
+
+def seconds_until_next_due(handles, cfg):
+    """Seconds until the earliest handle becomes due (0 if one is already due)."""
+    refresh = cfg.get("refresh_seconds", 1800)
+    if not cfg.get("adaptive_polling", False) or not handles:
+        return refresh
+
+    now = datetime.now(timezone.utc)
+    schedule = get_poll_schedule(handles, cfg)
+    earliest = min(next_due for next_due, _ in schedule.values())
+    return max(0, int((earliest - now).total_seconds()))
+
+
+if __name__ == "__main__":
+    from config import get_config
+    cfg = get_config()
+
+    handles = cfg.get("handles", [])
+    stats = get_handle_stats(handles, cfg)
+    now = datetime.now(timezone.utc)
+    print(f"{'Handle':<20} | {'Posts/h':>7} | {'Yield':>5} | {'Interval':>8} | Due in")
+    print("-" * 65)
+    for handle, (next_due, interval) in get_poll_schedule(handles, cfg).items():
+        s = stats[handle.lower()]
+        due_in = max(0, int((next_due - now).total_seconds()))
+        print(f"{handle:<20} | {s['rate']:>7.3f} | {s['yield']:>5.2f} | {interval:>7}s | {due_in}s")
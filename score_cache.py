@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+from db import update_post_scores
+from fingerprint import content_fingerprint, simhash, hamming_distance
+
+# The 64-bit SimHash is split into this many bands; two hashes within BANDS - 1 bits of each other
+# always share at least one band exactly, so only posts in a shared band need a distance check
+BANDS = 4
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def _parse_time(value):
+    try:
+        ts = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def row_simhash(row):
+    """The post's stored SimHash (hex), computed from its content for rows scraped before the column existed."""
+    try:
+        return int(row["simhash"], 16)
+    except (KeyError, TypeError, ValueError):
+        return simhash(row.get("content", ""))
+
+
+class ScoreCache:
+    """
+    Scores of already-quantified posts keyed by content fingerprint, with a SimHash band index
+    for near duplicates (same text with a different link, emoji or trailing hashtag).
+    """
+
+    def __init__(self, ttl_hours=168, max_distance=3, max_entries=50000):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_distance = min(max_distance, BANDS - 1)
+        self.max_entries = max_entries
+        self.entries = {}  # fingerprint -> {"score", "cost", "scored_at", "simhash"}
+        self.bands = [{} for _ in range(BANDS)]  # band value -> set of fingerprints
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_cost = 0.0
+        self._cost_sum = 0.0  # Running total and count of the non-zero entry costs, for average_cost()
+        self._cost_count = 0
+
+    def _band_keys(self, sh):
+        return [(sh >> (i * BAND_BITS)) & BAND_MASK for i in range(BANDS)]
+
+    def add(self, fingerprint, sh, score, cost, scored_at):
+        if not fingerprint or self.ttl <= timedelta(0):
+            return
+        current = self.entries.get(fingerprint)
+        if current and current["scored_at"] >= scored_at:
+            return
+        if current:
+            self._remove(fingerprint)
+        if cost > 0:
+            self._cost_sum += cost
+            self._cost_count += 1
+        self.entries[fingerprint] = {"score": score, "cost": cost, "scored_at": scored_at, "simhash": sh}
+        for band, key in zip(self.bands, self._band_keys(sh)):
+            band.setdefault(key, set()).add(fingerprint)
+
+    def _remove(self, fingerprint):
+        entry = self.entries.pop(fingerprint)
+        if entry["cost"] > 0:
+            self._cost_sum -= entry["cost"]
+            self._cost_count -= 1
+        for band, key in zip(self.bands, self._band_keys(entry["simhash"])):
+            band[key].discard(fingerprint)
+            if not band[key]:
+                del band[key]
+
+    def evict(self, now=None):
+        """Drops entries older than the TTL, then the oldest ones beyond max_entries."""
+        now = now or datetime.now(timezone.utc)
+        for fingerprint in [fp for fp, e in self.entries.items() if now - e["scored_at"] > self.ttl]:
+            self._remove(fingerprint)
+        overflow = len(self.entries) - self.max_entries
+        if overflow > 0:
+            oldest = sorted(self.entries, key=lambda fp: self.entries[fp]["scored_at"])[:overflow]
+            for fingerprint in oldest:
+                self._remove(fingerprint)
+
+    def lookup(self, fingerprint, sh):
+        """Returns the cached entry for an exact or near-duplicate post, or None. Updates the hit counters."""
+        entry = self.entries.get(fingerprint) if fingerprint else None
+        if entry is None and fingerprint and self.max_distance > 0:
+            candidates = set()
+            for band, key in zip(self.bands, self._band_keys(sh)):
+                candidates |= band.get(key, set())
+            best = min(candidates, key=lambda fp: hamming_distance(sh, self.entries[fp]["simhash"]), default=None)
+            if best and hamming_distance(sh, self.entries[best]["simhash"]) <= self.max_distance:
+                entry = self.entries[best]
+                self.near_hits += 1
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_cost += entry["cost"] or self.average_cost()
+        return entry
+
+    def average_cost(self):
+        return self._cost_sum / self._cost_count if self._cost_count else 0.0
+
+    def report(self):
+        total = self.hits + self.misses
+        if total:
+            print(f"  ♻️ Score cache: {self.hits}/{total} hits ({self.hits / total:.0%}, {self.near_hits} near-duplicate), "
+                  f"~${self.saved_cost:.5f} saved. {len(self.entries)} entries cached.")
+
+
+def build_score_cache(rows, cfg):
+    """
+    Builds the cache from scored posts.csv rows (their score, cost and scored_at, falling back to scraped_at).
+    Rows outside the TTL are skipped before any hashing; fingerprints computed for older rows are saved back
+    to posts.csv so each row is hashed only once.
+    """
+    cache = ScoreCache(cfg.get("score_cache_ttl_hours", 168), cfg.get("score_cache_max_distance", 3),
+                       cfg.get("score_cache_max_entries", 50000))
+    if cache.ttl <= timedelta(0):
+        return cache
+    now = datetime.now(timezone.utc)
+    backfill = {}
+    for row in rows:
+        try:
+            score = int(row.get("score"))
+        except (TypeError, ValueError):
+            continue  # Unscored, or a non-numeric marker
+        scored_at = _parse_time(row.get("scored_at")) or _parse_time(row.get("scraped_at"))
+        if scored_at is None or now - scored_at > cache.ttl:
+            continue
+        try:
+            cost = float(row.get("quantification_cost") or 0.0)
+        except ValueError:
+            cost = 0.0
+        sh = row_simhash(row)
+        if not row.get("content_fingerprint") or row.get("simhash") != f"{sh:016x}":
+            row["content_fingerprint"] = row.get("content_fingerprint") or content_fingerprint(row.get("content", ""))
+            row["simhash"] = f"{sh:016x}"
+            backfill[(row["post_id"], row["handle"])] = {"content_fingerprint": row["content_fingerprint"], "simhash": row["simhash"]}
+        cache.add(row["content_fingerprint"], sh, score, cost, scored_at)
+    if backfill:
+        update_post_scores(backfill)
+    cache.evict(now)
+    return cache
@@ -1,20 +1,30 @@
 import asyncio
 import random
-import json
-import os
 import time
 import sys
-import tempfile
-import shutil
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from urllib.parse import urljoin
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright
-from db import (add_post, get_existing_post_ids, get_existing_post_keys, get_all_posts,
+from db import (add_posts_batch, get_existing_post_ids, get_existing_post_keys, get_all_posts,
                update_handle_check, log_scraper_performance, init_db)
+from scheduler import get_due_handles, parse_posted_at
+from x_graphql import is_timeline_response, parse_timeline_payload
+from config import get_config, get_state, set_state, flush_state
+from browser_pool import lease_page, run as run_with_browsers
+from clearance import is_challenge_title, wait_for_clearance, prewarm_mirrors
+from readiness import wait_for_any, wait_for_dom_quiet, report_readiness
+from x_session import ensure_session, invalidate_session, is_login_url, get_credentials, new_cycle
 
 # Load environment variables
 load_dotenv()
 
+# Whichever of these shows up first tells us the X.com profile page has rendered enough to inspect
+X_PAGE_READY = {
+    "timeline": 'article[data-testid="tweet"]',
+    "logged_in": '[data-testid="SideNav_AccountSwitcher_Button"]',
+    "login": 'input[autocomplete="username"]',
+}
+
 NITTER_MIRRORS_DEFAULT = [
     "https://nitter.poast.org",
     "https://xcancel.com",
@@ -22,67 +32,80 @@ NITTER_MIRRORS_DEFAULT = [
     "https://nitter.privacydev.net",
 ]
 
-def atomic_write_json(file_path, data):
-    """Writes JSON data atomically to a file using a temporary file."""
-    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path))
-    try:
-        with os.fdopen(temp_fd, 'w') as f:
-            json.dump(data, f, indent=4)
-        shutil.move(temp_path, file_path)
-    except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        raise e
-
 def update_config_source(source):
-    try:
-        if not source: return
-        with open("config_user/config.json", "r") as f:
-            cfg = json.load(f)
-        cfg["last_successful_source"] = source
-        atomic_write_json("config_user/config.json", cfg)
-    except Exception as e:
-        print(f"Error updating config source: {e}")
+    # Kept in memory and flushed once per cycle instead of rewriting config.json per tweet
+    if source:
+        set_state("last_successful_source", source)
 
 def demote_nitter_mirror(mirror):
-    try:
-        if not mirror: return
-        with open("config_user/config.json", "r") as f:
-            cfg = json.load(f)
-        
-        mirrors = cfg.get("nitter_mirrors", NITTER_MIRRORS_DEFAULT)
-        if mirror in mirrors:
-            mirrors.remove(mirror)
-            mirrors.append(mirror) # Move to end
-            cfg["nitter_mirrors"] = mirrors
-            atomic_write_json("config_user/config.json", cfg)
-            print(f"  📉 Demoted Nitter mirror: {mirror} (moved to end of list)")
-    except Exception as e:
-        print(f"Error demoting mirror {mirror}: {e}")
-
-async def scrape_x_dot_com(handle, context, headless=True, timeout=60000):
-    user = os.getenv("TWITTER_USERNAME")
-    pwd = os.getenv("TWITTER_PASSWORD")
-    
-    if user: user = user.strip('"').strip("'")
-    if pwd: pwd = pwd.strip('"').strip("'")
-    
-    if not user or user == "YOUR_USERNAME":
+    if not mirror: return
+    demoted = [m for m in get_state("demoted_nitter_mirrors", []) if m != mirror]
+    demoted.append(mirror) # Move to end
+    set_state("demoted_nitter_mirrors", demoted)
+    print(f"  📉 Demoted Nitter mirror: {mirror} (moved to end of list)")
+
+async def scrape_x_dot_com(handle, page, headless=True, timeout=60000, backfill=False):
+    user, _ = get_credentials()
+    if not user:
         print("X.com: No credentials in .env. Skipping.")
         return False, False, 0, 0, 0, 0
 
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
+    # Login state is checked once per cycle for the whole context, not per handle
+    session = await ensure_session(page)
+    if session != "ok":
+        return False, session == "blocked", 0, 0, 0, 0
+
+    cfg = get_config()
     
     base_url = cfg.get("x_dot_com_base_url", "https://x.com").rstrip("/")
     with_replies = cfg.get("scrape_with_replies", False)
     suffix = "/with_replies" if with_replies else ""
     url = f"{base_url}/{handle}{suffix}"
     
-    page = context.pages[0] if context.pages else await context.new_page()
-    
+    # The profile page fetches its timeline as GraphQL JSON; capture it instead of walking the DOM
+    use_graphql = cfg.get("x_graphql_capture", True)
+    captured = []
+    timeline_seen = asyncio.Event()
+    unauthorized = []
+
+    def on_response(response):
+        if is_timeline_response(response.url):
+            captured.append(response)
+            timeline_seen.set()
+        if response.status == 401 and "/i/api/" in response.url:
+            unauthorized.append(response.url)
+
+    page.on("response", on_response)
+
     try:
-        await page.goto(url, wait_until="networkidle", timeout=timeout)
+        if use_graphql:
+            await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+            # Landing on the login flow means no timeline JSON is coming
+            result = None if is_login_url(page.url) else await scrape_x_graphql(handle, page, cfg, captured, timeline_seen, backfill)
+            if result:
+                return result
+            if not is_login_url(page.url):
+                print(f"  ↩️ No timeline JSON captured for {handle}. Falling back to DOM parsing...")
+            captured.clear()
+            timeline_seen.clear()
+        else:
+            await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+        # networkidle rarely settles on X.com; wait for the page content we actually inspect
+        state, _ = await wait_for_any(page, X_PAGE_READY, timeout)
+
+        # A redirect to the login flow or a 401 means the cached session is gone: log in once for the whole cycle
+        login_lost = state == "login" or is_login_url(page.url) or unauthorized
+        if login_lost:
+            invalidate_session(page.context, "401 from X.com API" if unauthorized else f"redirected to login while loading @{handle}")
+            session = await ensure_session(page)
+            if session != "ok":
+                return False, session == "blocked", 0, 0, 0, 0
+            unauthorized.clear()
+            await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+            if use_graphql:
+                result = await scrape_x_graphql(handle, page, cfg, captured, timeline_seen, backfill)
+                if result:
+                    return result
         
         # ATTEMPT TO CLOSE MODALS
         try:
@@ -91,56 +114,6 @@ async def scrape_x_dot_com(handle, context, headless=True, timeout=60000):
                 await close_btn.click()
         except: pass
 
-        # LOGIN DETECTION
-        is_logged_in = await page.query_selector('[data-testid="SideNav_AccountSwitcher_Button"]')
-        login_needed = "/login" in page.url or \
-                       await page.query_selector('input[autocomplete="username"]') or \
-                       not is_logged_in
-
-        if login_needed:
-            print(f"  🔑 Login required for {handle}...")
-            if "/login" not in page.url:
-                await page.goto("https://x.com/i/flow/login", wait_until="networkidle")
-            
-            # Step 1: Username
-            user_input = await page.wait_for_selector('input[autocomplete="username"]', timeout=30000)
-            await user_input.click()
-            await page.keyboard.type(user, delay=random.randint(50, 150))
-            
-            next_btn = await page.query_selector('button:has-text("Next")')
-            if next_btn: await next_btn.click()
-            else: await page.keyboard.press("Enter")
-            
-            await page.wait_for_timeout(random.randint(3000, 5000))
-            
-            # Check for "Try again later"
-            page_text = await page.content()
-            if any(k in page_text for k in ["Could not log you in now", "Please try again later", "suspicious activity"]):
-                 print("  ⚠️ X.com: Blocked by security detection.")
-                 return False, True, 0, 0, 0, 0
-
-            # Step 2: Password
-            try:
-                pwd_input = await page.wait_for_selector('input[autocomplete="current-password"]', timeout=15000)
-                await pwd_input.click()
-                await page.keyboard.type(pwd, delay=random.randint(50, 150))
-                
-                login_btn = await page.query_selector('button[data-testid="LoginForm_Login_Button"]')
-                if login_btn: await login_btn.click()
-                else: await page.keyboard.press("Enter")
-            except:
-                print(f"  ❌ Password field didn't appear for {handle}.")
-                return False, False, 0, 0, 0, 0
-            
-            await page.wait_for_timeout(5000)
-            
-            # Double check for Verifying challenge
-            if "Verifying" in await page.title():
-                print(f"  ⏳ Negotiating X.com Verifying challenge for {handle}...")
-                await page.wait_for_timeout(10000)
-            
-            await page.goto(url, wait_until="networkidle")
-
         # SCRAPE TWEETS
         # Use keys for isolation
         existing_keys = get_existing_post_keys()
@@ -152,134 +125,272 @@ async def scrape_x_dot_com(handle, context, headless=True, timeout=60000):
             return True, False, 0, 0, 0, 0
         
         await page.mouse.wheel(0, 500)
-        await page.wait_for_timeout(3000)
-
-        tweets = await page.query_selector_all('article[data-testid="tweet"]')
-        scraped_count = 0
-        new_count = 0
-        new_replies = 0
-        new_reposts = 0
-        for tweet in tweets:
-            if await tweet.query_selector('path[d*="M19.498 3h-15c-1.381 0-2.5 1.119-2.5 2.5v13"]'): continue
-
-            pinned_label = await tweet.query_selector('div[data-testid="socialContext"]')
-            is_pinned = False
-            if pinned_label:
-                label_text = await pinned_label.inner_text()
-                if "Pinned" in label_text: is_pinned = True
-            if is_pinned and cfg.get("ignore_pinned", False): continue
-
-            time_link = await tweet.query_selector('time')
-            post_id = None
-            posted_at = None
-            if time_link:
-                posted_at = await time_link.get_attribute("datetime")
-                parent_a = await time_link.evaluate_handle('el => el.closest("a")')
-                href = await parent_a.get_attribute("href")
-                if href and "/status/" in href:
-                    post_id = href.split("/")[-1].split("?")[0]
-            
-            if not post_id: continue
-
-            if not is_pinned and (str(post_id), handle.lower()) in existing_keys:
-                print(f"  🛑 Reached already scraped post {post_id} for @{handle}. Stopping.")
-                return True, False, scraped_count, new_count, new_replies, new_reposts
-
-            content_el = await tweet.query_selector('div[data-testid="tweetText"]')
-            if not content_el: continue
-            content = await content_el.inner_text()
-            
-            has_image = bool(await tweet.query_selector('div[data-testid="tweetPhoto"]'))
-            has_video = bool(await tweet.query_selector('div[data-testid="videoPlayer"]'))
-            media_url = ""
-            
-            if has_image:
-                img_el = await tweet.query_selector('div[data-testid="tweetPhoto"] img')
-                if img_el:
-                    media_url = await img_el.get_attribute("src")
-            elif has_video:
-                video_el = await tweet.query_selector('div[data-testid="videoPlayer"] video')
-                if video_el:
-                    media_url = await video_el.get_attribute("src")
-            
-            link_url = ""
-            has_link = False
-            ext_links = await content_el.query_selector_all("a")
-            for el in ext_links:
-                href = await el.get_attribute("href")
-                if href and not href.startswith("/") and ("t.co" in href or "http" in href):
-                    link_url = href
-                    has_link = True
-                    inner_txt = await el.inner_text()
-                    content = content.replace(inner_txt, "").strip()
-                    break
-
-            is_retweet = False
-            retweet_source = ""
-            social_c = await tweet.query_selector('div[data-testid="socialContext"]')
-            if social_c:
-                t = await social_c.inner_text()
-                if "retweeted" in t.lower():
-                    is_retweet = True
-                    retweet_source = t.lower().replace("retweeted", "").strip()
-                    # Capitalize first letter of handle if possible or just leave as is
-                    if retweet_source.startswith("@"):
-                        retweet_source = "@" + retweet_source[1:].capitalize()
-                    else:
-                        retweet_source = retweet_source.capitalize()
-            
-            reply_context = await tweet.query_selector('div[data-testid="replyContext"]')
-            is_reply = bool(reply_context)
-            if not is_reply and social_c:
-                t = await social_c.inner_text()
-                if "Replying to" in t: is_reply = True
-
-            if post_id and content:
-                is_new = add_post(post_id, handle, content, score="", is_reply=is_reply, is_pinned=is_pinned,
-                         has_image=has_image, has_video=has_video, has_link=has_link, link_url=link_url, 
-                         media_url=media_url, is_retweet=is_retweet, retweet_source=retweet_source, posted_at=posted_at)
-                if is_new:
-                    status = ""
-                    if is_pinned: status += " [📌 PINNED]"
-                    if is_reply: status += " [↩️ REPLY]"
-                    print(f"  ✅ Post {post_id}: {status} {content[:40]}... (Posted: {posted_at})")
-                    new_count += 1
-                    if is_reply: new_replies += 1
-                    if is_retweet: new_reposts += 1
-                update_config_source("https://x.com")
-                scraped_count += 1
-            
-            if scraped_count >= 10:
-                break
-        
+        await wait_for_dom_quiet(page, quiet_ms=500, timeout=3000, replaces=3000)
+
+        seen_ids = set()
+        if backfill:
+            async def next_page():
+                posts = await collect_x_dom_posts(page, handle, seen_ids)
+                await page.mouse.wheel(0, 3000)
+                await wait_for_dom_quiet(page, quiet_ms=500, timeout=2000, replaces=2000)
+                return posts, bool(posts)
+            return await backfill_timeline(handle, "https://x.com", cfg, existing_keys, next_page)
+
+        posts = await collect_x_dom_posts(page, handle, seen_ids, existing_keys=existing_keys, limit=10)
+        _, scraped_count, new_count, new_replies, new_reposts = ingest_posts(handle, posts, "https://x.com", cfg, existing_keys)
         return True, False, scraped_count, new_count, new_replies, new_reposts
         
     except Exception as e:
         print(f"  ❌ X.com error: {e}")
         return False, False, 0, 0, 0, 0
+    finally:
+        page.remove_listener("response", on_response)
+
+async def extract_x_article(tweet):
+    """Extracts one X.com timeline article into a post dict. Returns None for promoted or empty items."""
+    if await tweet.query_selector('path[d*="M19.498 3h-15c-1.381 0-2.5 1.119-2.5 2.5v13"]'): return None
+
+    social_c = await tweet.query_selector('div[data-testid="socialContext"]')
+    social_text = await social_c.inner_text() if social_c else ""
+    is_pinned = "Pinned" in social_text
+
+    time_link = await tweet.query_selector('time')
+    post_id = None
+    posted_at = None
+    if time_link:
+        posted_at = await time_link.get_attribute("datetime")
+        parent_a = await time_link.evaluate_handle('el => el.closest("a")')
+        href = await parent_a.get_attribute("href")
+        if href and "/status/" in href:
+            post_id = href.split("/")[-1].split("?")[0]
+    
+    if not post_id: return None
 
-async def scrape_nitter(handle, mirror, context, cfg, suffix=""):
-    url = f"{mirror}/{handle}{suffix}"
-    print(f"🛡️ Scraping {handle} via {mirror}...")
+    content_el = await tweet.query_selector('div[data-testid="tweetText"]')
+    if not content_el: return None
+    content = await content_el.inner_text()
+    
+    has_image = bool(await tweet.query_selector('div[data-testid="tweetPhoto"]'))
+    has_video = bool(await tweet.query_selector('div[data-testid="videoPlayer"]'))
+    media_url = ""
+    
+    if has_image:
+        img_el = await tweet.query_selector('div[data-testid="tweetPhoto"] img')
+        if img_el:
+            media_url = await img_el.get_attribute("src")
+    elif has_video:
+        video_el = await tweet.query_selector('div[data-testid="videoPlayer"] video')
+        if video_el:
+            media_url = await video_el.get_attribute("src")
+    
+    link_url = ""
+    has_link = False
+    ext_links = await content_el.query_selector_all("a")
+    for el in ext_links:
+        href = await el.get_attribute("href")
+        if href and not href.startswith("/") and ("t.co" in href or "http" in href):
+            link_url = href
+            has_link = True
+            inner_txt = await el.inner_text()
+            content = content.replace(inner_txt, "").strip()
+            break
+
+    is_retweet = False
+    retweet_source = ""
+    if "retweeted" in social_text.lower():
+        is_retweet = True
+        retweet_source = social_text.lower().replace("retweeted", "").strip()
+        # Capitalize first letter of handle if possible or just leave as is
+        if retweet_source.startswith("@"):
+            retweet_source = "@" + retweet_source[1:].capitalize()
+        else:
+            retweet_source = retweet_source.capitalize()
     
-    scraped_count = 0
+    reply_context = await tweet.query_selector('div[data-testid="replyContext"]')
+    is_reply = bool(reply_context) or "Replying to" in social_text
+
+    return {
+        "post_id": post_id, "content": content, "posted_at": posted_at,
+        "is_reply": is_reply, "is_pinned": is_pinned,
+        "has_image": has_image, "has_video": has_video, "has_link": has_link, "link_url": link_url,
+        "media_url": media_url, "is_retweet": is_retweet, "retweet_source": retweet_source,
+    }
+
+async def collect_x_dom_posts(page, handle, seen_ids, existing_keys=None, limit=None):
+    """
+    Extracts the timeline articles currently rendered on the page, skipping ids in seen_ids.
+    With existing_keys, stops after the first already-scraped (non-pinned) post.
+    """
+    posts = []
+    for tweet in await page.query_selector_all('article[data-testid="tweet"]'):
+        post = await extract_x_article(tweet)
+        if not post or post["post_id"] in seen_ids: continue
+        seen_ids.add(post["post_id"])
+        posts.append(post)
+        if existing_keys is not None and not post["is_pinned"] and (str(post["post_id"]), handle.lower()) in existing_keys:
+            break
+        if limit and len(posts) >= limit:
+            break
+    return posts
+
+async def scrape_x_graphql(handle, page, cfg, captured, timeline_seen, backfill=False):
+    """
+    Waits for the captured UserTweets GraphQL responses and ingests the tweets they contain.
+    In backfill mode, keeps scrolling so the page requests further cursors.
+    Returns the usual scrape result tuple, or None if no usable timeline JSON arrived.
+    """
+    wait_seconds = cfg.get("x_graphql_wait_seconds", 10)
+    consumed = 0
+
+    async def read_new_responses():
+        nonlocal consumed
+        try:
+            await asyncio.wait_for(timeline_seen.wait(), timeout=wait_seconds)
+        except asyncio.TimeoutError:
+            return []
+        timeline_seen.clear()
+        posts = []
+        new_responses = captured[consumed:]
+        consumed = len(captured)
+        for response in new_responses:
+            if response.status != 200:
+                continue
+            try:
+                payload = await response.json()
+            except Exception as e:
+                print(f"  ⚠️ Could not decode timeline JSON for {handle}: {e}")
+                continue
+            parsed, _ = parse_timeline_payload(payload)
+            posts.extend(parsed)
+        return posts
+
+    posts = await read_new_responses()
+    if not posts:
+        return None
+    print(f"  ⚡ Captured {len(posts)} tweets for @{handle} from timeline JSON.")
+
+    existing_keys = get_existing_post_keys()
+    if backfill:
+        first_page = posts
+
+        async def next_page():
+            nonlocal first_page
+            if first_page is not None:
+                page_posts, first_page = first_page, None
+                return page_posts, True
+            # Scrolling to the bottom makes the page request the next cursor
+            await page.mouse.wheel(0, 5000)
+            page_posts = await read_new_responses()
+            return page_posts, bool(page_posts)
+        return await backfill_timeline(handle, "https://x.com", cfg, existing_keys, next_page)
+
+    _, scraped_count, new_count, new_replies, new_reposts = ingest_posts(handle, posts, "https://x.com", cfg, existing_keys)
+    return True, False, scraped_count, new_count, new_replies, new_reposts
+
+def ingest_posts(handle, posts, source, cfg, existing_keys=None, oldest_allowed=None):
+    """
+    Stores already-parsed posts (dicts with add_post fields) in timeline order with a single
+    write, stopping at the first non-pinned post that is already in posts.csv or older than
+    oldest_allowed. Returns (stopped, scraped_count, new_count, new_replies, new_reposts).
+    """
+    if existing_keys is None:
+        existing_keys = get_existing_post_keys()
+    stopped = False
+    batch = []
+
+    for post in posts:
+        post_id = post["post_id"]
+        is_pinned = post.get("is_pinned", False)
+        if is_pinned and cfg.get("ignore_pinned", False): continue
+
+        # with_replies timelines include the parent tweets of conversations by other accounts
+        author = post.get("author")
+        if author and author.lower() != handle.lower() and not post.get("is_retweet"): continue
+
+        if not is_pinned and (str(post_id), handle.lower()) in existing_keys:
+            print(f"  🛑 Reached already scraped post {post_id} for @{handle}. Stopping.")
+            stopped = True
+            break
+
+        if not is_pinned and oldest_allowed:
+            posted_at = parse_posted_at(post.get("posted_at"))
+            if posted_at and posted_at < oldest_allowed:
+                print(f"  🛑 Reached backfill age limit at post {post_id} for @{handle}. Stopping.")
+                stopped = True
+                break
+
+        if post.get("content"):
+            batch.append(post)
+
+    added = add_posts_batch(handle, batch)
     new_count = 0
     new_replies = 0
     new_reposts = 0
+    for post in added:
+        status = ""
+        if post["is_pinned"]: status += " [📌 PINNED]"
+        if post["is_reply"]: status += " [↩️ REPLY]"
+        if post["is_retweet"]: status += f" [🔄 RT from {post['retweet_source']}]"
+        print(f"  ✅ Post {post['post_id']}: {status} {post['content'][:40]}... (Posted: {post['posted_at']})")
+        new_count += 1
+        if post["is_reply"]: new_replies += 1
+        if post["is_retweet"]: new_reposts += 1
+        existing_keys.add((str(post["post_id"]), handle.lower()))
+
+    if batch:
+        update_config_source(source)
+    return stopped, len(batch), new_count, new_replies, new_reposts
+
+async def backfill_timeline(handle, source, cfg, existing_keys, next_page):
+    """
+    Deep backfill: calls next_page() -> (posts, has_more) until the handle's watermark
+    (newest already-stored post), backfill_max_age_hours or backfill_max_pages is reached,
+    ingesting every backfill_batch_size posts.
+    """
+    max_pages = cfg.get("backfill_max_pages", 10)
+    batch_size = cfg.get("backfill_batch_size", 50)
+    oldest_allowed = datetime.now(timezone.utc) - timedelta(hours=cfg.get("backfill_max_age_hours", 72))
+    print(f"  📚 Backfilling @{handle} (up to {max_pages} pages, {cfg.get('backfill_max_age_hours', 72)}h)...")
+
+    totals = [0, 0, 0, 0]
+    batch = []
+    pages = 0
+    done = False
+    while not done:
+        posts, has_more = await next_page()
+        pages += 1
+        batch.extend(posts)
+
+        # Stop paging as soon as this page reaches the watermark or the age limit
+        for post in posts:
+            if post.get("is_pinned"): continue
+            posted_at = parse_posted_at(post.get("posted_at"))
+            if (str(post["post_id"]), handle.lower()) in existing_keys or (posted_at and posted_at < oldest_allowed):
+                done = True
+                break
+        if not has_more or pages >= max_pages:
+            done = True
+
+        if batch and (done or len(batch) >= batch_size):
+            stopped, *counts = ingest_posts(handle, batch, source, cfg, existing_keys, oldest_allowed)
+            totals = [t + c for t, c in zip(totals, counts)]
+            batch = []
+            done = done or stopped
+
+    print(f"  📚 Backfill for @{handle}: {pages} page(s), {totals[1]} new posts.")
+    return True, False, *totals
+
+async def scrape_nitter(handle, mirror, page, cfg, suffix="", backfill=False):
+    url = f"{mirror}/{handle}{suffix}"
+    print(f"🛡️ Scraping {handle} via {mirror}...")
+    
     try:
-        page = context.pages[0] if context.pages else await context.new_page()
         await page.goto(url, wait_until="domcontentloaded", timeout=cfg.get("browser_timeout_seconds", 30)*1000)
         
-        # Anti-bot
-        title = await page.title()
-        if "Verifying" in title or "Cloudflare" in title:
-            print(f"  ⏳ Negotiating anti-bot on {mirror}...")
-            await page.wait_for_timeout(5000)
-            try: await page.wait_for_selector(".timeline-item", timeout=15000)
-            except:
-                await page.reload(wait_until="domcontentloaded")
-                await page.wait_for_timeout(3000)
-                if not await page.query_selector(".timeline-item"): return False, False, 0, 0, 0, 0
+        # Anti-bot: normally solved once per mirror by prewarm_mirrors(); the clearance cookie
+        # in the shared context lets later handles straight through
+        if is_challenge_title(await page.title()):
+            if not await wait_for_clearance(page, mirror, cfg): return False, False, 0, 0, 0, 0
 
         try: await page.wait_for_selector(".timeline-item", timeout=10000)
         except:
@@ -290,100 +401,30 @@ async def scrape_nitter(handle, mirror, context, cfg, suffix=""):
             return False, False, 0, 0, 0, 0
 
         existing_keys = get_existing_post_keys()
-        tweets = await page.query_selector_all(".timeline-item")
-        for tweet in tweets:
-            if await tweet.query_selector(".unavailable"): continue
-            
-            link_el = await tweet.query_selector(".tweet-link")
-            if not link_el: continue
-            href = await link_el.get_attribute("href")
-            post_id = href.split("/")[-1].split("#")[0]
-            
-            is_pinned = bool(await tweet.query_selector(".pinned"))
-            if not is_pinned and (str(post_id), handle.lower()) in existing_keys:
-                print(f"  🛑 Reached already scraped post {post_id} for @{handle}. Stopping.")
-                return True, False, scraped_count, new_count, new_replies, new_reposts
-
-            content_el = await tweet.query_selector(".tweet-content")
-            if not content_el: continue
-            content = await content_el.inner_text()
-            
-            posted_at = None
-            date_el = await tweet.query_selector(".tweet-date a")
-            if date_el:
-                posted_at = await date_el.get_attribute("title")
-            
-            if not posted_at:
-                time_el = await tweet.query_selector("time")
-                if time_el:
-                    posted_at = await time_el.get_attribute("datetime") or await time_el.get_attribute("title")
-
-            if is_pinned and cfg.get("ignore_pinned", False): continue
-
-            is_reply = bool(await tweet.query_selector(".replying-to"))
-            
-            retweet_indicator = await tweet.query_selector(".retweet-header")
-            is_retweet = bool(retweet_indicator)
-            retweet_source = ""
-            if is_retweet:
-                retweet_source_el = await retweet_indicator.query_selector("a")
-                if retweet_source_el:
-                    retweet_source = (await retweet_source_el.inner_text()).strip()
-                else:
-                    text = await retweet_indicator.inner_text()
-                    # Case-insensitive removal of 'retweeted'
-                    for word in ["Retweeted", "retweeted"]:
-                        text = text.replace(word, "")
-                    retweet_source = text.strip()
-
-            has_image = bool(await tweet.query_selector(".attachment.image"))
-            has_video = bool(await tweet.query_selector(".attachment.video"))
-            media_url = ""
-            
-            if has_image:
-                img_el = await tweet.query_selector(".attachment.image img")
-                if img_el:
-                    media_url = await img_el.get_attribute("src")
-                    if media_url and media_url.startswith("/"):
-                        media_url = mirror.rstrip("/") + media_url
-            elif has_video:
-                video_source = await tweet.query_selector(".attachment.video video source")
-                if not video_source:
-                    video_source = await tweet.query_selector(".attachment.video video")
-                if video_source:
-                    media_url = await video_source.get_attribute("src")
-                    if media_url and media_url.startswith("/"):
-                        media_url = mirror.rstrip("/") + media_url
-            
-            link_url = ""
-            has_link = False
-            ext_links = await content_el.query_selector_all("a")
-            for el in ext_links:
-                l_href = await el.get_attribute("href")
-                if l_href and not l_href.startswith("/"):
-                    link_url = l_href
-                    has_link = True
-                    break
-
-            if post_id and content:
-                is_new = add_post(post_id, handle, content, score="", is_reply=is_reply, is_pinned=is_pinned,
-                         has_image=has_image, has_video=has_video, has_link=has_link, link_url=link_url, 
-                         media_url=media_url, is_retweet=is_retweet, retweet_source=retweet_source, posted_at=posted_at)
-                if is_new:
-                    status = ""
-                    if is_pinned: status += " [📌 PINNED]"
-                    if is_reply: status += " [↩️ REPLY]"
-                    if is_retweet: status += f" [🔄 RT from {retweet_source}]"
-                    print(f"  ✅ Post {post_id}: {status} {content[:40]}... (Posted: {posted_at})")
-                    new_count += 1
-                    if is_reply: new_replies += 1
-                    if is_retweet: new_reposts += 1
-                update_config_source(mirror)
-                scraped_count += 1
-            
-            if scraped_count >= 10:
-                break
-        
+        if backfill:
+            first_page = True
+
+            async def next_page():
+                nonlocal first_page
+                if not first_page:
+                    # Follow Nitter's "Load more" cursor link to the next page
+                    href = None
+                    for more_link in await page.query_selector_all(".show-more a"):
+                        link_href = await more_link.get_attribute("href")
+                        if link_href and "cursor=" in link_href:
+                            href = link_href
+                    if not href:
+                        return [], False
+                    await page.goto(urljoin(page.url, href), wait_until="domcontentloaded", timeout=cfg.get("browser_timeout_seconds", 30)*1000)
+                    try: await page.wait_for_selector(".timeline-item", timeout=10000)
+                    except: return [], False
+                first_page = False
+                posts = await collect_nitter_posts(page, handle, mirror)
+                return posts, bool(posts)
+            return await backfill_timeline(handle, mirror, cfg, existing_keys, next_page)
+
+        posts = await collect_nitter_posts(page, handle, mirror, existing_keys=existing_keys, limit=10)
+        _, scraped_count, new_count, new_replies, new_reposts = ingest_posts(handle, posts, mirror, cfg, existing_keys)
         return True, False, scraped_count, new_count, new_replies, new_reposts
     except Exception as e:
         err_msg = str(e)
@@ -397,9 +438,98 @@ async def scrape_nitter(handle, mirror, context, cfg, suffix=""):
              
         return False, False, 0, 0, 0, 0
 
-async def scrape_handle(handle, context, mirror=None, skip_x=False):
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
+async def extract_nitter_item(tweet, mirror):
+    """Extracts one Nitter .timeline-item into a post dict. Returns None for unavailable or empty items."""
+    if await tweet.query_selector(".unavailable"): return None
+    
+    link_el = await tweet.query_selector(".tweet-link")
+    if not link_el: return None
+    href = await link_el.get_attribute("href")
+    post_id = href.split("/")[-1].split("#")[0]
+    
+    is_pinned = bool(await tweet.query_selector(".pinned"))
+
+    content_el = await tweet.query_selector(".tweet-content")
+    if not content_el: return None
+    content = await content_el.inner_text()
+    
+    posted_at = None
+    date_el = await tweet.query_selector(".tweet-date a")
+    if date_el:
+        posted_at = await date_el.get_attribute("title")
+    
+    if not posted_at:
+        time_el = await tweet.query_selector("time")
+        if time_el:
+            posted_at = await time_el.get_attribute("datetime") or await time_el.get_attribute("title")
+
+    is_reply = bool(await tweet.query_selector(".replying-to"))
+    
+    retweet_indicator = await tweet.query_selector(".retweet-header")
+    is_retweet = bool(retweet_indicator)
+    retweet_source = ""
+    if is_retweet:
+        retweet_source_el = await retweet_indicator.query_selector("a")
+        if retweet_source_el:
+            retweet_source = (await retweet_source_el.inner_text()).strip()
+        else:
+            text = await retweet_indicator.inner_text()
+            # Case-insensitive removal of 'retweeted'
+            for word in ["Retweeted", "retweeted"]:
+                text = text.replace(word, "")
+            retweet_source = text.strip()
+
+    has_image = bool(await tweet.query_selector(".attachment.image"))
+    has_video = bool(await tweet.query_selector(".attachment.video"))
+    media_url = ""
+    
+    if has_image:
+        img_el = await tweet.query_selector(".attachment.image img")
+        if img_el:
+            media_url = await img_el.get_attribute("src")
+            if media_url and media_url.startswith("/"):
+                media_url = mirror.rstrip("/") + media_url
+    elif has_video:
+        video_source = await tweet.query_selector(".attachment.video video source")
+        if not video_source:
+            video_source = await tweet.query_selector(".attachment.video video")
+        if video_source:
+            media_url = await video_source.get_attribute("src")
+            if media_url and media_url.startswith("/"):
+                media_url = mirror.rstrip("/") + media_url
+    
+    link_url = ""
+    has_link = False
+    ext_links = await content_el.query_selector_all("a")
+    for el in ext_links:
+        l_href = await el.get_attribute("href")
+        if l_href and not l_href.startswith("/"):
+            link_url = l_href
+            has_link = True
+            break
+
+    return {
+        "post_id": post_id, "content": content, "posted_at": posted_at,
+        "is_reply": is_reply, "is_pinned": is_pinned,
+        "has_image": has_image, "has_video": has_video, "has_link": has_link, "link_url": link_url,
+        "media_url": media_url, "is_retweet": is_retweet, "retweet_source": retweet_source,
+    }
+
+async def collect_nitter_posts(page, handle, mirror, existing_keys=None, limit=None):
+    """Extracts the Nitter timeline items on the current page (same stopping rules as collect_x_dom_posts)."""
+    posts = []
+    for tweet in await page.query_selector_all(".timeline-item"):
+        post = await extract_nitter_item(tweet, mirror)
+        if not post: continue
+        posts.append(post)
+        if existing_keys is not None and not post["is_pinned"] and (str(post["post_id"]), handle.lower()) in existing_keys:
+            break
+        if limit and len(posts) >= limit:
+            break
+    return posts
+
+async def scrape_handle(handle, page, mirror=None, skip_x=False, backfill=False):
+    cfg = get_config()
     
     last_source = cfg.get("last_successful_source", "https://x.com")
     use_x = cfg.get("use_x_dot_com", True)
@@ -415,7 +545,7 @@ async def scrape_handle(handle, context, mirror=None, skip_x=False):
     if source_to_try == "https://x.com" and not skip_x and use_x:
         start_t = time.time()
         print(f"🐦 Attempting X.com (prioritized) for {handle}...")
-        success, blocked, count, new_count, new_reps, new_rts = await scrape_x_dot_com(handle, context=context)
+        success, blocked, count, new_count, new_reps, new_rts = await scrape_x_dot_com(handle, page, backfill=backfill)
         latency = time.time() - start_t
         log_scraper_performance("x.com", handle, success, latency, count, new_count)
         
@@ -426,7 +556,7 @@ async def scrape_handle(handle, context, mirror=None, skip_x=False):
     elif source_to_try.startswith("http") and source_to_try != "https://x.com":
         start_t = time.time()
         print(f"🛡️ Attempting Nitter mirror {source_to_try} (prioritized) for {handle}...")
-        success, _, count, new_count, new_reps, new_rts = await scrape_nitter(handle, source_to_try, context, cfg, nitter_suffix)
+        success, _, count, new_count, new_reps, new_rts = await scrape_nitter(handle, source_to_try, page, cfg, nitter_suffix, backfill=backfill)
         latency = time.time() - start_t
         log_scraper_performance(source_to_try, handle, success, latency, count, new_count)
         
@@ -441,7 +571,7 @@ async def scrape_handle(handle, context, mirror=None, skip_x=False):
     if not skip_x and use_x and source_to_try != "https://x.com":
         start_t = time.time()
         print(f"🐦 Falling back to X.com for {handle}...")
-        success, blocked, count, new_count, new_reps, new_rts = await scrape_x_dot_com(handle, context=context)
+        success, blocked, count, new_count, new_reps, new_rts = await scrape_x_dot_com(handle, page, backfill=backfill)
         latency = time.time() - start_t
         log_scraper_performance("x.com", handle, success, latency, count, new_count)
         
@@ -456,7 +586,7 @@ async def scrape_handle(handle, context, mirror=None, skip_x=False):
 
     for m in other_mirrors:
         start_t = time.time()
-        success, _, count, new_count, new_reps, new_rts = await scrape_nitter(handle, m, context, cfg, nitter_suffix)
+        success, _, count, new_count, new_reps, new_rts = await scrape_nitter(handle, m, page, cfg, nitter_suffix, backfill=backfill)
         latency = time.time() - start_t
         log_scraper_performance(m, handle, success, latency, count, new_count)
         
@@ -468,37 +598,48 @@ async def scrape_handle(handle, context, mirror=None, skip_x=False):
             
     return False, blocked, 0, 0, 0, 0
 
-async def run_scraper():
-    with open("config_user/config.json") as f:
-        cfg = json.load(f)
+async def run_scraper(backfill=False, handles=None, profile=None):
+    """
+    Scrapes the due handles (or every handle when backfilling). With scrape_workers > 1 the handles
+    are split across worker processes (see shards.py). 'handles' and 'profile' are set by those workers.
+    """
+    cfg = get_config()
     
-    handles = cfg.get("handles", [])
-    print(f"🚀 Starting Hybrid Scraper for {len(handles)} handles...")
+    is_worker = handles is not None
+    if not is_worker:
+        all_handles = cfg.get("handles", [])
+        # A backfill visits every handle regardless of its polling schedule
+        handles = list(all_handles) if backfill else get_due_handles(all_handles, cfg)
+        if len(handles) < len(all_handles):
+            print(f"🗓️ Adaptive polling: {len(handles)} of {len(all_handles)} handles are due this cycle.")
+    if not handles:
+        print("  ℹ️ No handles due yet. Skipping scraper cycle.")
+        return
+
+    # Shard count follows the config, not the number of due handles, so each handle keeps its shard
+    workers = cfg.get("scrape_workers", 1)
+    if not is_worker and workers > 1:
+        from shards import run_sharded_scraper
+        await asyncio.to_thread(run_sharded_scraper, handles, workers, backfill)
+        return
+    print(f"🚀 Starting Hybrid Scraper for {len(handles)} handles{' (deep backfill)' if backfill else ''}...")
     
-    async with async_playwright() as p:
-        user_data_dir = cfg.get("browser_user_data_dir", "data/browser_session")
-        if not os.path.isabs(user_data_dir):
-            user_data_dir = os.path.join(os.getcwd(), user_data_dir)
-        
-        headless = cfg.get("headless_browser", True)
-        
-        # We use a persistent context for X.com sessions
-        context = await p.firefox.launch_persistent_context(
-            user_data_dir,
-            headless=headless,
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0",
-            viewport={"width": 1280, "height": 720},
-            ignore_https_errors=True
-        )
-        
-        try:
-            total_posts = 0
-            total_replies = 0
-            total_reposts = 0
-            skip_x_remaining = False
-            for handle in handles:
-                print(f"\n🔍 Processing @{handle}...")
-                success, blocked, _, new_c, new_rep, new_rt = await scrape_handle(handle, context, skip_x=skip_x_remaining)
+    new_cycle()
+    try:
+        # Solve Nitter anti-bot checks up front, in parallel, when Nitter is the primary source
+        if cfg.get("clearance_prewarm", True) and (not cfg.get("use_x_dot_com", True) or cfg.get("last_successful_source", "https://x.com") != "https://x.com"):
+            await prewarm_mirrors(cfg.get("nitter_mirrors", NITTER_MIRRORS_DEFAULT), profile)
+
+        total_posts = 0
+        total_replies = 0
+        total_reposts = 0
+        skip_x_remaining = False
+        for handle in handles:
+            print(f"\n🔍 Processing @{handle}...")
+            # Pages come from the warm Firefox context (X.com session); leasing per handle
+            # means a crashed browser is relaunched for the next handle instead of failing the rest
+            async with lease_page("firefox", profile) as page:
+                success, blocked, _, new_c, new_rep, new_rt = await scrape_handle(handle, page, skip_x=skip_x_remaining, backfill=backfill)
                 if success:
                     total_posts += new_c
                     total_replies += new_rep
@@ -508,19 +649,19 @@ async def run_scraper():
                     skip_x_remaining = True
                 if not success:
                     print(f"  🔄 Retrying {handle} once with alternate sources...")
-                    success, blocked, _, new_c, new_rep, new_rt = await scrape_handle(handle, context, skip_x=True)
+                    success, blocked, _, new_c, new_rep, new_rt = await scrape_handle(handle, page, skip_x=True, backfill=backfill)
                     if success:
                         total_posts += new_c
                         total_replies += new_rep
                         total_reposts += new_rt
-            
-            print(f"\n📈 Update: {total_posts} new posts by {len(handles)} users found including {total_replies} replies and {total_reposts} reposts.")
-            print("\n🏁 Scraper process completed.")
-        finally:
-            await context.close()
+        
+        print(f"\n📈 Update: {total_posts} new posts by {len(handles)} users found including {total_replies} replies and {total_reposts} reposts.")
+        report_readiness()
+        print("\n🏁 Scraper process completed.")
+    finally:
+        flush_state()
 
 async def main():
-    from db import init_db
     init_db()
     
     while True:
@@ -532,7 +673,8 @@ async def main():
             try:
                 from generator import run_generator
                 print("\n--- Starting Generator (Creation) ---")
-                run_generator()
+                # run_generator drives its own event loop for concurrent drafting
+                await asyncio.to_thread(run_generator)
                 print("--- Generator Complete ---")
             except ImportError:
                 print("Generator module not found, skipping.")
@@ -545,7 +687,7 @@ async def main():
             except ImportError:
                 print("Poster module not found, skipping.")
             
-            with open("config_user/config.json") as f: cfg = json.load(f)
+            cfg = get_config()
             interval = cfg.get("refresh_seconds", 3600)
             print(f"Waiting {interval} seconds for next cycle...")
             await asyncio.sleep(interval)
@@ -560,9 +702,12 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--scraper-only", action="store_true")
+    parser.add_argument("--backfill", action="store_true", help="Page back through every handle's timeline up to its watermark or the backfill budget.")
     args, unknown = parser.parse_known_args()
     
-    if args.scraper_only:
-        asyncio.run(run_scraper())
+    if args.backfill:
+        run_with_browsers(run_scraper(backfill=True))
+    elif args.scraper_only:
+        run_with_browsers(run_scraper())
     else:
-        asyncio.run(main())
+        run_with_browsers(main())
@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+import shutil
+import signal
+import time
+import zlib
+import config
+import db
+from config import get_config, get_settings
+
+LOCK_FILE = "app.lock"
+
+# Files a browser leaves behind while it holds a profile; copying them would make the clone look in use
+PROFILE_LOCK_FILES = ("lock", ".parentlock", "parent.lock", "SingletonLock", "SingletonCookie", "SingletonSocket")
+
+
+def assign_shards(handles, workers):
+    """Splits handles into 'workers' lists. Assignment is stable per handle so each shard keeps its session history."""
+    shards = [[] for _ in range(workers)]
+    for handle in handles:
+        shards[zlib.crc32(handle.lower().encode()) % workers].append(handle)
+    return shards
+
+
+def clone_profile(index):
+    """Returns the shard's own browser profile dir, cloned from browser_user_data_dir on first use."""
+    base = get_settings().browser_user_data_dir
+    shard_dir = f"{base.rstrip(os.sep)}_shard{index}"
+    if not os.path.exists(shard_dir):
+        if os.path.exists(base):
+            print(f"  📂 Cloning browser profile for shard {index}...")
+            shutil.copytree(base, shard_dir, ignore=shutil.ignore_patterns(*PROFILE_LOCK_FILES), symlinks=True)
+        else:
+            os.makedirs(shard_dir, exist_ok=True)
+    return shard_dir
+
+
+def shard_state_path(index):
+    """Per-shard runtime state (preferred source and mirror order), seeded from the main state file."""
+    path = os.path.join("data", f"runtime_state_shard{index}.json")
+    if not os.path.exists(path) and os.path.exists(config.STATE_PATH):
+        shutil.copyfile(config.STATE_PATH, path)
+    return path
+
+
+# --- Lock file: first line is the app.py PID, the following lines are "<pid> <start time>" of its scraper workers ---
+
+def process_start_time(pid):
+    """Start time of 'pid' in clock ticks since boot (/proc/<pid>/stat field 22), or None if it is not running."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except IOError:
+        return None
+    # The command name (field 2) may contain spaces: count fields after its closing parenthesis
+    fields = stat[stat.rfind(")") + 2:].split()
+    try:
+        return int(fields[19])
+    except (IndexError, ValueError):
+        return None
+
+
+def read_lock_pids(lock_file=LOCK_FILE):
+    """
+    Returns [parent_pid, (worker_pid, start_time), ...] from the lock file (start_time is None for lines
+    written without one). Raises ValueError/IOError if unreadable.
+    """
+    with open(lock_file, "r") as f:
+        lines = [line.split() for line in f if line.strip()]
+    if not lines:
+        raise ValueError("empty lock file")
+    workers = [(int(parts[0]), int(parts[1]) if len(parts) > 1 else None) for parts in lines[1:]]
+    return [int(lines[0][0])] + workers
+
+
+def write_worker_pids(pids, lock_file=LOCK_FILE):
+    """Records worker PIDs and their start times in the lock file if this process owns it."""
+    try:
+        owner = read_lock_pids(lock_file)[0]
+    except (ValueError, IOError):
+        return
+    if owner != os.getpid():
+        return
+    workers = [(pid, process_start_time(pid)) for pid in pids]
+    with open(lock_file, "w") as f:
+        f.write("\n".join([str(owner)] + [f"{pid} {start}" for pid, start in workers if start is not None]))
+
+
+def reap_orphaned_workers(workers):
+    """
+    Terminates scraper workers left running by a previous app.py that died without cleaning up.
+    workers: [(pid, start_time)] from the lock file. A PID is only killed if its start time still matches,
+    so a PID reused after a reboot or by an unrelated process is left alone.
+    """
+    for pid, start_time in workers:
+        if start_time is None or process_start_time(pid) != start_time:
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "r") as f_cmd:
+                cmd = f_cmd.read()
+        except IOError:
+            continue
+        # Spawned workers run 'python -c from multiprocessing.spawn import spawn_main; ...'
+        if "multiprocessing" not in cmd:
+            continue
+        try:
+            os.kill(pid, signal.SIGTERM)
+            print(f"  🧹 Terminated orphaned scraper worker (PID {pid}).")
+        except OSError:
+            pass
+
+
+# --- Workers ---
+
+def _worker_main(index, handles, profile, state_path, queue, backfill):
+    """Entry point of a scraper worker process. All CSV writes go to the parent through 'queue'."""
+    config.STATE_PATH = state_path
+    db.set_write_queue(queue)
+    from scraper import run_scraper, run_with_browsers
+    error = None
+    try:
+        run_with_browsers(run_scraper(backfill=backfill, handles=handles, profile=profile))
+    except Exception as e:
+        error = str(e)
+    queue.put(("done", index, error))
+
+
+def run_sharded_scraper(handles, workers, backfill=False):
+    """
+    Scrapes 'handles' with up to 'workers' processes, each with its own browser profile and mirror preferences.
+    Shards are assigned over every configured handle and keep their index (and so their profile clone and
+    state file) when some of them have no handle due this cycle; those are simply not started.
+    This process is the single writer: it applies the workers' queued writes, restarts a crashed
+    worker once and terminates workers that exceed scrape_worker_timeout_seconds.
+    """
+    cfg = get_config()
+    timeout = cfg.get("scrape_worker_timeout_seconds", 1800)
+    due = set(handles)
+    all_handles = list(dict.fromkeys(list(cfg.get("handles", [])) + list(handles)))
+    shards = {index: [h for h in shard if h in due] for index, shard in enumerate(assign_shards(all_handles, workers))}
+    shards = {index: shard for index, shard in shards.items() if shard}
+    print(f"🧩 Sharded scraper: {len(handles)} handles across {len(shards)} of {workers} workers.")
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    procs = {}
+    restarts = {}
+
+    def start(index):
+        proc = ctx.Process(
+            target=_worker_main,
+            args=(index, shards[index], clone_profile(index), shard_state_path(index), queue, backfill),
+            name=f"scraper-shard-{index}",
+            daemon=True,
+        )
+        proc.start()
+        procs[index] = proc
+        write_worker_pids([p.pid for p in procs.values() if p.is_alive()])
+
+    def handle_messages(messages):
+        for kind, index, error in messages:
+            if kind == "done":
+                pending.discard(index)
+                if error:
+                    print(f"  ❌ Shard {index} failed: {error}")
+
+    pending = set(shards)
+    deadline = time.time() + timeout
+    try:
+        for index in shards:
+            start(index)
+
+        while pending:
+            handle_messages(db.drain_write_queue(queue))
+
+            for index in sorted(pending):
+                if procs[index].is_alive():
+                    continue
+                # A worker that exited cleanly may still have its final messages in flight
+                handle_messages(db.drain_write_queue(queue, timeout=0.5))
+                if index not in pending:
+                    continue
+                if restarts.get(index, 0) < 1:
+                    restarts[index] = restarts.get(index, 0) + 1
+                    print(f"  🔄 Shard {index} exited unexpectedly (code {procs[index].exitcode}). Restarting...")
+                    start(index)
+                else:
+                    print(f"  ❌ Shard {index} crashed again. Giving up on {len(shards[index])} handles this cycle.")
+                    pending.discard(index)
+
+            if pending and time.time() > deadline:
+                for index in pending:
+                    print(f"  ⏱️ Shard {index} exceeded {timeout}s. Terminating.")
+                    procs[index].terminate()
+                break
+    finally:
+        for proc in procs.values():
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.kill()
+        # Apply anything the workers queued before exiting
+        while db.drain_write_queue(queue, timeout=0.1) or not queue.empty():
+            pass
+        write_worker_pids([])
+
+    print("\n🏁 Sharded scraper completed.")
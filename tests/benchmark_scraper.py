@@ -0,0 +1,202 @@
+"""
+Offline scraper benchmark: replays the HTML/JSON fixtures in tests/fixtures through Playwright route
+fulfillment (no traffic leaves the machine) and times scrape_x_dot_com (DOM and GraphQL paths),
+scrape_nitter (plain, Cloudflare challenge, error page) and engagement.scrape_post_replies.
+
+Usage: ./venv/bin/python tests/benchmark_scraper.py [--runs 3] [--only x_dom,nitter] [--headed]
+Exits non-zero if any scenario extracts a different number of tweets than its fixture holds.
+"""
+import sys
+import os
+import argparse
+import tempfile
+import time
+sys.path.append(os.getcwd())
+
+# Login detection only needs credentials to exist; the fixtures always present a logged-in page
+os.environ["TWITTER_USERNAME"] = "benchmark"
+os.environ["TWITTER_PASSWORD"] = "benchmark"
+
+import config
+import db
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+HANDLE = "fixtureuser"
+STATUS_ID = "1900000000000011000"
+X_BASE = "https://x.com"
+NITTER_MIRROR = "https://nitter.fixture.invalid"
+CHALLENGE_MIRROR = "https://challenge.fixture.invalid"
+ERROR_MIRROR = "https://error.fixture.invalid"
+
+
+def isolate_data(tmp_dir):
+    """Points every CSV and the runtime state file at tmp_dir so the benchmark never touches data/."""
+    config.STATE_PATH = os.path.join(tmp_dir, "runtime_state.json")
+    for name in dir(db):
+        if name.endswith("_CSV"):
+            setattr(db, name, os.path.join(tmp_dir, os.path.basename(getattr(db, name))))
+
+
+def reset_data():
+    for name in dir(db):
+        if name.endswith("_CSV") and os.path.exists(getattr(db, name)):
+            os.remove(getattr(db, name))
+    db.init_db()
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+async def route_fixtures(page, x_page="x_timeline.html"):
+    """Serves every request the page makes from tests/fixtures."""
+    async def handler(route):
+        url = route.request.url.split("#")[0]
+        path = url.split("?")[0]
+
+        if "/graphql/" in path and path.endswith("/UserTweets"):
+            return await route.fulfill(status=200, content_type="application/json", body=read_fixture("x_user_tweets.json"))
+        if path.startswith(X_BASE):
+            if "/status/" in path:
+                return await route.fulfill(status=200, content_type="text/html", body=read_fixture("x_status_replies.html"))
+            if path.rstrip("/") == f"{X_BASE}/{HANDLE}":
+                return await route.fulfill(status=200, content_type="text/html", body=read_fixture(x_page))
+        if path.startswith(CHALLENGE_MIRROR) and "cf_clearance=" not in (await route.request.header_value("cookie") or ""):
+            return await route.fulfill(status=403, content_type="text/html", body=read_fixture("cloudflare_challenge.html"))
+        if path.startswith(ERROR_MIRROR):
+            return await route.fulfill(status=200, content_type="text/html", body=read_fixture("nitter_error.html"))
+        if path.startswith((NITTER_MIRROR, CHALLENGE_MIRROR)):
+            if "/status/" in path:
+                return await route.fulfill(status=200, content_type="text/html", body=read_fixture("nitter_status_replies.html"))
+            return await route.fulfill(status=200, content_type="text/html", body=read_fixture("nitter_timeline.html"))
+        # Images, video, favicons...
+        await route.fulfill(status=404, body="")
+
+    await page.route("**/*", handler)
+
+
+# name -> (expected tweet count, coroutine(page) -> tweet count)
+def build_scenarios():
+    import scraper
+    import engagement
+
+    # scrape_x_dot_com reads its settings through get_config(); each scenario sets what it needs here
+    overrides = {}
+    scraper.get_config = lambda: {**config.get_config(), **overrides}
+
+    async def x_login(page):
+        # x_session only needs the auth cookie to consider the context logged in
+        await page.context.add_cookies([{"name": "auth_token", "value": "fixture", "domain": ".x.com", "path": "/"}])
+
+    async def x_dom(page):
+        await x_login(page)
+        await route_fixtures(page, "x_timeline.html")
+        overrides.update(x_graphql_capture=False, scrape_with_replies=False)
+        result = await scraper.scrape_x_dot_com(HANDLE, page)
+        return result[2] if result[0] else 0
+
+    async def x_graphql(page):
+        await x_login(page)
+        await route_fixtures(page, "x_timeline_graphql.html")
+        overrides.update(x_graphql_capture=True, scrape_with_replies=False)
+        result = await scraper.scrape_x_dot_com(HANDLE, page)
+        return result[2] if result[0] else 0
+
+    async def nitter(page):
+        await route_fixtures(page)
+        result = await scraper.scrape_nitter(HANDLE, NITTER_MIRROR, page, config.get_config())
+        return result[2] if result[0] else 0
+
+    async def nitter_challenge(page):
+        await route_fixtures(page)
+        result = await scraper.scrape_nitter(HANDLE, CHALLENGE_MIRROR, page, config.get_config())
+        return result[2] if result[0] else 0
+
+    async def nitter_error(page):
+        await route_fixtures(page)
+        result = await scraper.scrape_nitter(HANDLE, ERROR_MIRROR, page, {**config.get_config(), "browser_timeout_seconds": 10})
+        return result[2] if result[0] else 0
+
+    async def replies_x(page):
+        await route_fixtures(page)
+        replies, _ = await engagement.scrape_post_replies(f"{X_BASE}/{HANDLE}/status/{STATUS_ID}", page)
+        return len(replies)
+
+    async def replies_nitter(page):
+        await route_fixtures(page)
+        replies, _ = await engagement.scrape_post_replies(f"{NITTER_MIRROR}/{HANDLE}/status/{STATUS_ID}", page)
+        return len(replies)
+
+    return {
+        "x_dom": (10, x_dom),
+        "x_graphql": (12, x_graphql),
+        "nitter": (10, nitter),
+        "nitter_challenge": (10, nitter_challenge),
+        "nitter_error": (0, nitter_error),
+        "replies_x": (6, replies_x),
+        "replies_nitter": (6, replies_nitter),
+    }
+
+
+async def run_benchmark(names, runs, profile_dir, headless):
+    from browser_pool import lease_page
+    scenarios = build_scenarios()
+    results = []
+    for name in names:
+        expected, scenario = scenarios[name]
+        timings = []
+        counts = []
+        for _ in range(runs):
+            reset_data()
+            async with lease_page("firefox", profile_dir, headless) as page:
+                # Every run starts cold: no cf_clearance or other cookies from the previous one
+                await page.context.clear_cookies()
+                start = time.perf_counter()
+                counts.append(await scenario(page))
+                timings.append(time.perf_counter() - start)
+        results.append((name, expected, counts, timings))
+    return results
+
+
+def print_report(results):
+    print(f"\n{'Scenario':<18} | {'Tweets':>6} | {'Wall (s)':>8} | {'Best (s)':>8} | {'Tweets/s':>8} | {'ms/tweet':>8}")
+    print("-" * 72)
+    ok = True
+    for name, expected, counts, timings in results:
+        mean = sum(timings) / len(timings)
+        tweets = counts[-1]
+        rate = tweets / mean if mean else 0
+        per_tweet = f"{mean * 1000 / tweets:>8.0f}" if tweets else f"{'-':>8}"
+        mark = "✅" if all(c == expected for c in counts) else "❌"
+        ok = ok and mark == "✅"
+        print(f"{name:<18} | {tweets:>6} | {mean:>8.2f} | {min(timings):>8.2f} | {rate:>8.1f} | {per_tweet} {mark}")
+        if mark == "❌":
+            print(f"  expected {expected} tweets, got {counts}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline scraper extraction benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--only", default="", help="Comma-separated scenario names")
+    parser.add_argument("--headed", action="store_true")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="xwatcher_bench_")
+    isolate_data(tmp_dir)
+    from browser_pool import run as run_with_browsers
+
+    all_names = list(build_scenarios())
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or all_names
+    unknown = [n for n in names if n not in all_names]
+    if unknown:
+        print(f"❌ Unknown scenario(s): {', '.join(unknown)}. Available: {', '.join(all_names)}")
+        sys.exit(2)
+
+    results = run_with_browsers(run_benchmark(names, args.runs, os.path.join(tmp_dir, "profiles"), not args.headed))
+    if print_report(results):
+        print("\n✅ SUCCESS: All scenarios extracted the expected tweets.")
+        sys.exit(0)
+    print("\n❌ FAILURE: Extraction regressions detected.")
+    sys.exit(1)
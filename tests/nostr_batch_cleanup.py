@@ -6,6 +6,7 @@ from db import REPLIES_CSV, update_nostr_status, get_post_details
 from nostr_publisher import publish_to_nostr
 from media_uploader import upload_media
 from poster import capture_tweet_screenshot
+from browser_pool import run as run_with_browsers
 import asyncio
 from dotenv import load_dotenv
 
@@ -79,4 +80,4 @@ async def backpost_to_nostr():
     print("\n✅ NOSTR Backposter complete!")
 
 if __name__ == "__main__":
-    asyncio.run(backpost_to_nostr())
+    run_with_browsers(backpost_to_nostr())
@@ -1,4 +1,3 @@
-import asyncio
 import os
 import sys
 
@@ -6,6 +5,7 @@ import sys
 sys.path.append(os.getcwd())
 
 from poster import capture_tweet_screenshot
+from browser_pool import run as run_with_browsers
 from nostr_publisher import publish_to_nostr
 from media_uploader import upload_media
 from playwright.async_api import async_playwright
@@ -76,6 +76,6 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        run_with_browsers(main())
     except KeyboardInterrupt:
         pass
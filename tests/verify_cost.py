@@ -1,23 +1,45 @@
-
 import sys
 import os
+from types import SimpleNamespace
 sys.path.append(os.getcwd())
-from quantifier import estimate_cost
+from quantifier import estimate_cost, response_cost
 
 def test_cost():
     model = "gemini-2.5-flash"
     input_tokens = 1000
     output_tokens = 1000
-    
+
     cost = estimate_cost(model, input_tokens, output_tokens)
     print(f"Cost for {model} (1k/1k): ${cost}")
-    
+
     if cost > 0:
         print("✅ SUCCESS: Cost is correctly calculated.")
-        sys.exit(0)
     else:
         print("❌ FAILURE: Cost is still 0.")
         sys.exit(1)
 
+def test_response_cost():
+    model = "gemini-2.5-flash"
+    prompt = "x" * 3000
+
+    # Usage metadata is authoritative (thinking tokens are billed as output)
+    usage = SimpleNamespace(prompt_token_count=1000, candidates_token_count=600, thoughts_token_count=400)
+    cost = response_cost(model, SimpleNamespace(usage_metadata=usage), prompt, "85", "verify")
+    expected = estimate_cost(model, 1000, 1000)
+    print(f"Cost from usage metadata: ${cost} (expected ${expected})")
+    if abs(cost - expected) > 1e-12:
+        print("❌ FAILURE: Usage metadata not used for cost.")
+        sys.exit(1)
+
+    # Without usage, the local estimator uses the ratio learned above (3 chars/token for this template)
+    cost = response_cost(model, SimpleNamespace(usage_metadata=None), prompt, "x" * 3000, "verify")
+    print(f"Cost from local estimate: ${cost} (expected ${expected})")
+    if abs(cost - expected) > 1e-12:
+        print("❌ FAILURE: Local fallback estimate is off.")
+        sys.exit(1)
+    print("✅ SUCCESS: Response cost uses usage metadata with a calibrated fallback.")
+
 if __name__ == "__main__":
     test_cost()
+    test_response_cost()
+    sys.exit(0)
@@ -12,7 +12,8 @@ def verify_csv():
     expected_fields = [
         "post_id", "handle", "content", "scraped_at", "posted_at", "score", "is_reply", 
         "is_pinned", "has_image", "has_video", "has_link", "link_url", "media_url", 
-        "is_retweet", "retweet_source", "quantification_cost", "replied_to", "reply_post_id"
+        "is_retweet", "retweet_source", "quantification_cost", "replied_to", "reply_post_id",
+        "content_fingerprint", "simhash", "scored_at", "score_source"
     ]
     expected_count = len(expected_fields)
 
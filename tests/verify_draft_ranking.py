@@ -0,0 +1,31 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+from draft_ranking import content_words, format_problems, rank_drafts
+
+PERSONA = "Readers value independence, privacy and having options. Historical context, not hype."
+PAST = ["This is why decentralized infrastructure is the exit from legacy control"]
+
+
+def test_draft_ranking():
+    candidates = [
+        ("**Decentralized infrastructure** is the exit from legacy control.", "markdown, repeat"),
+        ("This is why decentralized infrastructure is the exit from legacy control", "repeat"),
+        ("Privacy used to be the default. Options and independence are worth rebuilding", "fresh, on persona"),
+        ("x" * 300, "too long"),
+        ("", "empty"),
+    ]
+    ranked = rank_drafts(candidates, [content_words(t) for t in PAST], PERSONA)
+    print(f"Ranking: {[insight for _, insight in ranked]}")
+    if [insight for _, insight in ranked][:2] != ["fresh, on persona", "repeat"] or len(ranked) != 4:
+        print("❌ FAILURE: Expected the novel, well-formed, on-persona draft first and the empty one dropped.")
+        sys.exit(1)
+    if format_problems(candidates[0][0]) != ["markdown", "end_punctuation"] or format_problems("Fine — mostly #yes") != ["hashtag", "dash"]:
+        print("❌ FAILURE: Format problems not detected.")
+        sys.exit(1)
+    print("✅ SUCCESS: Drafts ranked by format, novelty and persona fit.")
+
+
+if __name__ == "__main__":
+    test_draft_ranking()
+    sys.exit(0)
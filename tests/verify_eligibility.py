@@ -0,0 +1,56 @@
+import sys
+import os
+import csv
+import tempfile
+from datetime import datetime, timezone
+sys.path.append(os.getcwd())
+import budget
+import db
+import quantifier
+from config import get_config
+from llm import FakeProvider, set_provider
+
+
+def read_post():
+    with open(db.POSTS_CSV, newline='') as f:
+        return next(csv.DictReader(f))
+
+
+def test_eligibility():
+    cfg = dict(get_config(), test_mode=False, prefilter_enabled=False, embedding_scorer="off", fused_mode=False,
+               llm_max_retries=0, llm_context_cache=False, reply_to_replies=False, qualify_age_limit_hours=24,
+               blacklist_words=[], llm_daily_budget_usd=0, llm_monthly_budget_usd=0)
+    quantifier.get_ai_config = lambda: cfg
+    db.init_db()
+    db.add_post("1", "alice", "privacy is a prerequisite for freedom", is_reply=True, posted_at=datetime.now(timezone.utc).isoformat())
+    fake = FakeProvider(lambda contents, config: "77")
+    set_provider(fake)
+
+    # A reply with reply_to_replies off is marked ineligible without an LLM call, and stays so on rerun
+    quantifier.run_quantifier()
+    quantifier.run_quantifier()
+    row = read_post()
+    if row['score'] != 'ineligible' or not row['score_source'].startswith('ineligible:reply:') or fake.requests:
+        print(f"❌ FAILURE: Expected an ineligible mark and no LLM call, got {row['score']} / {row['score_source']}.")
+        sys.exit(1)
+
+    # Turning reply_to_replies on re-checks the mark and scores the post
+    cfg['reply_to_replies'] = True
+    quantifier.run_quantifier()
+    row = read_post()
+    if row['score'] != '77' or len(fake.requests) != 1:
+        print(f"❌ FAILURE: Post not re-scored after the settings changed, got {row['score']}.")
+        sys.exit(1)
+    set_provider(None)
+    print("✅ SUCCESS: Ineligible posts are skipped, and re-checked once the eligibility settings change.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATA_DIR = tmp
+        for name in ("POSTS_CSV", "REPLIES_CSV", "ENGAGEMENT_CSV", "POSTED_REPLIES_CSV", "PENDING_REPLIES_CSV"):
+            setattr(db, name, os.path.join(tmp, os.path.basename(getattr(db, name))))
+        quantifier.POSTS_CSV = db.POSTS_CSV
+        budget.SPEND_PATH = os.path.join(tmp, "llm_spend.json")
+        test_eligibility()
+    sys.exit(0)
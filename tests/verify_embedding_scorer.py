@@ -0,0 +1,60 @@
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.getcwd())
+from embedding_scorer import EmbeddingIndex, HashingEmbedder
+
+BRAND = "Privacy is a human right. Monero, self custody and freedom from financial surveillance."
+HIGH = ["monero keeps your money private from surveillance", "self custody is freedom, kyc is surveillance",
+        "financial privacy is a human right", "privacy coins protect you from financial surveillance"]
+LOW = ["what a great football match tonight", "my lunch today was pasta and salad",
+       "new phone unboxing video is up", "traffic on the highway is terrible this morning"]
+
+
+def make_samples(n):
+    random.seed(7)
+    samples = []
+    for i in range(n):
+        if i % 2:
+            samples.append((f"h{i}", random.choice(HIGH) + f" {i}", random.randint(80, 100)))
+        else:
+            samples.append((f"l{i}", random.choice(LOW) + f" {i}", random.randint(0, 25)))
+    return samples
+
+
+def test_embedding_scorer():
+    samples = make_samples(80)
+    index = EmbeddingIndex(HashingEmbedder())
+    index.set_brand(BRAND)
+    added = index.add_exemplars([(pid, text, score >= 80) for pid, text, score in samples])
+    if not index.calibrate({pid: score for pid, _, score in samples}):
+        print("❌ FAILURE: Calibration failed.")
+        sys.exit(1)
+
+    on_brand, off_brand = index.score(["kyc is surveillance, keep your monero in self custody", "pasta for lunch after the football match"])
+    print(f"Scores: on-brand {on_brand}, off-brand {off_brand} ({added} exemplars)")
+    if not (0 <= off_brand < on_brand <= 100):
+        print("❌ FAILURE: On-brand post should outscore off-brand post on the 0-100 scale.")
+        sys.exit(1)
+
+    # Incremental update: only new exemplars are embedded; the saved index reloads identically
+    more = samples + [("h999", "privacy is freedom", 95)]
+    if index.add_exemplars([(pid, text, score >= 80) for pid, text, score in more]) != 1:
+        print("❌ FAILURE: Incremental update re-embedded known exemplars.")
+        sys.exit(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.npz")
+        index.save(path)
+        reloaded = EmbeddingIndex.load(HashingEmbedder(), path)
+        reloaded.calibrate({pid: score for pid, _, score in more})
+        index.calibrate({pid: score for pid, _, score in more})
+        if reloaded.ids != index.ids or reloaded.score(["monero privacy"]) != index.score(["monero privacy"]):
+            print("❌ FAILURE: Saved index does not reload identically.")
+            sys.exit(1)
+    print("✅ SUCCESS: Embedding scorer ranks, calibrates and updates incrementally.")
+
+
+if __name__ == "__main__":
+    test_embedding_scorer()
+    sys.exit(0)
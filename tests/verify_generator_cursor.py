@@ -0,0 +1,87 @@
+import sys
+import os
+import csv
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.getcwd())
+import budget
+import db
+import generator
+import rate_limits
+import reply_index
+from config import get_config
+
+NOW = datetime.now(timezone.utc)
+# One post per test-mode topic, so template drafts never look alike
+POSTS = {"1": "crypto keeps moving", "2": "privacy matters", "3": "kyc everywhere", "4": "a thought about cities"}
+
+
+def add_scored(post_id, hours_ago):
+    db.add_post(post_id, "alice", POSTS[post_id], score="90", posted_at=NOW.isoformat())
+    db.update_post_scores({(post_id, "alice"): {"scored_at": (NOW - timedelta(hours=hours_ago)).isoformat()}})
+
+
+def drafted():
+    with open(db.REPLIES_CSV, newline='') as f:
+        return {row['target_post_id'] for row in csv.DictReader(f)}
+
+
+def run(capacity):
+    generator.get_posting_capacity = lambda hours: capacity
+    generator.run_generator()
+    with open(generator.CURSOR_PATH) as f:
+        return json.load(f)
+
+
+def test_generator_cursor():
+    cfg = dict(get_config(), test_mode=True, workflow_mode="draft", quantifier_threshold=80, qualify_age_limit_hours=24,
+               capacity_aware_drafting=True, draft_capacity_buffer=0, generator_rescan_minutes=60, draft_candidates=1,
+               reply_similarity_threshold=1.01, engagement_enabled=False, blacklist_words=[],
+               llm_daily_budget_usd=0, llm_monthly_budget_usd=0)
+    generator.get_config = generator.get_ai_config = lambda: cfg
+    db.init_db()
+    add_scored("1", 1)
+    add_scored("2", 3)
+
+    # Full scan without a cursor; capacity for one draft, the other is deferred
+    cursor = run(capacity=1)
+    if drafted() != {"1"} or cursor["deferred"] != ["2"]:
+        print(f"❌ FAILURE: Expected 1 draft and 1 deferred post, got {drafted()} / {cursor['deferred']}.")
+        sys.exit(1)
+
+    # The deferred post (scored well before the cursor) is retried next cycle
+    cursor = run(capacity=2)
+    if "2" not in drafted() or cursor["deferred"]:
+        print("❌ FAILURE: Deferred post was not retried.")
+        sys.exit(1)
+
+    # Scored before cursor - rescan window: skipped; scored inside it: reconsidered
+    add_scored("3", 5)
+    add_scored("4", 5)
+    db.update_post_scores({("4", "alice"): {"scored_at": (datetime.fromisoformat(cursor["scored_at"]) - timedelta(minutes=30)).isoformat()}})
+    run(capacity=10)
+    if "3" in drafted() or "4" not in drafted():
+        print(f"❌ FAILURE: Cursor window wrong: drafted {sorted(drafted())}.")
+        sys.exit(1)
+
+    # Deleting the cursor rescans everything
+    os.remove(generator.CURSOR_PATH)
+    run(capacity=10)
+    if drafted() != set(POSTS):
+        print(f"❌ FAILURE: Full rescan missed posts: drafted {sorted(drafted())}.")
+        sys.exit(1)
+    print("✅ SUCCESS: Cursor skips settled posts, rescans its window, retries deferred posts and resets when deleted.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATA_DIR = tmp
+        for name in ("POSTS_CSV", "REPLIES_CSV", "ENGAGEMENT_CSV", "POSTED_REPLIES_CSV", "PENDING_REPLIES_CSV"):
+            setattr(db, name, os.path.join(tmp, os.path.basename(getattr(db, name))))
+        generator.POSTS_CSV = db.POSTS_CSV
+        rate_limits.REPLIES_CSV = reply_index.REPLIES_CSV = db.REPLIES_CSV
+        generator.CURSOR_PATH = os.path.join(tmp, "generator_cursor.json")
+        budget.SPEND_PATH = os.path.join(tmp, "llm_spend.json")
+        test_generator_cursor()
+    sys.exit(0)
@@ -0,0 +1,62 @@
+import sys
+import os
+import json
+import asyncio
+import tempfile
+sys.path.append(os.getcwd())
+import budget
+from llm import FakeProvider, set_provider, get_client
+from quantifier import score_batches
+from generator import draft_all
+
+BRAND = "Privacy is a human right. " * 40
+
+
+def responder(contents, config):
+    if "Posts (JSON)" in contents:
+        ids = [p["post_id"] for p in json.loads(contents.split("Posts (JSON):")[1].split("Return ONLY")[0])]
+        return json.dumps([{"post_id": i, "score": 90} for i in ids])
+    if "Draft a reply" in contents:
+        return json.dumps({"reply": "Privacy is the default", "insight": "Agree and extend"})
+    return "42"
+
+
+def test_llm_session():
+    fake = FakeProvider(responder)
+    set_provider(fake)
+    if get_client() is not fake or get_client() is not get_client():
+        print("❌ FAILURE: Session does not reuse one client.")
+        sys.exit(1)
+
+    results = asyncio.run(score_batches([[("1", "monero fixes this"), ("2", "kyc is surveillance")], [("3", "lunch")]], BRAND))
+    drafts = asyncio.run(draft_all([("monero fixes this", "alice"), ("kyc is surveillance", "bob")], BRAND, "Calm and direct."))
+    print(f"Scores: {results}")
+    print(f"Drafts: {[d[0] for d in drafts]}")
+
+    # Brand/persona go into one cached context per prompt prefix; every request only carries the per-post suffix
+    if len(fake.cached) != 2:
+        print(f"❌ FAILURE: Expected 2 cached contexts (scoring, drafting), got {len(fake.cached)}.")
+        sys.exit(1)
+    if any("system_instruction" in r["config"] or "Privacy is a human right" in r["contents"] for r in fake.requests):
+        print("❌ FAILURE: Static brand context was re-sent with a request.")
+        sys.exit(1)
+    if results != {"1": (90, results["1"][1]), "2": (90, results["2"][1]), "3": (42, results["3"][1])} or not all(d[0] for d in drafts):
+        print("❌ FAILURE: Unexpected results through the fake provider.")
+        sys.exit(1)
+
+    # Context too small to cache: sent inline as a system instruction instead
+    small = FakeProvider(responder, min_cache_chars=10 ** 6)
+    set_provider(small)
+    asyncio.run(score_batches([[("4", "monero")]], BRAND))
+    if small.cached or "system_instruction" not in small.requests[0]["config"]:
+        print("❌ FAILURE: Uncacheable context was not sent inline.")
+        sys.exit(1)
+    set_provider(None)
+    print(f"✅ SUCCESS: {len(fake.requests)} requests shared one client and 2 cached contexts.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        budget.SPEND_PATH = os.path.join(tmp, "llm_spend.json")
+        test_llm_session()
+    sys.exit(0)
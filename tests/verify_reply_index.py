@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+sys.path.append(os.getcwd())
+from reply_index import ReplyIndex, pick_fresh
+
+PAST = [
+    "This is why decentralized infrastructure is the exit from legacy control",
+    "Privacy is not a crime, it's a prerequisite for a free society",
+    "KYC is just the digital fence around the tax farm",
+]
+
+
+def test_reply_index():
+    index = ReplyIndex()
+    for i, text in enumerate(PAST):
+        index.add(i, text, "posted")
+    for i in range(1000):
+        index.add(f"filler{i}", f"filler reply number {i} about topic {i * 7} and angle {i * 13}", "posted")
+
+    start = time.perf_counter()
+    rid, similarity = index.most_similar("This is exactly why decentralized infrastructure is the only exit from legacy control. 🔒")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"Closest: {rid} ({similarity:.2f}) in {elapsed_ms:.2f} ms over {len(index)} replies")
+    if rid != "0" or similarity < 0.5:
+        print("❌ FAILURE: Paraphrased reply not matched.")
+        sys.exit(1)
+    if index.most_similar("Self custody is the first step towards sovereignty")[1] >= 0.5:
+        print("❌ FAILURE: Unrelated reply matched.")
+        sys.exit(1)
+
+    # A repeat is resolved with the first fresh alternate; only posted/qualified matches count when asked
+    chosen, rest, _ = pick_fresh(index, PAST[1], [PAST[2], "Opting out of surveillance starts with your wallet"], 0.5)
+    if chosen != "Opting out of surveillance starts with your wallet" or rest != [PAST[2]]:
+        print("❌ FAILURE: Alternate not picked.")
+        sys.exit(1)
+    index.add("draft", "Opting out of surveillance starts with your wallet", "pending")
+    if pick_fresh(index, "Opting out of surveillance starts with your wallet", [], 0.5, statuses=("qualified", "posted"))[0] is None:
+        print("❌ FAILURE: Pending draft counted as a posted reply.")
+        sys.exit(1)
+    index.remove("0")
+    if index.most_similar(PAST[0])[0] is not None:
+        print("❌ FAILURE: Removed reply still matched.")
+        sys.exit(1)
+    print("✅ SUCCESS: Near-duplicate replies found, alternates picked, index updated incrementally.")
+
+
+if __name__ == "__main__":
+    test_reply_index()
+    sys.exit(0)
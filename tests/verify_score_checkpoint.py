@@ -0,0 +1,82 @@
+import sys
+import os
+import csv
+import tempfile
+from datetime import datetime, timezone
+sys.path.append(os.getcwd())
+import budget
+import db
+import quantifier
+from config import get_config
+from llm import FakeProvider, set_provider
+
+POSTS = [("101", "alice", "monero keeps your money private"), ("102", "bob", "kyc is financial surveillance"),
+         ("103", "carol", "what a lovely lunch today"), ("104", "dave", "self custody is freedom")]
+APPENDED = ("201", "erin", "privacy coins and the right to be left alone")
+
+
+def read_posts():
+    with open(db.POSTS_CSV, newline='') as f:
+        return {row['post_id']: row for row in csv.DictReader(f)}
+
+
+def failing(contents, config):
+    raise RuntimeError("503 Service Unavailable")
+
+
+def test_score_checkpoint():
+    cfg = dict(get_config(), test_mode=False, prefilter_enabled=False, embedding_scorer="off", fused_mode=False,
+               llm_max_retries=0, llm_context_cache=False, quantifier_batch_size=2, qualify_age_limit_hours=24,
+               blacklist_words=[], llm_daily_budget_usd=0, llm_monthly_budget_usd=0)
+    quantifier.get_ai_config = lambda: cfg
+    db.init_db()
+    now = datetime.now(timezone.utc).isoformat()
+    for post_id, handle, content in POSTS:
+        db.add_post(post_id, handle, content, posted_at=now)
+    before = read_posts()
+
+    # 1. LLM outage: nothing is checkpointed as a score
+    set_provider(FakeProvider(failing))
+    quantifier.run_quantifier()
+    if any(row['score'] for row in read_posts().values()):
+        print("❌ FAILURE: Failed LLM calls were saved as scores.")
+        sys.exit(1)
+
+    # 2. The scraper appends a post while scoring is in flight (between read and write-back)
+    def responder(contents, config):
+        if APPENDED[0] not in read_posts():
+            db.add_post(*APPENDED, posted_at=now)
+        return "75"
+    set_provider(FakeProvider(responder))
+    quantifier.run_quantifier()
+    after = read_posts()
+    if APPENDED[0] not in after:
+        print("❌ FAILURE: Post appended during scoring was lost by the write-back.")
+        sys.exit(1)
+    for post_id, _, _ in POSTS:
+        changed = {k for k in before[post_id] if before[post_id][k] != after[post_id][k]}
+        if after[post_id]['score'] == '' or after[post_id]['score_source'] != 'llm' or not changed <= set(quantifier.SCORE_FIELDS):
+            print(f"❌ FAILURE: Post {post_id} not scored, or non-score fields changed: {changed}")
+            sys.exit(1)
+
+    # 3. Rerun: checkpointed posts are skipped, only the appended one is scored
+    fake = FakeProvider(lambda contents, config: "60")
+    set_provider(fake)
+    quantifier.run_quantifier()
+    sent = " ".join(r["contents"] for r in fake.requests)
+    if len(fake.requests) != 1 or APPENDED[2] not in sent or read_posts()[APPENDED[0]]['score'] != '60':
+        print(f"❌ FAILURE: Rerun sent {len(fake.requests)} request(s) instead of only the unscored post.")
+        sys.exit(1)
+    set_provider(None)
+    print("✅ SUCCESS: Failures stay unscored, concurrent appends survive, only score fields change, reruns resume.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATA_DIR = tmp  # init_db archives legacy reply files under DATA_DIR
+        for name in ("POSTS_CSV", "REPLIES_CSV", "ENGAGEMENT_CSV", "POSTED_REPLIES_CSV", "PENDING_REPLIES_CSV"):
+            setattr(db, name, os.path.join(tmp, os.path.basename(getattr(db, name))))
+        quantifier.POSTS_CSV = db.POSTS_CSV
+        budget.SPEND_PATH = os.path.join(tmp, "llm_spend.json")
+        test_score_checkpoint()
+    sys.exit(0)
@@ -0,0 +1,162 @@
+import html
+from datetime import datetime
+
+# GraphQL operations that carry a profile timeline
+TIMELINE_OPERATIONS = ("/UserTweets", "/UserTweetsAndReplies")
+
+
+def is_timeline_response(url):
+    return "/graphql/" in url and any(op in url.split("?")[0] for op in TIMELINE_OPERATIONS)
+
+
+def _parse_created_at(created_at):
+    """Converts X's 'Wed Oct 10 20:19:24 +0000 2018' into ISO 8601."""
+    try:
+        return datetime.strptime(created_at, "%a %b %d %H:%M:%S %z %Y").isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _unwrap_tweet(result):
+    """Returns the plain Tweet object from a tweet_results.result node (handles visibility wrappers)."""
+    if not result:
+        return None
+    if result.get("__typename") == "TweetWithVisibilityResults":
+        result = result.get("tweet")
+    if not result or "legacy" not in result:
+        return None
+    return result
+
+
+def _screen_name(tweet):
+    user = tweet.get("core", {}).get("user_results", {}).get("result", {})
+    return user.get("core", {}).get("screen_name") or user.get("legacy", {}).get("screen_name", "")
+
+
+def _full_text(tweet):
+    note = tweet.get("note_tweet", {}).get("note_tweet_results", {}).get("result", {})
+    return note.get("text") or tweet["legacy"].get("full_text", "")
+
+
+def _best_video_url(media):
+    variants = media.get("video_info", {}).get("variants", [])
+    mp4s = [v for v in variants if v.get("content_type") == "video/mp4"]
+    if mp4s:
+        return max(mp4s, key=lambda v: v.get("bitrate", 0)).get("url", "")
+    return variants[0].get("url", "") if variants else ""
+
+
+def parse_tweet(result, pinned=False):
+    """
+    Converts a tweet_results.result node into the post dict used by db.add_post.
+    Retweets are reported with the original tweet's id, text and media (as the DOM scraper does),
+    with retweet_source set to the original author.
+    """
+    tweet = _unwrap_tweet(result)
+    if not tweet:
+        return None
+
+    legacy = tweet["legacy"]
+    is_retweet = False
+    retweet_source = ""
+    original = _unwrap_tweet(legacy.get("retweeted_status_result", {}).get("result"))
+    if original:
+        is_retweet = True
+        retweet_source = "@" + _screen_name(original)
+        tweet = original
+        legacy = original["legacy"]
+
+    content = _full_text(tweet)
+    entities = legacy.get("entities", {})
+    media_items = legacy.get("extended_entities", {}).get("media", []) or entities.get("media", [])
+
+    # Drop the trailing t.co link X appends for attached media, expand every other t.co link
+    for media in media_items:
+        if media.get("url"):
+            content = content.replace(media["url"], "")
+    link_url = ""
+    for url in entities.get("urls", []):
+        expanded = url.get("expanded_url") or url.get("url", "")
+        if url.get("url"):
+            content = content.replace(url["url"], expanded)
+        if expanded and not link_url:
+            link_url = expanded
+    content = html.unescape(content).strip()
+
+    has_image = any(m.get("type") == "photo" for m in media_items)
+    has_video = any(m.get("type") in ("video", "animated_gif") for m in media_items)
+    media_url = ""
+    if has_image:
+        media_url = next(m.get("media_url_https", "") for m in media_items if m.get("type") == "photo")
+    elif has_video:
+        media_url = next(_best_video_url(m) for m in media_items if m.get("type") in ("video", "animated_gif"))
+
+    return {
+        "post_id": tweet.get("rest_id") or legacy.get("id_str"),
+        "author": _screen_name(tweet),
+        "content": content,
+        "posted_at": _parse_created_at(legacy.get("created_at")),
+        "is_reply": bool(legacy.get("in_reply_to_status_id_str")),
+        "is_pinned": pinned,
+        "has_image": has_image,
+        "has_video": has_video,
+        "has_link": bool(link_url),
+        "link_url": link_url,
+        "media_url": media_url,
+        "is_retweet": is_retweet,
+        "retweet_source": retweet_source,
+    }
+
+
+def _entry_results(entry):
+    """Yields (tweet_result, is_pinned_context) for every tweet inside a timeline entry."""
+    content = entry.get("content", {})
+    entry_type = content.get("entryType") or content.get("__typename")
+    if entry_type == "TimelineTimelineItem":
+        item = content.get("itemContent", {})
+        pinned = item.get("socialContext", {}).get("contextType") == "Pin"
+        yield item.get("tweet_results", {}).get("result"), pinned
+    elif entry_type == "TimelineTimelineModule":
+        # Conversation modules (with_replies tab) hold several tweets
+        for module_item in content.get("items", []):
+            item = module_item.get("item", {}).get("itemContent", {})
+            yield item.get("tweet_results", {}).get("result"), False
+
+
+def _find_instructions(payload):
+    user = payload.get("data", {}).get("user", {}).get("result", {})
+    for key in ("timeline_v2", "timeline"):
+        timeline = user.get(key, {}).get("timeline", {})
+        if "instructions" in timeline:
+            return timeline["instructions"]
+    return []
+
+
+def parse_timeline_payload(payload):
+    """
+    Parses a UserTweets / UserTweetsAndReplies GraphQL JSON payload.
+    Returns (posts, bottom_cursor) with posts in timeline order (pinned entry first).
+    """
+    posts = []
+    cursor = None
+    seen = set()
+
+    for instruction in _find_instructions(payload):
+        if instruction.get("type") == "TimelinePinEntry":
+            entries = [instruction.get("entry", {})]
+            pinned_instruction = True
+        else:
+            entries = instruction.get("entries", [])
+            pinned_instruction = False
+
+        for entry in entries:
+            content = entry.get("content", {})
+            if content.get("cursorType") == "Bottom":
+                cursor = content.get("value")
+                continue
+            for result, pinned in _entry_results(entry):
+                post = parse_tweet(result, pinned=pinned or pinned_instruction)
+                if post and post["post_id"] and post["post_id"] not in seen:
+                    seen.add(post["post_id"])
+                    posts.append(post)
+    return posts, cursor
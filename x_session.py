@@ -0,0 +1,132 @@
+import os
+import random
+from readiness import wait_for_any, wait_for_condition
+
+# Cookie X sets on a logged-in browser; it disappears when the session is logged out
+AUTH_COOKIE = "auth_token"
+LOGIN_URL = "https://x.com/i/flow/login"
+BLOCKED_MARKERS = ["Could not log you in now", "Please try again later", "suspicious activity"]
+
+# id(context) -> {"context", "state", "cycle", "relogins"}; state is "ok", "lost", "blocked" or "failed"
+_sessions = {}
+_cycle = 0
+
+
+def new_cycle():
+    """Starts a new validation cycle: every context's login state is re-checked on next use."""
+    global _cycle
+    _cycle += 1
+
+
+def get_credentials():
+    user = os.getenv("TWITTER_USERNAME")
+    pwd = os.getenv("TWITTER_PASSWORD")
+    if user: user = user.strip('"').strip("'")
+    if pwd: pwd = pwd.strip('"').strip("'")
+    if not user or user == "YOUR_USERNAME":
+        return None, None
+    return user, pwd
+
+
+def is_login_url(url):
+    return "/login" in url or "/i/flow/" in url
+
+
+def invalidate_session(context, reason=""):
+    """Marks the session lost after a 401 or a redirect to the login flow; the next ensure_session() logs in again."""
+    entry = _sessions.get(id(context))
+    if entry and entry["context"] is context and entry["state"] == "ok":
+        entry["state"] = "lost"
+        print(f"  🔑 X.com session lost{f' ({reason})' if reason else ''}.")
+
+
+async def has_auth_cookie(context):
+    return any(c["name"] == AUTH_COOKIE for c in await context.cookies("https://x.com"))
+
+
+async def login(page):
+    """Runs the X.com username/password flow on page. Returns "ok", "blocked" or "failed"."""
+    user, pwd = get_credentials()
+    if not user:
+        print("  ❌ X.com: Session lost and no credentials in .env to log back in.")
+        return "failed"
+
+    print("  🔑 Logging in to X.com...")
+    if not is_login_url(page.url):
+        await page.goto(LOGIN_URL, wait_until="domcontentloaded")
+
+    # Step 1: Username
+    try:
+        user_input = await page.wait_for_selector('input[autocomplete="username"]', timeout=30000)
+    except Exception:
+        print("  ❌ Username field didn't appear.")
+        return "failed"
+    await user_input.click()
+    await page.keyboard.type(user, delay=random.randint(50, 150))
+
+    next_btn = await page.query_selector('button:has-text("Next")')
+    if next_btn: await next_btn.click()
+    else: await page.keyboard.press("Enter")
+
+    # Next step of the flow: password, an extra identity check, or a refusal
+    await wait_for_any(page, {
+        "password": 'input[autocomplete="current-password"]',
+        "identity": 'input[data-testid="ocfEnterTextTextInput"]',
+        "blocked": 'span:has-text("Could not log you in now"), span:has-text("Please try again later"), span:has-text("suspicious activity")',
+    }, 15000, replaces=4000)
+
+    # Check for "Try again later"
+    page_text = await page.content()
+    if any(k in page_text for k in BLOCKED_MARKERS):
+        print("  ⚠️ X.com: Blocked by security detection.")
+        return "blocked"
+
+    # Step 2: Password
+    try:
+        pwd_input = await page.wait_for_selector('input[autocomplete="current-password"]', timeout=15000)
+        await pwd_input.click()
+        await page.keyboard.type(pwd, delay=random.randint(50, 150))
+
+        login_btn = await page.query_selector('button[data-testid="LoginForm_Login_Button"]')
+        if login_btn: await login_btn.click()
+        else: await page.keyboard.press("Enter")
+    except Exception:
+        print("  ❌ Password field didn't appear.")
+        return "failed"
+
+    await wait_for_condition(page, "() => !location.pathname.includes('/login') || document.title.includes('Verifying')", 10000, replaces=5000)
+
+    # Double check for Verifying challenge
+    if "Verifying" in await page.title():
+        print("  ⏳ Negotiating X.com Verifying challenge...")
+        await wait_for_condition(page, "() => !document.title.includes('Verifying')", 10000, replaces=10000)
+
+    if await has_auth_cookie(page.context):
+        print("  ✅ X.com login succeeded.")
+        return "ok"
+    print("  ❌ X.com login did not produce a session.")
+    return "failed"
+
+
+async def ensure_session(page):
+    """
+    Returns the login state of page's browser context ("ok", "blocked" or "failed"), checking it
+    at most once per cycle (or after invalidate_session). A lost session is logged back in once;
+    a failed or blocked login is remembered for the rest of the cycle instead of retried per handle.
+    """
+    context = page.context
+    entry = _sessions.get(id(context))
+    if entry and entry["context"] is context and entry["cycle"] == _cycle:
+        if entry["state"] != "lost":
+            return entry["state"]
+        if entry["relogins"]:
+            # Logged back in once this cycle already and lost it again: stop trying until next cycle
+            entry["state"] = "failed"
+            return entry["state"]
+        entry["relogins"] += 1
+        entry["state"] = await login(page)
+        return entry["state"]
+
+    state = "ok" if await has_auth_cookie(context) else await login(page)
+    _sessions[id(context)] = {"context": context, "state": state, "cycle": _cycle, "relogins": 0}
+    return state